@@ -1,186 +1,28 @@
 # A comment
 import csv
+import json
+import os
 import random
 from datetime import datetime, timedelta
 
-# Services list provided
-services = [
-    "Taxware Enterprise Services",
-    "Anaplan Enterprise Services",
-    "Xactly Enterprise Services",
-    "HireRight Enterprise Screening Management",
-    "Xignite Enterprise Services",
-    "DocuSign Enterprise Services",
-    "SAP Enterprise Services",
-    "SAP Financial Accounting",
-    "SAP Materials Management",
-    "SAP Controlling",
-    "SAP Sales and Distribution",
-    "SAP Human Resources",
-    "SAP Payroll",
-    "SAP Labor Distribution",
-    "SAP Plant Maintenance",
-    "Electronic Messaging",
-    "Email",
-    "Outlook Web Access (OWA)",
-    "Blackberry",
-    "Windows Mobile",
-    "IT Services",
-    "Retail",
-    "Retail POS (Point of Sale)",
-    "Retail Client Registration",
-    "Retail Client Lookup",
-    "Retail Adding Points",
-    "E-Commerce",
-    "DNB Enterprise Services",
-    "Jive Enterprise Services",
-    "PeopleSoft Enterprise Services",
-    "PeopleSoft CRM",
-    "PeopleSoft Supply Chain Management",
-    "PeopleSoft Asset Lifecycle Management",
-    "PeopleSoft Financials",
-    "PeopleSoft HRMS",
-    "PeopleSoft Portals",
-    "PeopleSoft Governance",
-    "PeopleSoft Reporting",
-    "Tableau Enterprise Services",
-    "Saba Enterprise Services",
-    "SAP SuccessFactors",
-    "Bond Trading",
-    "Shared Storage (SAN)",
-    "Concur Enterprise Travel & Expense Services",
-    "ADP Enterprise Services",
-    "OpenText Enterprise Services",
-    "LinkedIn Enterprise Services",
-    "Client Services",
-    "Securities Lending",
-    "Bond Trading - DR",
-    "OOYALA Enterprise Services",
-    "Workday Enterprise Services",
-    "Adobe Enterprise Services",
-    "SalesForce Enterprise Services",
-    "ServiceNow Enterprise Services",
-    "Fidelity Enterprise Services",
-    "Total User Management",
-    "Google Enterprise Services",
-    "Sales Force Automation",
-    "Oracle Eloqua Enterprise Services",
-    "TopQuadrant Enterprise Services",
-    "Slack",
-    "Oracle Enterprise Services",
-    "Jobvite Enterprise Recruitment Services",
-    "This Service-now instance",
-    "Apache Web Hosting",
-    "Oracle Taleo Enterprise Services",
-    "Okta Enterprise Services",
-    "insidesales.com Enterprise Services"
-]
+# Tables are read from incident_spec.json, the same file Generate_Records_v3
+# uses; any weights in it are ignored here, every value is equally likely
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "incident_spec.json"),
+          encoding='utf-8') as spec_file:
+    spec = json.load(spec_file)
 
+services = list(spec["services"])
 # Incident types for different service categories
-incident_types = {
-    "performance": [
-        "Slow performance", "Response time degradation", "Timeout errors",
-        "High latency", "Performance degradation", "System sluggish"
-    ],
-    "access": [
-        "Login failed", "Access denied", "Authentication error",
-        "Permission issues", "User access problems", "SSO failure"
-    ],
-    "functionality": [
-        "Feature not working", "Button not responding", "Form submission failed",
-        "Report generation error", "Search not functioning", "Export failed"
-    ],
-    "connectivity": [
-        "Connection timeout", "Service unavailable", "Network connectivity issues",
-        "API failure", "Integration error", "Sync problems"
-    ],
-    "data": [
-        "Data not loading", "Incorrect data displayed", "Data sync failure",
-        "Missing records", "Data corruption", "Database connection failed"
-    ],
-    "ui": [
-        "UI rendering issues", "Display problems", "Layout broken",
-        "Styling errors", "Mobile responsiveness issues"
-    ]
-}
-
-states = ["New", "In Progress", "Resolved"]
-priorities = ["Low", "Medium", "High", "Critical"]
-
-# Resolution codes for resolved incidents
-resolution_codes = [
-    "Duplicate", "Known error", "No resolution provided", "Resolved by caller",
-    "Resolved by change", "Resolved by problem", "Resolved by request",
-    "Solution provided", "Workaround provided", "User error"
-]
-
-# Close notes templates for different resolution codes
-close_notes_templates = {
-    "Duplicate": [
-        "Duplicate of existing incident {inc_number}. Closing as duplicate.",
-        "This issue was already reported in {inc_number}. Marking as duplicate.",
-        "Duplicate ticket - original incident {inc_number} already addresses this issue."
-    ],
-    "Known error": [
-        "This is a known issue with documented workaround. Reference knowledge article KA{ka_id}.",
-        "Known system limitation. Engineering team aware and working on permanent fix.",
-        "Known error - temporary workaround applied until permanent solution is deployed."
-    ],
-    "No resolution provided": [
-        "Unable to reproduce the issue. No further action required at this time.",
-        "User unresponsive to follow-up attempts. Closing incident.",
-        "Issue could not be verified. No resolution provided."
-    ],
-    "Resolved by caller": [
-        "Caller reported issue resolved itself. No further action needed.",
-        "User found alternative solution. Incident resolved by caller.",
-        "Caller indicated the problem is no longer occurring."
-    ],
-    "Resolved by change": [
-        "Issue resolved by change request CHG{change_id}. System update addressed the problem.",
-        "Recent system change fixed the reported issue. Change {change_id} successfully implemented.",
-        "Deployment of patch resolved the incident. Change management ticket CHG{change_id}."
-    ],
-    "Resolved by problem": [
-        "Root cause identified and resolved via problem ticket PRB{problem_id}.",
-        "Underlying problem addressed through problem management. Reference PRB{problem_id}.",
-        "Permanent fix implemented via problem record {problem_id}."
-    ],
-    "Resolved by request": [
-        "Resolution provided as requested by user. All requirements met.",
-        "Service request fulfilled as specified. Incident closed.",
-        "User's specific request completed successfully."
-    ],
-    "Solution provided": [
-        "Step-by-step solution provided to user. Issue resolved.",
-        "Technical solution implemented. User confirmed resolution.",
-        "Configuration update resolved the issue. Solution documented."
-    ],
-    "Workaround provided": [
-        "Temporary workaround provided to restore service. Permanent fix pending.",
-        "User instructed on workaround procedure. Service restored temporarily.",
-        "Workaround implemented while engineering develops permanent solution."
-    ],
-    "User error": [
-        "User education provided on proper procedure. Issue resolved.",
-        "Training gap identified. User guided through correct process.",
-        "Misconfiguration corrected. User now able to proceed successfully."
-    ]
-}
-
+incident_types = {category: list(entry["issues"] if isinstance(entry, dict) else entry)
+                  for category, entry in spec["incident_types"].items()}
+states = list(spec["states"])
+priorities = list(spec["priorities"])
+impact_levels = list(spec["impact_levels"])
+# Resolution codes and close notes templates for resolved incidents
+resolution_codes = list(spec["resolution_codes"])
+close_notes_templates = spec["close_notes_templates"]
 # Detailed description templates
-description_templates = [
-    "Users reporting {issue} with {service} affecting daily operations",
-    "System alert: {issue} detected in {service} environment",
-    "Multiple users experiencing {issue} when using {service}",
-    "Critical incident: {issue} impacting {service} functionality",
-    "Performance monitoring detected {issue} in {service}",
-    "User complaints about {issue} while accessing {service}",
-    "Service degradation: {issue} affecting {service} availability",
-    "Technical issue: {issue} preventing normal use of {service}",
-    "Outage reported: {issue} causing service interruption for {service}",
-    "Integration problem: {issue} between {service} and other systems"
-]
+description_templates = spec["description_templates"]
 
 # Generate unique INC numbers
 def generate_inc_number(incident_id):
@@ -227,7 +69,7 @@ def generate_dates(state):
         # Ensure updated date doesn't exceed current date
         if updated_date > datetime.now():
             updated_date = datetime.now() - timedelta(hours=random.randint(1, 12))
-    else:  # Resolved
+    else:  # Resolved or Closed
         # For resolved tickets, updated date is between 1 day and 60 days after created date
         days_difference = random.randint(1, 60)
         hours_difference = random.randint(1, 23)
@@ -265,14 +107,14 @@ def generate_incident(incident_id):
     created_date, updated_date = generate_dates(state)
     
     # Generate random impact and urgency
-    impact = random.choice(["Low", "Medium", "High", "Critical"])
-    urgency = random.choice(["Low", "Medium", "High", "Critical"])
+    impact = random.choice(impact_levels)
+    urgency = random.choice(impact_levels)
     
-    # For resolved incidents, add resolution code and close notes
+    # For resolved or closed incidents, add resolution code and close notes
     resolution_code = ""
     close_notes = ""
     
-    if state == "Resolved":
+    if state in ["Resolved", "Closed"]:
         resolution_code = random.choice(resolution_codes)
         close_notes = generate_close_notes(resolution_code, inc_number)
     
@@ -293,27 +135,33 @@ def generate_incident(incident_id):
         close_notes
     ]
 
-# Generate 10,000 records
-print("Generating 10,000 incident records with resolution codes and close notes...")
-print(f"Total services available: {len(services)}")
 
-with open('incidents_10000.csv', 'w', newline='', encoding='utf-8') as csvfile:
-    writer = csv.writer(csvfile)
-    
-    # Write header with new resolution fields
-    writer.writerow([
-        'inc_number', 'id', 'short_description', 'description', 'service', 
-        'incident_category', 'state', 'priority', 'impact', 
-        'urgency', 'created_date', 'updated_date', 'resolution_code', 'close_notes'
-    ])
-    
-    # Write 10,000 records
-    for i in range(1, 10001):
-        if i % 1000 == 0:
-            print(f"Generated {i} records...")
-        writer.writerow(generate_incident(i))
+def main():
+    # Generate 10,000 records
+    print("Generating 10,000 incident records with resolution codes and close notes...")
+    print(f"Total services available: {len(services)}")
+
+    with open('incidents_10000.csv', 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+
+        # Write header with new resolution fields
+        writer.writerow([
+            'inc_number', 'id', 'short_description', 'description', 'service', 
+            'incident_category', 'state', 'priority', 'impact', 
+            'urgency', 'created_date', 'updated_date', 'resolution_code', 'close_notes'
+        ])
+
+        # Write 10,000 records
+        for i in range(1, 10001):
+            if i % 1000 == 0:
+                print(f"Generated {i} records...")
+            writer.writerow(generate_incident(i))
+
+    print("File 'incidents_10000.csv' created successfully with 10,000 records!")
+    print(f"Services used: {len(services)} different enterprise services")
+    print("INC numbers format: INC followed by 7 digits (e.g., INC0001234)")
+    print("Resolution codes and close notes added for resolved and closed incidents")
+
 
-print("File 'incidents_10000.csv' created successfully with 10,000 records!")
-print(f"Services used: {len(services)} different enterprise services")
-print("INC numbers format: INC followed by 7 digits (e.g., INC0001234)")
-print("Resolution codes and close notes added for resolved incidents")
+if __name__ == "__main__":
+    main()
@@ -1,185 +1,25 @@
-import csv
+import argparse
+import hashlib
+import json
+import os
 import random
+import struct
+import sys
+import time
 from datetime import datetime, timedelta
+from functools import lru_cache, partial
+from itertools import islice
 
-# Services list provided
-services = [
-    "Taxware Enterprise Services",
-    "Anaplan Enterprise Services",
-    "Xactly Enterprise Services",
-    "HireRight Enterprise Screening Management",
-    "Xignite Enterprise Services",
-    "DocuSign Enterprise Services",
-    "SAP Enterprise Services",
-    "SAP Financial Accounting",
-    "SAP Materials Management",
-    "SAP Controlling",
-    "SAP Sales and Distribution",
-    "SAP Human Resources",
-    "SAP Payroll",
-    "SAP Labor Distribution",
-    "SAP Plant Maintenance",
-    "Electronic Messaging",
-    "Email",
-    "Outlook Web Access (OWA)",
-    "Blackberry",
-    "Windows Mobile",
-    "IT Services",
-    "Retail",
-    "Retail POS (Point of Sale)",
-    "Retail Client Registration",
-    "Retail Client Lookup",
-    "Retail Adding Points",
-    "E-Commerce",
-    "DNB Enterprise Services",
-    "Jive Enterprise Services",
-    "PeopleSoft Enterprise Services",
-    "PeopleSoft CRM",
-    "PeopleSoft Supply Chain Management",
-    "PeopleSoft Asset Lifecycle Management",
-    "PeopleSoft Financials",
-    "PeopleSoft HRMS",
-    "PeopleSoft Portals",
-    "PeopleSoft Governance",
-    "PeopleSoft Reporting",
-    "Tableau Enterprise Services",
-    "Saba Enterprise Services",
-    "SAP SuccessFactors",
-    "Bond Trading",
-    "Shared Storage (SAN)",
-    "Concur Enterprise Travel & Expense Services",
-    "ADP Enterprise Services",
-    "OpenText Enterprise Services",
-    "LinkedIn Enterprise Services",
-    "Client Services",
-    "Securities Lending",
-    "Bond Trading - DR",
-    "OOYALA Enterprise Services",
-    "Workday Enterprise Services",
-    "Adobe Enterprise Services",
-    "SalesForce Enterprise Services",
-    "ServiceNow Enterprise Services",
-    "Fidelity Enterprise Services",
-    "Total User Management",
-    "Google Enterprise Services",
-    "Sales Force Automation",
-    "Oracle Eloqua Enterprise Services",
-    "TopQuadrant Enterprise Services",
-    "Slack",
-    "Oracle Enterprise Services",
-    "Jobvite Enterprise Recruitment Services",
-    "This Service-now instance",
-    "Apache Web Hosting",
-    "Oracle Taleo Enterprise Services",
-    "Okta Enterprise Services",
-    "insidesales.com Enterprise Services"
-]
+# The tables incidents are drawn from (services, issues, states, priorities,
+# resolution codes and text templates) live in incident_spec.json, the one
+# copy every script reads; see dataset_spec.py for its format.
+default_spec_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "incident_spec.json")
 
-# Incident types for different service categories
-incident_types = {
-    "performance": [
-        "Slow performance", "Response time degradation", "Timeout errors",
-        "High latency", "Performance degradation", "System sluggish"
-    ],
-    "access": [
-        "Login failed", "Access denied", "Authentication error",
-        "Permission issues", "User access problems", "SSO failure"
-    ],
-    "functionality": [
-        "Feature not working", "Button not responding", "Form submission failed",
-        "Report generation error", "Search not functioning", "Export failed"
-    ],
-    "connectivity": [
-        "Connection timeout", "Service unavailable", "Network connectivity issues",
-        "API failure", "Integration error", "Sync problems"
-    ],
-    "data": [
-        "Data not loading", "Incorrect data displayed", "Data sync failure",
-        "Missing records", "Data corruption", "Database connection failed"
-    ],
-    "ui": [
-        "UI rendering issues", "Display problems", "Layout broken",
-        "Styling errors", "Mobile responsiveness issues"
-    ]
-}
 
-states = ["New", "In Progress", "Resolved", "Closed"]
-priorities = ["Low", "Medium", "High", "Critical"]
-
-# Resolution codes for resolved incidents
-resolution_codes = [
-    "Duplicate", "Known error", "No resolution provided", "Resolved by caller",
-    "Resolved by change", "Resolved by problem", "Resolved by request",
-    "Solution provided", "Workaround provided", "User error"
-]
-
-# Close notes templates for different resolution codes
-close_notes_templates = {
-    "Duplicate": [
-        "Duplicate of existing incident {inc_number}. Closing as duplicate.",
-        "This issue was already reported in {inc_number}. Marking as duplicate.",
-        "Duplicate ticket - original incident {inc_number} already addresses this issue."
-    ],
-    "Known error": [
-        "This is a known issue with documented workaround. Reference knowledge article KA{ka_id}.",
-        "Known system limitation. Engineering team aware and working on permanent fix.",
-        "Known error - temporary workaround applied until permanent solution is deployed."
-    ],
-    "No resolution provided": [
-        "Unable to reproduce the issue. No further action required at this time.",
-        "User unresponsive to follow-up attempts. Closing incident.",
-        "Issue could not be verified. No resolution provided."
-    ],
-    "Resolved by caller": [
-        "Caller reported issue resolved itself. No further action needed.",
-        "User found alternative solution. Incident resolved by caller.",
-        "Caller indicated the problem is no longer occurring."
-    ],
-    "Resolved by change": [
-        "Issue resolved by change request CHG{change_id}. System update addressed the problem.",
-        "Recent system change fixed the reported issue. Change {change_id} successfully implemented.",
-        "Deployment of patch resolved the incident. Change management ticket CHG{change_id}."
-    ],
-    "Resolved by problem": [
-        "Root cause identified and resolved via problem ticket PRB{problem_id}.",
-        "Underlying problem addressed through problem management. Reference PRB{problem_id}.",
-        "Permanent fix implemented via problem record {problem_id}."
-    ],
-    "Resolved by request": [
-        "Resolution provided as requested by user. All requirements met.",
-        "Service request fulfilled as specified. Incident closed.",
-        "User's specific request completed successfully."
-    ],
-    "Solution provided": [
-        "Step-by-step solution provided to user. Issue resolved.",
-        "Technical solution implemented. User confirmed resolution.",
-        "Configuration update resolved the issue. Solution documented."
-    ],
-    "Workaround provided": [
-        "Temporary workaround provided to restore service. Permanent fix pending.",
-        "User instructed on workaround procedure. Service restored temporarily.",
-        "Workaround implemented while engineering develops permanent solution."
-    ],
-    "User error": [
-        "User education provided on proper procedure. Issue resolved.",
-        "Training gap identified. User guided through correct process.",
-        "Misconfiguration corrected. User now able to proceed successfully."
-    ]
-}
-
-# Detailed description templates
-description_templates = [
-    "Users reporting {issue} with {service} affecting daily operations",
-    "System alert: {issue} detected in {service} environment",
-    "Multiple users experiencing {issue} when using {service}",
-    "Critical incident: {issue} impacting {service} functionality",
-    "Performance monitoring detected {issue} in {service}",
-    "User complaints about {issue} while accessing {service}",
-    "Service degradation: {issue} affecting {service} availability",
-    "Technical issue: {issue} preventing normal use of {service}",
-    "Outage reported: {issue} causing service interruption for {service}",
-    "Integration problem: {issue} between {service} and other systems"
-]
+def load_spec(path=default_spec_path):
+    """Parse a dataset spec JSON file"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
 
 
 def is_active(state):
@@ -187,112 +27,523 @@ def is_active(state):
     return state in ["New", "In Progress"]
 
 
-def generate_inc_number(incident_id):
-    base_number = incident_id + random.randint(1000, 9999)
-    inc_number = base_number % 10000000
-    return f"INC{inc_number:07d}"
+# INC numbers are a keyed permutation of the incident id: a 4-round Feistel
+# network over 24 bits, cycle-walked into the 7-digit space. Every id maps to
+# a distinct number without any "seen" set, and shards sharing a key agree.
+INC_NUMBER_SPACE = 10000000
+FEISTEL_HALF_BITS = 12
+FEISTEL_HALF_MASK = (1 << FEISTEL_HALF_BITS) - 1
+
+
+def inc_number_key(seed=None):
+    """Derive the four Feistel round keys used to number incidents"""
+    digest = hashlib.sha256(f"inc_number:{seed}".encode()).digest()
+    return tuple(int.from_bytes(digest[i:i + 4], "little") for i in range(0, 16, 4))
+
+
+default_inc_key = inc_number_key()
+
+
+def _feistel_round(half, round_key):
+    mixed = ((half ^ round_key) * 0x9E3779B1) & 0xFFFFFFFF
+    mixed ^= mixed >> 15
+    mixed = (mixed * 0x85EBCA6B) & 0xFFFFFFFF
+    return (mixed >> 13) & FEISTEL_HALF_MASK
+
 
+def permute_inc_number(incident_id, key=default_inc_key):
+    """Map an incident id to its unique INC number (as an integer).
 
-def generate_close_notes(resolution_code, inc_number):
+    Ids past the 7-digit space continue in further blocks of ten million,
+    so the numbers simply grow an eighth digit instead of wrapping.
+    """
+    block, value = divmod(incident_id, INC_NUMBER_SPACE)
+    while True:
+        left, right = value >> FEISTEL_HALF_BITS, value & FEISTEL_HALF_MASK
+        for round_key in key:
+            left, right = right, left ^ _feistel_round(right, round_key)
+        value = (left << FEISTEL_HALF_BITS) | right
+        # Cycle-walk until the value lands back inside the 7-digit space
+        if value < INC_NUMBER_SPACE:
+            return block * INC_NUMBER_SPACE + value
+
+
+def inc_number_id(inc_number, key=default_inc_key):
+    """Inverse of permute_inc_number: the incident id behind an INC number
+    (an integer or 'INC0001234'). Numbers outside the permutation give ids
+    that were never issued rather than an error."""
+    if isinstance(inc_number, str):
+        inc_number = int(inc_number[3:] if inc_number.startswith("INC") else inc_number)
+    block, value = divmod(inc_number, INC_NUMBER_SPACE)
+    while True:
+        left, right = value >> FEISTEL_HALF_BITS, value & FEISTEL_HALF_MASK
+        for round_key in reversed(key):
+            left, right = right ^ _feistel_round(left, round_key), left
+        value = (left << FEISTEL_HALF_BITS) | right
+        if value < INC_NUMBER_SPACE:
+            return block * INC_NUMBER_SPACE + value
+
+
+def generate_inc_number(incident_id, key=default_inc_key):
+    return f"INC{permute_inc_number(incident_id, key):07d}"
+
+
+# Close note placeholders and the ranges their numbers are drawn from
+placeholder_ranges = {
+    "inc_number": (1000, 9999),
+    "ka_id": (10000, 99999),
+    "change_id": (1000, 9999),
+    "problem_id": (1000, 9999),
+}
+placeholder_names = list(placeholder_ranges)
+
+
+def split_close_note(template):
+    """Split a close note template into (prefix, placeholder name, suffix)"""
+    for name in placeholder_names:
+        marker = "{" + name + "}"
+        if marker in template:
+            prefix, suffix = template.split(marker, 1)
+            return prefix, name, suffix
+    return template, None, ""
+
+
+def compile_close_notes(templates_by_code):
+    """Compile close note templates once, so per-row text is a lookup plus at
+    most one splice: (prefix, placeholder name, low, high, suffix) per
+    template, with name=None for fixed text."""
+    compiled = {}
+    for code, templates in templates_by_code.items():
+        compiled[code] = []
+        for template in templates:
+            prefix, name, suffix = split_close_note(template)
+            low, high = placeholder_ranges[name] if name else (None, None)
+            compiled[code].append((prefix, name, low, high, suffix))
+    return compiled
+
+
+def generate_close_notes(resolution_code, inc_number, rng=random, reference=None,
+                         close_notes=None):
+    """Close notes for a resolved incident.
+
+    Placeholders get random numbers, or with `reference` the text returned
+    by reference(placeholder_name), e.g. 'INC0001234' or '0000042'. A
+    reference of None (no earlier incident to point at) gives the generic
+    note. `close_notes` is a compile_close_notes() table (default: the
+    built-in templates).
+    """
     # Get templates safely; fall back to generic text if missing
-    templates = close_notes_templates.get(resolution_code)
+    templates = (close_notes or compiled_close_notes).get(resolution_code)
     if not templates:
         return "Incident resolved."
 
-    template = random.choice(templates)
+    prefix, name, low, high, suffix = rng.choice(templates)
+    if name is None:
+        return prefix
 
-    # Replace placeholders with realistic values
-    if "{inc_number}" in template:
+    if reference is not None:
+        token = reference(name)
+        if token is None:
+            return "Incident resolved."
+    elif name == "inc_number":
         # Generate a different incident number for duplicate references
-        ref_inc = random.randint(1000, 9999)
-        template = template.format(inc_number=f"INC{ref_inc:07d}")
-    elif "{ka_id}" in template:
-        template = template.format(ka_id=random.randint(10000, 99999))
-    elif "{change_id}" in template:
-        template = template.format(change_id=random.randint(1000, 9999))
-    elif "{problem_id}" in template:
-        template = template.format(problem_id=random.randint(1000, 9999))
+        token = f"INC{rng.randint(low, high):07d}"
+    else:
+        token = rng.randint(low, high)
+    return f"{prefix}{token}{suffix}"
+
+
+# Timestamps are whole seconds since 1970-01-01 on the naive local clock that
+# datetime.now() reports, so date math is integer arithmetic.
+SECONDS_PER_DAY = 86400
+EPOCH = datetime(1970, 1, 1)
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_time_of_day_strings = []
+
+
+def naive_epoch(moment):
+    """Whole seconds between 1970-01-01 and a naive datetime"""
+    return int((moment - EPOCH).total_seconds())
+
+
+def time_of_day_strings():
+    """'HH:MM:SS' for every second of the day, built once"""
+    if not _time_of_day_strings:
+        _time_of_day_strings.extend(
+            f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in range(SECONDS_PER_DAY))
+    return _time_of_day_strings
+
+
+@lru_cache(maxsize=None)
+def _day_prefix(day):
+    return (EPOCH + timedelta(days=day)).strftime("%Y-%m-%d ")
 
-    return template
 
+def format_epoch(epoch):
+    """Format epoch seconds like strftime(TIMESTAMP_FORMAT), from cached pieces"""
+    day, second = divmod(epoch, SECONDS_PER_DAY)
+    return _day_prefix(day) + time_of_day_strings()[second]
 
-def generate_dates(state):
+
+# Counter-based randomness: each draw for a row comes from a keyed hash of
+# (seed, incident id, counter), so any row or id range can be generated
+# without the ones before it
+_unpack_words = struct.Struct("<8Q").unpack
+
+
+def counter_key(seed=None):
+    """64-bit key of the counter-based generators for a master seed"""
+    digest = hashlib.sha256(f"counter:{seed}".encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+class CounterRandom(random.Random):
+    """random.Random whose draws are a pure function of (seed, incident id, counter).
+
+    start(incident_id) moves to that incident's own stream: 64-bit words
+    from BLAKE2b keyed by the seed over (incident id, block counter), eight
+    per hash. Draws below n take one word each as (word * n) >> 64 (bias
+    n / 2**64), so the usual choice/randint/random methods never loop.
+    generate_incident calls start() for every row, so no row depends on the
+    rows before it.
+    """
+
+    def seed(self, a=None, version=2):
+        self.key = counter_key(a).to_bytes(8, "little")
+        self.start(0)
+
+    def start(self, incident_id):
+        self.stream = incident_id.to_bytes(8, "little")
+        self.block = 0
+        # Unused words of the current block, next one last
+        self.words = []
+
+    def _word(self):
+        words = self.words
+        if not words:
+            self.block += 1
+            words = self.words = list(_unpack_words(hashlib.blake2b(
+                self.stream + self.block.to_bytes(4, "little"), key=self.key).digest()))
+        return words.pop()
+
+    def _randbelow(self, n):
+        return (self._word() * n) >> 64
+
+    def random(self):
+        return (self._word() >> 11) * 2.0 ** -53
+
+    def getrandbits(self, k):
+        value = 0
+        for shift in range(0, k, 64):
+            value |= self._word() << shift
+        return value & ((1 << k) - 1)
+
+    def getstate(self):
+        return self.key, self.stream, self.block, list(self.words)
+
+    def setstate(self, state):
+        self.key, self.stream, self.block, words = state
+        self.words = list(words)
+
+
+class GenerationContext:
+    """State shared by every row of one generation run.
+
+    `now` is the single reference time all dates are relative to: the
+    user-supplied as-of time, or the wall clock once at the start of the run,
+    so the bounds never drift during a long run. `rng` and `inc_key` default
+    to values derived from `seed`; `tables` (an IncidentTables) to the
+    built-in lookup tables. With `counter` the rng is a CounterRandom and
+    every row is a pure function of (seed, incident id); rows that point
+    close notes at `references` still depend on the incidents seen before.
+    `dates`, a callable (state, rng) -> (created, updated), replaces
+    generate_date_epochs, e.g. to create incidents in a narrower window.
+    """
+
+    def __init__(self, as_of=None, seed=None, rng=None, inc_key=None, references=None,
+                 tables=None, counter=False, dates=None):
+        self.now = as_of or datetime.now()
+        self.now_epoch = naive_epoch(self.now)
+        self.seed = seed
+        self.rng = rng or (CounterRandom(seed) if counter else random.Random(seed))
+        self.counter = isinstance(self.rng, CounterRandom)
+        self.inc_key = inc_key or inc_number_key(seed)
+        # Optional related_records.RelatedRecords that close notes point into
+        self.references = references
+        self.tables = tables
+        self.dates = dates
+
+
+def generate_date_epochs(state, now_epoch, rng=random):
+    """generate_dates on integer epoch seconds; returns (created, updated)"""
     # Created date in the last 12 months (365 days)
-    created_days_ago = random.randint(0, 365)
-    created_date = datetime.now() - timedelta(days=created_days_ago)
+    created_days_ago = rng.randint(0, 365)
+    created = now_epoch - created_days_ago * SECONDS_PER_DAY
+    return created, generate_updated_epoch(state, created, now_epoch, rng)
+
+
+def generate_updated_epoch(state, created, now_epoch, rng=random):
+    """Updated date of an incident in `state` created at `created`, by generate_dates' rules"""
+    created_days_ago = (now_epoch - created) // SECONDS_PER_DAY
 
     if state in ["New", "In Progress"]:
         # For active tickets, updated date is between created date and now, max 30 days span
-        max_days_difference = min((datetime.now() - created_date).days, 30)
+        max_days_difference = min(created_days_ago, 30)
 
         if max_days_difference > 0:
-            days_difference = random.randint(0, max_days_difference)
+            days_difference = rng.randint(0, max_days_difference)
         else:
             days_difference = 0
 
-        hours_difference = random.randint(0, 23)
-        minutes_difference = random.randint(0, 59)
-
-        updated_date = created_date + timedelta(
-            days=days_difference,
-            hours=hours_difference,
-            minutes=minutes_difference
-        )
-
-        # Ensure updated date doesn't exceed current date
-        if updated_date > datetime.now():
-            updated_date = datetime.now() - timedelta(hours=random.randint(1, 12))
+        hours_difference = rng.randint(0, 23)
 
     else:  # Resolved or Closed
         # For closed tickets, updated date is between 1 day and 60 days after created date
-        max_days_difference = min((datetime.now() - created_date).days, 60)
+        max_days_difference = min(created_days_ago, 60)
 
         if max_days_difference >= 1:
-            days_difference = random.randint(1, max_days_difference)
+            days_difference = rng.randint(1, max_days_difference)
         else:
             # If created_date is very recent, still move at least 1 day forward
             days_difference = 1
 
-        hours_difference = random.randint(1, 23)
-        minutes_difference = random.randint(0, 59)
-
-        updated_date = created_date + timedelta(
-            days=days_difference,
-            hours=hours_difference,
-            minutes=minutes_difference
-        )
-
-        # Ensure updated date doesn't exceed current date
-        if updated_date > datetime.now():
-            updated_date = datetime.now() - timedelta(hours=random.randint(1, 12))
-
-    return created_date, updated_date
-
-
-def generate_incident(incident_id):
-    service = random.choice(services)
-    incident_category = random.choice(list(incident_types.keys()))
-    issue_type = random.choice(incident_types[incident_category])
+        hours_difference = rng.randint(1, 23)
+
+    minutes_difference = rng.randint(0, 59)
+    updated = (created + days_difference * SECONDS_PER_DAY
+               + hours_difference * 3600 + minutes_difference * 60)
+
+    # Ensure updated date doesn't exceed current date (nor fall before created)
+    if updated > now_epoch:
+        updated = max(created, now_epoch - rng.randint(1, 12) * 3600)
+
+    return updated
+
+
+def generate_dates(state, now=None, rng=random):
+    """Created and updated datetimes for an incident in `state`, relative to `now`"""
+    if now is None:
+        now = datetime.now()
+    created, updated = generate_date_epochs(state, naive_epoch(now), rng)
+    return EPOCH + timedelta(seconds=created), EPOCH + timedelta(seconds=updated)
+
+
+active_states = ["New", "In Progress"]
+closed_states = ["Resolved", "Closed"]
+
+
+class WeightedChoice:
+    """Values with optional weights, sampled in O(1) per draw (alias method).
+
+    Without weights (or with equal ones) draws are plain rng.choice /
+    rng.integers calls, so they consume exactly the randomness the
+    generator always has and a seed keeps producing the same rows.
+    """
+
+    def __init__(self, values, weights=None):
+        self.values = list(values)
+        self.indices = range(len(self.values))
+        if weights is not None and len(weights) != len(self.values):
+            raise ValueError("need one weight per value")
+        if weights is not None and (min(weights) < 0 or sum(weights) <= 0):
+            raise ValueError("weights must be non-negative and not all zero")
+        self.uniform = weights is None or len(set(weights)) == 1
+        self.weights = None if self.uniform else [float(w) for w in weights]
+        self.prob = self.alias = None
+        self._arrays = None
+        if not self.uniform:
+            self.prob, self.alias = self._alias_table(self.weights)
+
+    @staticmethod
+    def _alias_table(weights):
+        """Vose's alias method: (probability, alias) lists"""
+        n = len(weights)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        prob, alias = [1.0] * n, list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            low, high = small.pop(), large.pop()
+            prob[low], alias[low] = scaled[low], high
+            scaled[high] -= 1 - scaled[low]
+            (small if scaled[high] < 1 else large).append(high)
+        return prob, alias
+
+    def index(self, rng):
+        """Draw one index with a random.Random-like rng"""
+        i = rng.choice(self.indices)
+        if self.uniform or rng.random() < self.prob[i]:
+            return i
+        return self.alias[i]
+
+    def choice(self, rng):
+        """Draw one value with a random.Random-like rng"""
+        if self.uniform:
+            return rng.choice(self.values)
+        return self.values[self.index(rng)]
+
+    def sample(self, rng, count):
+        """Draw `count` indices at once with a NumPy Generator"""
+        index = rng.integers(0, len(self.values), count)
+        if self.uniform:
+            return index
+        import numpy as np
+
+        if self._arrays is None:
+            self._arrays = np.array(self.prob), np.array(self.alias, dtype=np.int64)
+        prob, alias = self._arrays
+        return np.where(rng.random(count) < prob[index], index, alias[index])
+
+    def __getstate__(self):
+        # NumPy arrays are rebuilt on demand, which keeps pickles small and numpy-free
+        return dict(self.__dict__, _arrays=None)
+
+
+class IncidentTables:
+    """The lookup tables incidents are drawn from, compiled for fast sampling.
+
+    `weights` maps 'services', 'incident_categories', 'states', 'priorities',
+    'impact_levels' and 'resolution_codes' to one weight per value; anything
+    not listed is uniform. Every (service, category) pair is expanded once
+    into its issues as (issue, short description, description per
+    template), so per-row text is only lookups. See dataset_spec.py for
+    building these from a spec file.
+    """
+
+    def __init__(self, services, incident_types, states, priorities, impact_levels,
+                 resolution_codes, close_notes_templates, description_templates, weights=None):
+        weights = weights or {}
+        unknown = [state for state in states if state not in active_states + closed_states]
+        if unknown:
+            raise ValueError(f"Unknown states {unknown}; the Active rule only knows "
+                             f"{active_states + closed_states}")
+        self.incident_types = {category: list(issues) for category, issues in incident_types.items()}
+        self.services = WeightedChoice(services, weights.get("services"))
+        self.categories = WeightedChoice(self.incident_types, weights.get("incident_categories"))
+        self.states = WeightedChoice(states, weights.get("states"))
+        self.priorities = WeightedChoice(priorities, weights.get("priorities"))
+        self.impact_levels = WeightedChoice(impact_levels, weights.get("impact_levels"))
+        self.resolution_codes = WeightedChoice(resolution_codes, weights.get("resolution_codes"))
+        self.close_notes_templates = {code: list(t) for code, t in close_notes_templates.items()}
+        self.description_templates = list(description_templates)
+        self.capitalized_categories = [c.capitalize() for c in self.categories.values]
+        self.close_notes = compile_close_notes(self.close_notes_templates)
+        self.issues = [
+            [
+                [(issue, f"{service.split()[0]} {issue}",
+                  tuple(template.format(issue=issue.lower(), service=service)
+                        for template in self.description_templates))
+                 for issue in self.incident_types[category]]
+                for category in self.categories.values
+            ]
+            for service in self.services.values
+        ]
+
+    def same_values(self, other):
+        """True when both hold the same values and templates (weights may differ)"""
+        return all(getattr(self, name).values == getattr(other, name).values
+                   for name in ("services", "categories", "states", "priorities",
+                                "impact_levels", "resolution_codes")) and (
+            self.incident_types == other.incident_types
+            and self.close_notes_templates == other.close_notes_templates
+            and self.description_templates == other.description_templates)
+
+
+spec_weighted_fields = ["services", "states", "priorities", "impact_levels", "resolution_codes"]
+
+
+def _spec_values_and_weights(field, entry):
+    if isinstance(entry, dict):
+        return list(entry), [float(w) for w in entry.values()]
+    if isinstance(entry, list):
+        return list(entry), None
+    raise ValueError(f"'{field}' must be a list of values or an object of value: weight")
+
+
+def tables_from_spec(spec):
+    """Build an IncidentTables from a parsed spec (see dataset_spec.py)"""
+    missing = [field for field in spec_weighted_fields + ["incident_types", "close_notes_templates",
+                                                          "description_templates"]
+               if field not in spec]
+    if missing:
+        raise ValueError(f"Spec is missing {missing}")
+
+    values, weights = {}, {}
+    for field in spec_weighted_fields:
+        values[field], field_weights = _spec_values_and_weights(field, spec[field])
+        if field_weights:
+            weights[field] = field_weights
+
+    incident_types, category_weights = {}, []
+    for category, entry in spec["incident_types"].items():
+        if isinstance(entry, dict):
+            incident_types[category] = list(entry["issues"])
+            category_weights.append(float(entry.get("weight", 1)))
+        else:
+            incident_types[category] = list(entry)
+            category_weights.append(1.0)
+    weights["incident_categories"] = category_weights
+
+    unknown = [code for code in values["resolution_codes"]
+               if code not in spec["close_notes_templates"]]
+    if unknown:
+        raise ValueError(f"No close_notes_templates for resolution codes {unknown}")
+
+    return IncidentTables(
+        values["services"], incident_types, values["states"], values["priorities"],
+        values["impact_levels"], values["resolution_codes"], spec["close_notes_templates"],
+        spec["description_templates"], weights)
+
+
+default_tables = tables_from_spec(load_spec())
+# The built-in values, for the batch engine and the other scripts
+services = default_tables.services.values
+incident_types = default_tables.incident_types
+states = default_tables.states.values
+priorities = default_tables.priorities.values
+impact_levels = default_tables.impact_levels.values
+resolution_codes = default_tables.resolution_codes.values
+close_notes_templates = default_tables.close_notes_templates
+description_templates = default_tables.description_templates
+incident_categories = default_tables.categories.values
+compiled_issues = default_tables.issues
+compiled_close_notes = default_tables.close_notes
+
+
+def generate_incident(incident_id, context=None):
+    if context is None:
+        context = GenerationContext(rng=random, inc_key=default_inc_key)
+    rng = context.rng
+    if context.counter:
+        rng.start(incident_id)
+    tables = context.tables or default_tables
+
+    service_index = tables.services.index(rng)
+    category_index = tables.categories.index(rng)
+    issue_type, short_description, descriptions = rng.choice(
+        tables.issues[service_index][category_index])
+    service = tables.services.values[service_index]
 
     # Generate INC number
-    inc_number = generate_inc_number(incident_id)
-
-    # Create short description
-    short_description = f"{service.split()[0]} {issue_type}"
+    inc_number = generate_inc_number(incident_id, context.inc_key)
 
-    # Create detailed description
-    description_template = random.choice(description_templates)
-    description = description_template.format(issue=issue_type.lower(), service=service)
+    # Detailed description from the precompiled templates
+    description = rng.choice(descriptions)
 
-    state = random.choice(states)
-    priority = random.choice(priorities)
+    state = tables.states.choice(rng)
+    priority = tables.priorities.choice(rng)
 
     # Generate created and updated dates (within last 12 months)
-    created_date, updated_date = generate_dates(state)
+    if context.dates:
+        created, updated = context.dates(state, rng)
+    else:
+        created, updated = generate_date_epochs(state, context.now_epoch, rng)
 
     # Generate random impact and urgency
-    impact = random.choice(["Low", "Medium", "High", "Critical"])
-    urgency = random.choice(["Low", "Medium", "High", "Critical"])
+    impact = tables.impact_levels.choice(rng)
+    urgency = tables.impact_levels.choice(rng)
 
     # Determine Active field based on state
     active = is_active(state)
@@ -301,9 +552,17 @@ def generate_incident(incident_id):
     resolution_code = ""
     close_notes = ""
 
+    references = context.references
     if state in ["Resolved", "Closed"]:
-        resolution_code = random.choice(resolution_codes)
-        close_notes = generate_close_notes(resolution_code, inc_number)
+        resolution_code = tables.resolution_codes.choice(rng)
+        reference = None
+        if references:
+            reference = references.resolver(inc_number, service, short_description, priority,
+                                            created, updated)
+        close_notes = generate_close_notes(resolution_code, inc_number, rng, reference,
+                                           tables.close_notes)
+    if references:
+        references.add_incident(inc_number, service, short_description, created)
 
     return [
         inc_number,  # INC number as the first column
@@ -311,41 +570,363 @@ def generate_incident(incident_id):
         short_description,
         description,
         service,
-        incident_category.capitalize(),
+        tables.capitalized_categories[category_index],
         state,
         priority,
         impact,
         urgency,
-        created_date.strftime("%Y-%m-%d %H:%M:%S"),
-        updated_date.strftime("%Y-%m-%d %H:%M:%S"),
+        format_epoch(created),
+        format_epoch(updated),
         resolution_code,
         close_notes,
         active  # Active field
     ]
 
 
-# Generate 15,000 records
-print("Generating 15,000 incident records with Active field and 12-month date range...")
-print(f"Total services available: {len(services)}")
-
-with open('incidents_15000.csv', 'w', newline='', encoding='utf-8') as csvfile:
-    writer = csv.writer(csvfile)
-
-    # Write header with new Active field
-    writer.writerow([
-        'inc_number', 'id', 'short_description', 'description', 'service',
-        'incident_category', 'state', 'priority', 'impact',
-        'urgency', 'created_date', 'updated_date', 'resolution_code', 'close_notes', 'Active'
-    ])
+def iter_incidents(count, seed=None, start_id=1, now=None, batch_size=None, inc_key=None,
+                   arrivals=None, tables=None, stats=None, counter=False):
+    """Lazily yield `count` incident rows with ids start_id, start_id + 1, ...
+
+    Rows use a private random.Random seeded from `seed` (or a NumPy generator
+    when `batch_size` selects the vectorized engine), so iterating never
+    touches the global random state. Only one row, or one batch, is held in
+    memory at a time. INC numbers come from `inc_key` (derived from `seed`
+    by default); sharded runs pass the master key so numbers stay unique.
+    Dates are relative to `now`, the as-of time (default: the wall clock
+    when iteration starts). `arrivals`, an arrival_model.ArrivalSampler,
+    replaces the uniform date model and implies the batch engine. `tables`
+    (an IncidentTables, e.g. from dataset_spec.load_tables) replaces the
+    built-in lookup tables. `stats`, an incident_stats.IncidentStats, counts
+    every row or batch as it is generated. With `counter` each row is a pure
+    function of (seed, id) (CounterRandom, or incident_batch.CounterGenerator
+    for the batch engine), so any id range can be generated on its own and
+    gives the same rows as the full run.
+    """
+    context = GenerationContext(now, seed, inc_key=inc_key, tables=tables, counter=counter)
+    if arrivals is not None:
+        batch_size = batch_size or 100000
+
+    if batch_size:
+        # Columnar NumPy engine; strings are only built when rows are consumed
+        from incident_batch import iter_incident_batches
+
+        for batch in iter_incident_batches(count, seed, start_id, context.now, batch_size,
+                                           context.inc_key, arrivals, tables or default_tables,
+                                           counter):
+            if stats is not None:
+                stats.add_batch(batch)
+            yield from batch.rows()
+        return
+
+    stop_id = start_id + count
+    if stats is not None:
+        # Count rows a block at a time, so the counters run in C
+        for block_start in range(start_id, stop_id, 1000):
+            rows = [generate_incident(i, context)
+                    for i in range(block_start, min(block_start + 1000, stop_id))]
+            stats.add_rows(rows)
+            yield from rows
+        return
+
+    for i in range(start_id, stop_id):
+        yield generate_incident(i, context)
+
+
+csv_header = [
+    'inc_number', 'id', 'short_description', 'description', 'service',
+    'incident_category', 'state', 'priority', 'impact',
+    'urgency', 'created_date', 'updated_date', 'resolution_code', 'close_notes', 'Active'
+]
 
-    # Write 15,000 records
-    for i in range(1, 15001):
-        if i % 1500 == 0:
-            print(f"Generated {i} records...")
-        writer.writerow(generate_incident(i))
 
-print("File 'incidents_15000.csv' created successfully with 15,000 records!")
-print(f"Services used: {len(services)} different enterprise services")
-print("INC numbers format: INC followed by 7 digits (e.g., INC0001234)")
-print("Active field added: true for 'New' or 'In Progress', false for 'Resolved' or 'Closed'")
-print("Date range: incidents created within the last 12 months")
+def write_incidents(sink, rows, progress=print, progress_every=1500, progress_interval=1.0):
+    """Stream rows into a sink in chunks of `progress_every` rows.
+
+    Progress (count and rows/s) is reported at most every `progress_interval`
+    seconds and once at the end, so fast runs are not flooded with output.
+    """
+    rows = iter(rows)
+    written = 0
+    started = last_report = time.monotonic()
+    while True:
+        chunk = list(islice(rows, progress_every))
+        if chunk:
+            sink.write_rows(chunk)
+            written += len(chunk)
+        if not progress:
+            if not chunk:
+                return written
+            continue
+        now = time.monotonic()
+        if not chunk or now - last_report >= progress_interval:
+            last_report = now
+            rate = written / (now - started) if now > started else 0.0
+            progress(f"Generated {written} records... ({rate:,.0f} rows/s)")
+        if not chunk:
+            return written
+
+
+def write_incidents_csv(path, count, batch_size=None, seed=None, now=None, progress=print,
+                        compression=None, chunk_bytes=None, arrivals=None, tables=None,
+                        progress_interval=1.0, stats=None, start_id=1, counter=False,
+                        offset_index=False):
+    """Write `count` incidents, ids from `start_id` on, as CSV to `path` ('-' for stdout)
+
+    With `compression` ('gzip' or 'zstd') the CSV is compressed by a
+    background thread, optionally split into parts of at most `chunk_bytes`.
+    With `offset_index` a plain CSV file also gets an offset index for fast
+    lookups (see offset_index.py).
+    """
+    from incident_sinks import CompressedCsvSink, CsvSink
+
+    if compression:
+        sink = CompressedCsvSink(path, compression, chunk_bytes=chunk_bytes)
+    elif offset_index:
+        from offset_index import IndexedCsvSink
+
+        sink = IndexedCsvSink(path)
+    else:
+        sink = CsvSink.open(path)
+    with sink:
+        rows = iter_incidents(count, seed=seed, start_id=start_id, now=now, batch_size=batch_size,
+                              arrivals=arrivals, tables=tables, stats=stats, counter=counter)
+        return write_incidents(sink, rows, progress=progress, progress_interval=progress_interval)
+
+
+def id_range(text):
+    """argparse type for an inclusive 'START-STOP' range of incident ids"""
+    start, separator, stop = text.partition("-")
+    try:
+        start, stop = int(start), int(stop)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected START-STOP, got {text!r}") from None
+    if not separator or start < 1 or stop < start:
+        raise argparse.ArgumentTypeError(f"expected 1 <= START <= STOP, got {text!r}")
+    return start, stop
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate ServiceNow incident records as CSV")
+    parser.add_argument("--count", type=int, default=15000, help="number of incidents to generate")
+    parser.add_argument("--output", default="incidents_15000.csv",
+                        help="CSV file to write, or '-' to stream to stdout")
+    parser.add_argument("--batch-size", type=int, default=0,
+                        help="generate rows in vectorized NumPy batches of this size")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="master seed; the same seed and shard count reproduce the same rows")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="split the id range into this many independently seeded shards")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for sharded generation (default: CPU count)")
+    parser.add_argument("--part-files", action="store_true",
+                        help="keep one CSV per shard instead of merging them in id order")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None,
+                        help="reference 'now' for all dates, e.g. '2026-01-31 23:59:59' "
+                             "(default: the current time, pinned once per run)")
+    parser.add_argument("--format", choices=["csv", "parquet", "dict-csv"], default="csv",
+                        help="output format; parquet and dict-csv are columnar and dictionary-encoded")
+    parser.add_argument("--checkpoint-every", type=int, default=0,
+                        help="flush the CSV and save a resumable checkpoint every N rows")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted --checkpoint-every run from its last checkpoint")
+    parser.add_argument("--compress", choices=["gzip", "zstd"], default=None,
+                        help="compress the CSV on the fly in a background thread (zstd needs zstandard)")
+    parser.add_argument("--chunk-mb", type=float, default=0,
+                        help="with --compress, split the output into parts of at most this many MB")
+    parser.add_argument("--arrival-model", default=None, metavar="JSON",
+                        help="seasonal/bursty arrival model for dates: 'default' or a JSON file "
+                             "of arrival_model.ArrivalModel settings (uses the batch engine)")
+    parser.add_argument("--spec", default=None,
+                        help="dataset spec JSON with the tables and weights to draw from "
+                             "(see dataset_spec.py; default: the built-in tables)")
+    parser.add_argument("--progress-interval", type=float, default=1.0,
+                        help="seconds between progress lines (0: after every chunk of rows)")
+    parser.add_argument("--metrics-json", default=None,
+                        help="record per-stage timings, rows/s and bytes written to this JSON file")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve the metrics in Prometheus text format on 127.0.0.1:PORT/metrics")
+    parser.add_argument("--stats", action="store_true",
+                        help="count value distributions, resolution times and created dates while "
+                             "generating; writes <output>.stats.json and <output>.stats.md")
+    parser.add_argument("--partition-by", choices=["day", "week", "month"], default=None,
+                        help="write one created_date-sorted CSV per day, ISO week or month "
+                             "(<root>.<period>.csv), using an external merge sort")
+    parser.add_argument("--memory-mb", type=float, default=512,
+                        help="with --partition-by, rows held in memory before a sorted run is "
+                             "spilled to disk")
+    parser.add_argument("--rng", choices=["mt", "counter"], default="mt",
+                        help="'mt' draws every row from one sequential stream; 'counter' makes "
+                             "each row a function of (seed, id), so any id range can be "
+                             "regenerated on its own")
+    parser.add_argument("--ids", type=id_range, default=None, metavar="START-STOP",
+                        help="generate only incidents START..STOP (inclusive) of a --rng counter "
+                             "run, e.g. 30000000-30010000; implies --rng counter and needs "
+                             "that run's --seed and --as-of")
+    parser.add_argument("--offset-index", action="store_true",
+                        help="also write <output>.offsets.idx mapping inc_number and id to byte "
+                             "offsets, for lookups with offset_index.py")
+    args = parser.parse_args()
+    if args.stats and args.output == "-":
+        parser.error("--stats writes its report next to --output; it needs a file")
+    if args.compress and (args.format != "csv" or args.shards > 1 or args.checkpoint_every
+                          or args.resume or args.output == "-"):
+        parser.error("--compress writes a single CSV file; drop --format/--shards/--checkpoint-every")
+    if args.format != "csv" and args.shards > 1:
+        parser.error("--format parquet/dict-csv writes a single file; drop --shards")
+    if args.shards > 1 and args.output == "-":
+        parser.error("--shards writes part files next to --output; it needs a file")
+    checkpointed = args.checkpoint_every or args.resume
+    if checkpointed and (args.format != "csv" or args.shards > 1 or args.output == "-"):
+        parser.error("--checkpoint-every/--resume need a single CSV file as --output")
+    if args.partition_by and (args.format != "csv" or args.shards > 1 or checkpointed
+                              or args.compress or args.output == "-"):
+        parser.error("--partition-by writes plain CSV partition files; drop --format/--shards/"
+                     "--checkpoint-every/--compress")
+    if args.offset_index and (args.format != "csv" or args.compress or args.partition_by
+                              or args.part_files or args.output == "-"):
+        parser.error("--offset-index indexes one plain CSV file; drop --format/--compress/"
+                     "--partition-by/--part-files")
+    start_id = 1
+    if args.ids:
+        if args.seed is None:
+            parser.error("--ids regenerates part of a seeded run; pass that run's --seed")
+        if args.shards > 1 or checkpointed:
+            parser.error("--ids writes one id range; drop --shards/--checkpoint-every/--resume")
+        args.rng = "counter"
+        start_id, stop_id = args.ids
+        args.count = stop_id - start_id + 1
+    counter = args.rng == "counter"
+    if counter and args.arrival_model:
+        parser.error("--arrival-model draws per outage, not per id; it needs --rng mt")
+    if (args.arrival_model or args.spec) and checkpointed:
+        parser.error("--arrival-model/--spec are not supported with --checkpoint-every/--resume")
+
+    tables = None
+    if args.spec:
+        from dataset_spec import load_tables
+
+        tables = load_tables(args.spec)
+        # The batch engine only reweights the built-in values (incident_batch.check_tables)
+        batch_engine = args.batch_size or args.format != "csv" or args.arrival_model
+        if batch_engine and not tables.same_values(default_tables):
+            parser.error("--spec with custom values needs the row engine; "
+                         "drop --batch-size/--format/--arrival-model")
+
+    # One reference time for the whole run, shared by every shard or batch
+    now = args.as_of or datetime.now()
+
+    metrics = None
+    if args.metrics_json or args.metrics_port:
+        import instrumentation
+
+        # Timing shims are only installed on request; sharded workers are not measured
+        metrics = instrumentation.enable(generator=sys.modules[__name__])
+        if args.metrics_port:
+            metrics.serve(args.metrics_port)
+
+    arrivals = None
+    if args.arrival_model:
+        from arrival_model import ArrivalModel
+
+        if args.arrival_model == "default":
+            model = ArrivalModel()
+        else:
+            model = ArrivalModel.load(args.arrival_model)
+        # Compiled once from the master seed so every batch and shard shares the outages
+        arrivals = model.sampler(now, args.seed)
+
+    stats = None
+    if args.stats:
+        from incident_stats import IncidentStats
+
+        stats = IncidentStats()
+
+    # Keep stdout clean for the data when streaming
+    log = print if args.output != "-" else partial(print, file=sys.stderr)
+
+    if counter and args.seed is None and not args.resume:
+        # Rows of a counter run are only worth regenerating with its seed
+        args.seed = int.from_bytes(os.urandom(8), "little")
+        log(f"Using master seed {args.seed}")
+    log(f"Generating {args.count:,} incident records with Active field and 12-month date range...")
+    log(f"Total services available: {len(services)}")
+
+    if args.format != "csv":
+        from columnar_output import write_columnar
+
+        # Columnar output always uses the batch engine; each batch is one row group
+        write_columnar(args.output, args.count, args.format, seed=args.seed, now=now,
+                       batch_size=args.batch_size or 100000, progress=log, arrivals=arrivals,
+                       tables=tables, stats=stats, start_id=start_id, counter=counter)
+    elif checkpointed:
+        from checkpointed_generation import write_checkpointed
+
+        # On --resume the count, seed, as-of time, batch size and RNG come from the checkpoint
+        write_checkpointed(args.output, args.count, args.checkpoint_every or 1000000,
+                           seed=args.seed, now=now, batch_size=args.batch_size,
+                           resume=args.resume, progress=log, stats=stats, counter=counter)
+    elif args.partition_by:
+        from partitioned_output import write_partitioned
+
+        partitions = write_partitioned(args.output, args.count, args.partition_by,
+                                       memory_mb=args.memory_mb, seed=args.seed, now=now,
+                                       batch_size=args.batch_size, arrivals=arrivals,
+                                       tables=tables, stats=stats, progress=log,
+                                       start_id=start_id, counter=counter)
+        log(f"Split into {len(partitions)} {args.partition_by} partitions")
+    elif args.shards > 1:
+        from sharded_generation import generate_sharded
+
+        paths = generate_sharded(args.output, args.count, args.shards, workers=args.workers,
+                                 seed=args.seed, batch_size=args.batch_size,
+                                 merge=not args.part_files, now=now, arrivals=arrivals,
+                                 tables=tables, stats=stats, counter=counter, progress=log)
+        if args.part_files:
+            log(f"Kept {len(paths)} part files: {', '.join(paths)}")
+    elif args.compress:
+        from incident_sinks import CompressedCsvSink, compression_suffixes
+
+        if not args.output.endswith(compression_suffixes[args.compress]):
+            args.output += compression_suffixes[args.compress]
+        with CompressedCsvSink(args.output, args.compress,
+                               chunk_bytes=int(args.chunk_mb * 1024 * 1024) or None) as sink:
+            rows = iter_incidents(args.count, seed=args.seed, start_id=start_id, now=now,
+                                  batch_size=args.batch_size, arrivals=arrivals, tables=tables,
+                                  stats=stats, counter=counter)
+            write_incidents(sink, rows, progress=log, progress_interval=args.progress_interval)
+        if args.chunk_mb:
+            log(f"Split into {len(sink.paths)} parts: {', '.join(sink.paths)}")
+    else:
+        write_incidents_csv(args.output, args.count, batch_size=args.batch_size, seed=args.seed,
+                            now=now, progress=log, arrivals=arrivals, tables=tables,
+                            progress_interval=args.progress_interval, stats=stats,
+                            start_id=start_id, counter=counter, offset_index=args.offset_index)
+
+    if args.offset_index:
+        from offset_index import build_index, index_paths
+
+        if checkpointed or args.shards > 1:
+            # Merged shards and resumed files are indexed in one pass once complete
+            build_index(args.output)
+        log(f"Offset index written to '{index_paths(args.output)[0]}'")
+
+    if stats is not None:
+        log(f"Stats written to {' and '.join(stats.write_report(args.output))}")
+    if args.metrics_json:
+        metrics.dump(args.metrics_json)
+        log(f"Metrics written to '{args.metrics_json}'")
+
+    if args.compress and args.chunk_mb or args.shards > 1 and args.part_files:
+        # Chunked and unmerged output has no file named args.output, only its parts
+        parts = sink.paths if args.compress else paths
+        log(f"{len(parts)} part files created successfully with {args.count:,} records!")
+    else:
+        log(f"File '{args.output}' created successfully with {args.count:,} records!")
+    log(f"Services used: {len(services)} different enterprise services")
+    log("INC numbers format: INC followed by 7 digits (e.g., INC0001234), unique per id")
+    log("Active field added: true for 'New' or 'In Progress', false for 'Resolved' or 'Closed'")
+    log("Date range: incidents created within the last 12 months")
+
+
+if __name__ == "__main__":
+    main()
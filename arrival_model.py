@@ -0,0 +1,141 @@
+"""Time-series arrival model for the batch engine.
+
+The default generate_batch_dates spreads incidents evenly over the last 365
+days. An ArrivalModel instead gives load that looks like real traffic:
+
+* seasonality - every hour of the window is weighted by its weekday and
+  hour-of-day, so weekday business hours are busy and weekend nights quiet,
+* outage bursts - each service gets a few outages at random points in the
+  window, and a share of that service's incidents cluster inside them,
+* resolution times - updated dates are created + the state's minimum + a
+  log-normal duration whose median and spread depend on the state, capped
+  at generate_dates' bounds: active tickets at most 30 days after creation,
+  closed ones 1 day and 1 hour to 60 days after it. Shifting rather than
+  clipping at the minimum keeps the log-normal shape; only the tail is cut. As in generate_dates, an updated date
+  past `now` falls back to 1-12 hours before `now`, but never before
+  created, so closed tickets created in the last day can be updated sooner.
+
+A model is configuration only. `ArrivalModel.sampler(now, seed)` compiles it
+into an ArrivalSampler: hourly CDF and outage windows, fixed for the whole run
+so every batch and shard shares them. Sampling is then a couple of
+searchsorted calls per batch.
+
+Models can be loaded from JSON with the same keys as the constructor, e.g.
+    {"window_days": 180, "burst_share": 0.3, "outages_per_service": 6}
+"""
+import json
+
+import numpy as np
+
+from Generate_Records_v3 import SECONDS_PER_DAY, naive_epoch, services, states
+
+# Relative incident volume per weekday (Monday first) and hour of day
+weekday_weights = [1.0, 1.05, 1.0, 0.95, 0.85, 0.3, 0.25]
+hour_weights = [
+    0.15, 0.1, 0.1, 0.1, 0.12, 0.2, 0.4, 0.7, 1.0, 1.2, 1.25, 1.15,
+    0.95, 1.05, 1.15, 1.1, 0.95, 0.75, 0.55, 0.45, 0.35, 0.3, 0.25, 0.2,
+]
+
+# State -> (median hours past the minimum, log-normal sigma, min hours, max hours) from
+# created to updated. generate_dates moves closed tickets at least 1 day and 1 hour forward.
+resolution_hours = {
+    "New": (0.5, 1.2, 0, 30 * 24),
+    "In Progress": (30, 1.1, 0, 30 * 24),
+    "Resolved": (10, 1.3, 25, 60 * 24),
+    "Closed": (72, 0.8, 25, 60 * 24),
+}
+
+
+class ArrivalModel:
+    """Configuration of the arrival process; see the module docstring"""
+
+    def __init__(self, window_days=365, weekday_weights=weekday_weights,
+                 hour_weights=hour_weights, outages_per_service=4, burst_share=0.2,
+                 outage_hours=(1, 12), resolution_hours=resolution_hours):
+        if len(weekday_weights) != 7 or len(hour_weights) != 24:
+            raise ValueError("weekday_weights needs 7 values and hour_weights 24")
+        if not 0 <= burst_share <= 1:
+            raise ValueError("burst_share must be between 0 and 1")
+        self.window_days = window_days
+        self.weekday_weights = list(weekday_weights)
+        self.hour_weights = list(hour_weights)
+        self.outages_per_service = outages_per_service
+        self.burst_share = burst_share
+        self.outage_hours = tuple(outage_hours)
+        self.resolution_hours = dict(resolution_hours)
+        missing = [state for state in states if state not in self.resolution_hours]
+        if missing:
+            raise ValueError(f"resolution_hours has no entry for {missing}")
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(**json.load(f))
+
+    def sampler(self, now, seed=None):
+        """Compile the model for one run ending at `now`"""
+        return ArrivalSampler(self, naive_epoch(now), seed)
+
+
+class ArrivalSampler:
+    """An ArrivalModel compiled for one reference time and seed"""
+
+    def __init__(self, model, now_epoch, seed=None):
+        self.model = model
+        self.now_epoch = now_epoch
+        service_count = len(services)
+        rng = np.random.default_rng(seed)
+
+        # One bin per clock hour, the last one holding `now`
+        hours = model.window_days * 24
+        last_hour = now_epoch // 3600
+        self.hour_starts = np.arange(last_hour - hours + 1, last_hour + 1, dtype=np.int64) * 3600
+        days = self.hour_starts // SECONDS_PER_DAY
+        # 1970-01-01 was a Thursday
+        weekday = (days + 3) % 7
+        weights = (np.array(model.weekday_weights)[weekday]
+                   * np.array(model.hour_weights)[self.hour_starts // 3600 % 24])
+        self.hour_cdf = np.cumsum(weights) / weights.sum()
+
+        # Outages: (service, start, length) laid out service by service
+        counts = rng.poisson(model.outages_per_service, service_count)
+        total = int(counts.sum())
+        self.outage_service = np.repeat(np.arange(service_count), counts)
+        # Outages start where load is, so sample their hour from the seasonal CDF too
+        self.outage_start = self.hour_starts[self._seasonal_hours(rng, total)]
+        low, high = model.outage_hours
+        self.outage_length = rng.integers(low * 3600, high * 3600 + 1, total)
+        self.outage_first = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        self.outage_count = counts
+
+        self.resolution = np.array(
+            [model.resolution_hours[state] for state in states], dtype=np.float64)
+
+    def _seasonal_hours(self, rng, count):
+        return np.minimum(np.searchsorted(self.hour_cdf, rng.random(count), side="right"),
+                          len(self.hour_cdf) - 1)
+
+    def created(self, service, rng):
+        """Created epoch per row for the given service codes"""
+        count = len(service)
+        created = self.hour_starts[self._seasonal_hours(rng, count)] + rng.integers(0, 3600, count)
+
+        # A share of each service's incidents land inside one of its outages
+        in_burst = (rng.random(count) < self.model.burst_share) & (self.outage_count[service] > 0)
+        burst_service = service[in_burst]
+        outage = (self.outage_first[burst_service]
+                  + rng.integers(0, np.maximum(self.outage_count[burst_service], 1)))
+        created[in_burst] = (self.outage_start[outage]
+                             + (rng.random(len(outage)) * self.outage_length[outage]).astype(np.int64))
+        return np.minimum(created, self.now_epoch)
+
+    def dates(self, service, state, rng):
+        """(created, updated) epoch seconds per row; the batch engine's arrival hook"""
+        created = self.created(service, rng)
+        median, sigma, low, high = self.resolution[state].T
+        hours = np.minimum(low + median * np.exp(sigma * rng.standard_normal(len(state))), high)
+        updated = created + (hours * 3600).astype(np.int64)
+        # Past `now`: 1-12 hours before it, never before created, like generate_dates
+        fallback = np.maximum(created, self.now_epoch - rng.integers(1, 13, len(state)) * 3600)
+        updated = np.where(updated > self.now_epoch, fallback, updated)
+        return created, updated
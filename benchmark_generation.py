@@ -0,0 +1,260 @@
+"""Throughput and memory benchmarks for incident generation.
+
+Every (mode, size) case runs in a fresh subprocess so its peak RSS is its
+own. A case first measures end-to-end rows/s writing CSV to a scratch file,
+then times the individual phases on a sample of rows:
+
+* ``row`` mode (generate_incident): choice sampling, date math, close
+  notes, string formatting and CSV write, replaying the calls
+  generate_incident makes so the phases add up to its per-row cost,
+* ``batch`` mode (incident_batch): sampling, vectorized date math, string
+  materialization and CSV write,
+* ``sharded`` mode: end-to-end only (phases are those of the row path).
+
+Peak RSS is that of the case's own process. Sharded workers run at the same
+time, so their figure is the largest single worker; all of them together
+can use up to workers x that much.
+
+Results are saved as JSON; ``--baseline`` compares against an earlier run
+and exits non-zero when a case got slower than ``--tolerance``.
+
+Examples:
+    python benchmark_generation.py --sizes 10000,1000000 --output bench.json
+    python benchmark_generation.py --baseline bench.json --output bench-new.json
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import Generate_Records_v3 as generator
+
+DEFAULT_SIZES = [10000, 1000000, 10000000]
+MODES = ["row", "batch", "sharded"]
+PHASE_SAMPLE = 100000
+
+
+def peak_rss_mb():
+    """Peak resident set size in MiB of (this process, its largest finished child)"""
+    scale = 1 if sys.platform == "darwin" else 1024
+    return tuple(round(resource.getrusage(who).ru_maxrss * scale / (1024 * 1024), 1)
+                 for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+
+
+def _timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - started, result
+
+
+def row_phases(count, now):
+    """Seconds spent per phase of generate_incident for `count` rows"""
+    context = generator.GenerationContext(now, seed=1)
+    rng = context.rng
+    tables = generator.default_tables
+
+    def sample_choices():
+        # The same WeightedChoice and compiled-table draws as generate_incident
+        picks = []
+        for _ in range(count):
+            service_index = tables.services.index(rng)
+            category_index = tables.categories.index(rng)
+            _, short_description, descriptions = rng.choice(
+                tables.issues[service_index][category_index])
+            picks.append((service_index, category_index, short_description,
+                          rng.choice(descriptions), tables.states.choice(rng),
+                          tables.priorities.choice(rng), tables.impact_levels.choice(rng),
+                          tables.impact_levels.choice(rng)))
+        return picks
+
+    def date_math(picks):
+        return [generator.generate_date_epochs(pick[4], context.now_epoch, rng) for pick in picks]
+
+    def close_notes(picks):
+        return [generator.generate_close_notes(tables.resolution_codes.choice(rng), "", rng, None,
+                                               tables.close_notes)
+                for pick in picks if not generator.is_active(pick[4])]
+
+    def formatting(picks, dates):
+        return [(generator.generate_inc_number(i, context.inc_key),
+                 tables.services.values[pick[0]], tables.capitalized_categories[pick[1]],
+                 generator.format_epoch(created), generator.format_epoch(updated),
+                 generator.is_active(pick[4]))
+                for i, (pick, (created, updated)) in enumerate(zip(picks, dates), 1)]
+
+    phases = {}
+    phases["choice_sampling"], picks = _timed(sample_choices)
+    phases["date_math"], dates = _timed(date_math, picks)
+    phases["close_notes"], _ = _timed(close_notes, picks)
+    phases["string_formatting"], _ = _timed(formatting, picks, dates)
+    context = generator.GenerationContext(now, seed=1)
+    rows = [generator.generate_incident(i, context) for i in range(1, count + 1)]
+    phases["csv_write"], _ = _timed(_write_csv, rows)
+    return phases
+
+
+def batch_phases(count, now):
+    """Seconds spent per phase of the vectorized batch engine for `count` rows"""
+    import incident_batch
+
+    rng = incident_batch.numpy_rng(1)
+    states = rng.integers(0, len(generator.states), count)
+    total, batch = _timed(incident_batch.generate_incident_batch, 1, count, rng, now)
+    dates, _ = _timed(incident_batch.generate_batch_dates, states, rng,
+                      incident_batch.naive_epoch(now))
+    formatting, rows = _timed(lambda: list(batch.rows()))
+    write, _ = _timed(_write_csv, rows)
+    return {
+        "choice_sampling": max(0.0, total - dates),
+        "date_math": dates,
+        "string_formatting": formatting,
+        "csv_write": write,
+    }
+
+
+def _write_csv(rows):
+    with tempfile.TemporaryFile("w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+
+
+def run_case(mode, count, workers=None, batch_size=100000):
+    """Run one benchmark case in this process and return its result dict"""
+    now = datetime(2026, 1, 1)
+    with tempfile.TemporaryDirectory() as scratch:
+        output = os.path.join(scratch, "incidents.csv")
+        started = time.perf_counter()
+        if mode == "row":
+            generator.write_incidents_csv(output, count, seed=1, now=now, progress=None)
+        elif mode == "batch":
+            generator.write_incidents_csv(output, count, batch_size=batch_size, seed=1, now=now,
+                                          progress=None)
+        elif mode == "sharded":
+            from sharded_generation import generate_sharded
+
+            shards = workers or os.cpu_count()
+            generate_sharded(output, count, shards, workers=workers, seed=1, now=now)
+        else:
+            raise ValueError(f"Unknown mode: {mode}")
+        seconds = time.perf_counter() - started
+        output_bytes = os.path.getsize(output)
+    # Taken before the phase pass, which holds its sample rows in memory
+    peak, peak_child = peak_rss_mb()
+
+    sample = min(count, PHASE_SAMPLE)
+    phases = {}
+    if mode == "row":
+        phases = row_phases(sample, now)
+    elif mode == "batch":
+        phases = batch_phases(sample, now)
+
+    return {
+        "mode": mode,
+        "rows": count,
+        "seconds": round(seconds, 4),
+        "rows_per_s": round(count / seconds, 1),
+        "peak_rss_mb": peak,
+        # Largest single worker process (sharded mode), not the sum of concurrent workers
+        "peak_worker_rss_mb": peak_child,
+        "output_bytes": output_bytes,
+        # Phase costs are per row, from a sample of up to PHASE_SAMPLE rows
+        "phase_us_per_row": {name: round(value / sample * 1e6, 3) for name, value in phases.items()},
+    }
+
+
+def run_isolated(mode, count, workers=None, batch_size=100000):
+    """Run one case in a fresh interpreter so peak RSS is not shared between cases"""
+    command = [sys.executable, os.path.abspath(__file__), "--case", mode, str(count),
+               "--batch-size", str(batch_size)]
+    if workers:
+        command += ["--workers", str(workers)]
+    completed = subprocess.run(command, capture_output=True, text=True, check=True,
+                               cwd=os.path.dirname(os.path.abspath(__file__)))
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit.strip(),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print rows/s against the baseline; returns the cases that regressed"""
+    previous = {(case["mode"], case["rows"]): case for case in baseline["cases"]}
+    regressions = []
+    print(f"{'mode':<8} {'rows':>10} {'rows/s':>12} {'baseline':>12} {'change':>8} {'rss MB':>8}")
+    for case in results["cases"]:
+        old = previous.get((case["mode"], case["rows"]))
+        if old is None:
+            print(f"{case['mode']:<8} {case['rows']:>10} {case['rows_per_s']:>12,.0f} {'-':>12}")
+            continue
+        change = case["rows_per_s"] / old["rows_per_s"] - 1
+        flag = " <-- slower" if change < -tolerance else ""
+        print(f"{case['mode']:<8} {case['rows']:>10} {case['rows_per_s']:>12,.0f} "
+              f"{old['rows_per_s']:>12,.0f} {change:>+8.1%} {case['peak_rss_mb']:>8}{flag}")
+        if flag:
+            regressions.append(case)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark incident generation")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="comma separated row counts")
+    parser.add_argument("--modes", default=",".join(MODES), help="comma separated modes")
+    parser.add_argument("--workers", type=int, default=None, help="processes for sharded mode")
+    parser.add_argument("--batch-size", type=int, default=100000)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed rows/s drop before a case counts as a regression")
+    parser.add_argument("--case", nargs=2, metavar=("MODE", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        result = run_case(args.case[0], int(args.case[1]), args.workers, args.batch_size)
+        print(json.dumps(result))
+        return 0
+
+    results = {"environment": environment(), "cases": []}
+    for size in (int(s) for s in args.sizes.split(",")):
+        for mode in args.modes.split(","):
+            print(f"Running {mode} x {size:,} rows...")
+            case = run_isolated(mode, size, args.workers, args.batch_size)
+            results["cases"].append(case)
+            phases = ", ".join(f"{k} {v}" for k, v in case["phase_us_per_row"].items())
+            workers = (f", largest worker {case['peak_worker_rss_mb']} MB"
+                       if case.get("peak_worker_rss_mb") else "")
+            print(f"  {case['rows_per_s']:,.0f} rows/s, peak RSS {case['peak_rss_mb']} MB{workers}"
+                  + (f" (us/row: {phases})" if phases else ""))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
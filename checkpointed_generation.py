@@ -0,0 +1,157 @@
+"""Checkpointed, resumable CSV generation for very large runs.
+
+Every `checkpoint_every` rows the CSV is flushed and fsynced, then a small
+JSON checkpoint next to it (``<output>.checkpoint.json``) is atomically
+replaced with the last committed id, the byte offset of the file at that
+point and the full RNG state (none is needed with counter-based
+generation, where every row is a function of the seed and its id). A run
+that dies can be continued with
+`resume=True`: the CSV is truncated back to the committed offset (dropping
+any partial rows written after it), the RNG state is restored and
+generation carries on from the next id, producing exactly the rows an
+uninterrupted run would have.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+
+from Generate_Records_v3 import GenerationContext, csv_header, generate_incident, inc_number_key
+
+
+def checkpoint_path(output):
+    return output + ".checkpoint.json"
+
+
+def _save_checkpoint(path, state):
+    """Write the checkpoint to a temp file and atomically move it into place"""
+    temp = path + ".tmp"
+    with open(temp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+def load_checkpoint(output):
+    with open(checkpoint_path(output), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _rng_state(rng):
+    """JSON-friendly RNG state for random.Random or a NumPy Generator"""
+    if hasattr(rng, "bit_generator"):
+        return {"numpy": rng.bit_generator.state}
+    version, internal, gauss_next = rng.getstate()
+    return {"random": [version, list(internal), gauss_next]}
+
+
+def _restore_rng_state(rng, state):
+    if "numpy" in state:
+        rng.bit_generator.state = state["numpy"]
+    else:
+        version, internal, gauss_next = state["random"]
+        rng.setstate((version, tuple(internal), gauss_next))
+
+
+def write_checkpointed(output, count, checkpoint_every=1000000, seed=None, now=None,
+                       batch_size=None, resume=False, progress=print, stats=None, counter=False):
+    """Generate `count` incidents into `output`, committing every `checkpoint_every` rows.
+
+    With `resume` the run continues from the last checkpoint; count, seed,
+    reference time, batch size and `counter` are then taken from the checkpoint.
+    `stats` (an IncidentStats) is saved with every checkpoint and restored
+    on resume, so it always covers exactly the committed rows.
+    Returns the number of rows written by this call.
+    """
+    ckpt_file = checkpoint_path(output)
+    if resume:
+        state = load_checkpoint(output)
+        if stats is not None and "stats" in state:
+            from incident_stats import IncidentStats
+
+            stats.merge(IncidentStats.from_dict(state["stats"]))
+        if state["complete"]:
+            if progress:
+                progress(f"'{output}' is already complete ({state['count']} records)")
+            return 0
+        count, seed, batch_size = state["count"], state["seed"], state["batch_size"]
+        counter = state.get("counter", False)
+        now = datetime.fromisoformat(state["now"])
+        start_id = state["last_id"] + 1
+        raw = open(output, "r+b")
+        # Drop anything written after the last committed checkpoint
+        raw.truncate(state["offset"])
+        raw.seek(state["offset"])
+        if progress:
+            progress(f"Resuming '{output}' at id {start_id} of {count}")
+    else:
+        if seed is None:
+            seed = int.from_bytes(os.urandom(8), "little")
+        now = now or datetime.now()
+        start_id = 1
+        raw = open(output, "wb")
+        state = {"output": output, "count": count, "seed": seed, "now": now.isoformat(),
+                 "batch_size": batch_size or 0, "inc_key": list(inc_number_key(seed)),
+                 "counter": counter}
+
+    # Batch runs commit on batch boundaries so the batch sequence is unchanged
+    if batch_size:
+        checkpoint_every = max(batch_size, checkpoint_every // batch_size * batch_size)
+
+    stream = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    writer = csv.writer(stream)
+    context = GenerationContext(now, seed, inc_key=tuple(state["inc_key"]), counter=counter)
+    if batch_size:
+        from incident_batch import counter_rng, generate_incident_batch, numpy_rng
+
+        rng = None if counter else numpy_rng(seed)
+    else:
+        rng = None if counter else context.rng
+    if resume and rng is not None:
+        _restore_rng_state(rng, state["rng_state"])
+
+    def commit(last_id, complete=False):
+        stream.flush()
+        os.fsync(raw.fileno())
+        state.update(last_id=last_id, offset=raw.tell(), complete=complete)
+        if rng is not None:
+            state["rng_state"] = _rng_state(rng)
+        if stats is not None:
+            state["stats"] = stats.to_dict()
+        _save_checkpoint(ckpt_file, state)
+
+    try:
+        if not resume:
+            writer.writerow(csv_header)
+            commit(0)
+
+        stop_id = count + 1
+        for chunk_start in range(start_id, stop_id, checkpoint_every):
+            chunk_stop = min(chunk_start + checkpoint_every, stop_id)
+            if batch_size:
+                for start in range(chunk_start, chunk_stop, batch_size):
+                    size = min(batch_size, chunk_stop - start)
+                    batch_rng = rng or counter_rng(seed, start, size)
+                    batch = generate_incident_batch(start, size, batch_rng, context.now,
+                                                    context.inc_key)
+                    writer.writerows(batch.rows())
+                    if stats is not None:
+                        stats.add_batch(batch)
+            elif stats is not None:
+                for block_start in range(chunk_start, chunk_stop, 1000):
+                    rows = [generate_incident(i, context)
+                            for i in range(block_start, min(block_start + 1000, chunk_stop))]
+                    writer.writerows(rows)
+                    stats.add_rows(rows)
+            else:
+                writer.writerows(generate_incident(i, context) for i in range(chunk_start, chunk_stop))
+            commit(chunk_stop - 1, complete=chunk_stop == stop_id)
+            if progress:
+                progress(f"Generated {chunk_stop - 1} records... (checkpoint saved)")
+        if start_id == stop_id:
+            commit(count, complete=True)
+    finally:
+        stream.close()
+    return count - start_id + 1
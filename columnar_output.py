@@ -0,0 +1,321 @@
+"""Columnar, dictionary-encoded output for the batch engine.
+
+Two formats are written from IncidentBatch blocks, one row group per batch:
+
+* ``parquet`` - an Apache Parquet file (needs pyarrow). Categorical and
+  template-derived text columns are Arrow dictionary arrays, dates are
+  ``timestamp[s]`` and ``Active`` is a boolean, so readers can project just
+  the columns they need.
+* ``dict-csv`` - a directory with one CSV part file per row group holding
+  only integer codes and numbers, plus a ``manifest.json`` with the
+  dictionaries needed to decode them. Works with the standard library alone.
+
+Both can be read back column by column with `iter_columnar_chunks`, or as
+rows in the Generate_Records_v3 CSV layout with `iter_columnar_rows`.
+"""
+import csv
+import json
+import os
+
+import numpy as np
+
+from Generate_Records_v3 import csv_header, priorities, resolution_codes, services, states
+from incident_batch import (
+    category_names,
+    close_note_kind,
+    close_note_prefix,
+    close_note_suffix,
+    description_table,
+    format_epochs,
+    impact_levels,
+    placeholder_names,
+    short_description_table,
+)
+
+MANIFEST = "manifest.json"
+
+# Fixed dictionaries: the code stored in the batch is the index into these
+categorical_dictionaries = {
+    "service": services,
+    "incident_category": [c.capitalize() for c in category_names],
+    "state": states,
+    "priority": priorities,
+    "impact": impact_levels,
+    "urgency": impact_levels,
+    "resolution_code": resolution_codes,
+}
+
+# Close note templates as (prefix, placeholder format, suffix)
+close_note_dictionary = [
+    [prefix, ("INC{:07d}" if placeholder_names[kind] == "inc_number" else "{}") if kind >= 0 else "",
+     suffix]
+    for prefix, kind, suffix in zip(close_note_prefix, close_note_kind, close_note_suffix)
+]
+
+
+class DictionaryEncoder:
+    """Grow a dictionary of table entries in first-seen order across batches"""
+
+    def __init__(self, table):
+        self.table = table
+        self.positions = {}
+        self.values = []
+
+    def encode(self, codes):
+        unique_codes, inverse = np.unique(codes, return_inverse=True)
+        mapped = np.empty(len(unique_codes), dtype=np.int64)
+        for i, code in enumerate(unique_codes.tolist()):
+            position = self.positions.get(code)
+            if position is None:
+                position = self.positions[code] = len(self.values)
+                self.values.append(self.table[code])
+            mapped[i] = position
+        return mapped[inverse]
+
+
+def batch_codes(batch):
+    """Integer code columns for a batch, keyed by CSV column name"""
+    return {
+        "service": batch.service,
+        "incident_category": batch.category,
+        "state": batch.state,
+        "priority": batch.priority,
+        "impact": batch.impact,
+        "urgency": batch.urgency,
+        "resolution_code": batch.resolution,
+    }
+
+
+class DictCsvWriter:
+    """Write batches as dictionary-encoded CSV part files in a directory"""
+
+    columns = [
+        "inc_number", "id", "short_description", "description", "service", "incident_category",
+        "state", "priority", "impact", "urgency", "created_date", "updated_date",
+        "resolution_code", "close_note", "close_note_param", "Active",
+    ]
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.short_descriptions = DictionaryEncoder(short_description_table.ravel())
+        self.descriptions = DictionaryEncoder(description_table.ravel())
+        self.parts = []
+
+    def write_batch(self, batch):
+        name = f"part-{len(self.parts):05d}.csv"
+        short_description = self.short_descriptions.encode(
+            batch.service * short_description_table.shape[1] + batch.issue)
+        description = self.descriptions.encode(
+            np.ravel_multi_index((batch.description_template, batch.service, batch.issue),
+                                 description_table.shape))
+        codes = batch_codes(batch)
+        columns = [
+            batch.inc_numbers, batch.ids, short_description, description,
+            codes["service"], codes["incident_category"], codes["state"], codes["priority"],
+            codes["impact"], codes["urgency"], batch.created, batch.updated,
+            codes["resolution_code"], batch.close_note, batch.close_note_param,
+            batch.active.astype(np.int8),
+        ]
+        with open(os.path.join(self.directory, name), 'w', newline='', encoding='utf-8') as part:
+            writer = csv.writer(part)
+            writer.writerow(self.columns)
+            writer.writerows(zip(*(column.tolist() for column in columns)))
+        self.parts.append({"file": name, "rows": len(batch)})
+
+    def close(self):
+        manifest = {
+            "format": "dict-csv",
+            "columns": self.columns,
+            "dates": "seconds since 1970-01-01 (naive local time)",
+            "missing_code": -1,
+            "dictionaries": dict(
+                categorical_dictionaries,
+                short_description=self.short_descriptions.values,
+                description=self.descriptions.values,
+                close_note=close_note_dictionary,
+            ),
+            "parts": self.parts,
+        }
+        with open(os.path.join(self.directory, MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ParquetWriter:
+    """Write batches to a Parquet file, one row group per batch"""
+
+    def __init__(self, path, compression="zstd"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.path = path
+        self.writer = pq.ParquetWriter(path, self.schema(pa), compression=compression)
+
+    @staticmethod
+    def schema(pa):
+        category = pa.dictionary(pa.int32(), pa.string())
+        return pa.schema([
+            ("inc_number", pa.string()),
+            ("id", pa.int64()),
+            ("short_description", category),
+            ("description", category),
+            ("service", category),
+            ("incident_category", category),
+            ("state", category),
+            ("priority", category),
+            ("impact", category),
+            ("urgency", category),
+            ("created_date", pa.timestamp("s")),
+            ("updated_date", pa.timestamp("s")),
+            ("resolution_code", category),
+            ("close_notes", pa.string()),
+            ("Active", pa.bool_()),
+        ])
+
+    def _dictionary(self, codes, values):
+        """Dictionary array holding only the entries this row group uses"""
+        pa = self.pa
+        unique_codes, inverse = np.unique(codes, return_inverse=True)
+        missing = unique_codes < 0
+        dictionary = pa.array(np.asarray(values, dtype=object)[unique_codes[~missing]].tolist(),
+                              type=pa.string())
+        # Negative codes (no resolution) become nulls
+        positions = np.cumsum(~missing) - 1
+        indices = positions[inverse].astype(np.int32)
+        mask = missing[inverse]
+        return pa.DictionaryArray.from_arrays(pa.array(indices, mask=mask), dictionary)
+
+    def write_batch(self, batch):
+        pa = self.pa
+        codes = batch_codes(batch)
+        close_notes = batch.close_notes()
+        arrays = [
+            pa.array(np.char.mod("INC%07d", batch.inc_numbers)),
+            pa.array(batch.ids),
+            self._dictionary(batch.service * short_description_table.shape[1] + batch.issue,
+                             short_description_table.ravel()),
+            self._dictionary(np.ravel_multi_index(
+                (batch.description_template, batch.service, batch.issue), description_table.shape),
+                description_table.ravel()),
+        ]
+        for name in ("service", "incident_category", "state", "priority", "impact", "urgency"):
+            arrays.append(self._dictionary(codes[name], categorical_dictionaries[name]))
+        arrays += [
+            pa.array(batch.created, type=pa.timestamp("s")),
+            pa.array(batch.updated, type=pa.timestamp("s")),
+            self._dictionary(codes["resolution_code"], resolution_codes),
+            pa.array(close_notes.tolist(), type=pa.string(), mask=batch.close_note < 0),
+            pa.array(batch.active),
+        ]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.writer.schema))
+
+    def close(self):
+        self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_columnar_writer(path, fmt):
+    """Return the writer for `fmt` ('parquet' or 'dict-csv')"""
+    if fmt == "parquet":
+        return ParquetWriter(path)
+    if fmt == "dict-csv":
+        return DictCsvWriter(path)
+    raise ValueError(f"Unknown columnar format: {fmt}")
+
+
+def _decode_dict_csv(manifest, column, values):
+    """Decode one dict-csv column (list of strings) into CSV-layout values"""
+    dictionaries = manifest["dictionaries"]
+    if column == "inc_number":
+        return [f"INC{int(v):07d}" for v in values]
+    if column == "id":
+        return [int(v) for v in values]
+    if column in ("created_date", "updated_date"):
+        return format_epochs(np.array(values, dtype=np.int64)).tolist()
+    if column == "Active":
+        return [v == "1" for v in values]
+    table = dictionaries[column]
+    return [table[int(v)] if int(v) >= 0 else "" for v in values]
+
+
+def iter_columnar_chunks(path, columns=None):
+    """Yield one dict of decoded column lists per row group, reading only `columns`"""
+    columns = list(columns or csv_header)
+    if os.path.isdir(path):
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+        templates = manifest["dictionaries"]["close_note"]
+        for part in manifest["parts"]:
+            with open(os.path.join(path, part["file"]), newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                header = next(reader)
+                raw = dict(zip(header, zip(*reader))) if part["rows"] else {h: () for h in header}
+            chunk = {}
+            for column in columns:
+                if column == "close_notes":
+                    chunk[column] = [
+                        "" if int(t) < 0 else templates[int(t)][0]
+                        + (templates[int(t)][1].format(int(p)) if templates[int(t)][1] else "")
+                        + templates[int(t)][2]
+                        for t, p in zip(raw["close_note"], raw["close_note_param"])
+                    ]
+                else:
+                    chunk[column] = _decode_dict_csv(manifest, column, raw[column])
+            yield chunk
+        return
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path)
+    for group in range(parquet.num_row_groups):
+        table = parquet.read_row_group(group, columns=columns)
+        chunk = {}
+        for column in columns:
+            array = table.column(column)
+            if column in ("created_date", "updated_date"):
+                epochs = array.cast(pa.timestamp("s")).cast(pa.int64()).to_numpy()
+                chunk[column] = format_epochs(epochs).tolist()
+                continue
+            chunk[column] = ["" if v is None else v for v in array.to_pylist()]
+        yield chunk
+
+
+def iter_columnar_rows(path):
+    """Yield rows in the Generate_Records_v3 CSV layout from columnar output"""
+    for chunk in iter_columnar_chunks(path):
+        yield from zip(*(chunk[column] for column in csv_header))
+
+
+def write_columnar(path, count, fmt, seed=None, now=None, batch_size=100000, inc_key=None,
+                   progress=print, arrivals=None, tables=None, stats=None, start_id=1,
+                   counter=False):
+    """Generate `count` incidents from `start_id` on straight into a columnar file or directory"""
+    from Generate_Records_v3 import default_tables, inc_number_key
+    from incident_batch import iter_incident_batches
+
+    if inc_key is None:
+        inc_key = inc_number_key(seed)
+    written = 0
+    with open_columnar_writer(path, fmt) as writer:
+        for batch in iter_incident_batches(count, seed, start_id, now, batch_size, inc_key,
+                                           arrivals, tables or default_tables, counter):
+            writer.write_batch(batch)
+            if stats is not None:
+                stats.add_batch(batch)
+            written += len(batch)
+            if progress:
+                progress(f"Generated {written} records...")
+    return written
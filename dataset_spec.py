@@ -0,0 +1,145 @@
+"""Declarative dataset spec for Generate_Records_v3.
+
+A spec is a JSON file holding every table incidents are drawn from, so
+one file defines a dataset instead of lists hard-coded per script.
+incident_spec.json is the built-in dataset: Generate_Records_v3 compiles
+its default tables from it, and Generate_Records reads it too.
+
+Weighted fields (services, states, priorities, impact_levels,
+resolution_codes) are either a list of values, all equally likely, or an
+object mapping each value to its weight:
+
+    "states": {"New": 1, "In Progress": 2, "Resolved": 3, "Closed": 6}
+
+incident_types maps each category to a list of issues, or to
+{"weight": w, "issues": [...]} to weight the category.
+close_notes_templates and description_templates are as in
+Generate_Records_v3.
+
+A spec is compiled into an IncidentTables, with alias tables for O(1)
+weighted draws and every text template pre-expanded. The compiled result is
+pickled in a cache directory, keyed by the sha256 of the spec and of the
+generator source, so large specs only pay for compilation once.
+
+Examples:
+    python dataset_spec.py write my_spec.json      # start from the built-in tables
+    python dataset_spec.py check my_spec.json      # validate, compile and summarize
+    python Generate_Records_v3.py --spec my_spec.json --count 100000
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+
+import Generate_Records_v3 as generator
+
+default_spec_path = generator.default_spec_path
+default_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "servicenow_incidents")
+
+weighted_fields = generator.spec_weighted_fields
+
+
+def compile_spec(spec):
+    """Build an IncidentTables from a parsed spec"""
+    return generator.tables_from_spec(spec)
+
+
+def spec_from_tables(tables=None):
+    """Spec dict for an IncidentTables (default: the built-in tables)"""
+    tables = tables or generator.default_tables
+
+    def field(choice):
+        if choice.uniform:
+            return list(choice.values)
+        return dict(zip(choice.values, choice.weights))
+
+    categories = tables.categories
+    return {
+        "services": field(tables.services),
+        "incident_types": {
+            category: (tables.incident_types[category] if categories.uniform
+                       else {"weight": weight, "issues": tables.incident_types[category]})
+            for category, weight in zip(categories.values, categories.weights
+                                        or [1] * len(categories.values))
+        },
+        "states": field(tables.states),
+        "priorities": field(tables.priorities),
+        "impact_levels": field(tables.impact_levels),
+        "resolution_codes": field(tables.resolution_codes),
+        "close_notes_templates": tables.close_notes_templates,
+        "description_templates": tables.description_templates,
+    }
+
+
+def _cache_key(spec_bytes):
+    digest = hashlib.sha256(spec_bytes)
+    # Compiled tables depend on the generator code too
+    with open(generator.__file__, 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_tables(path=default_spec_path, cache_dir=default_cache_dir):
+    """Load and compile a spec file, reusing the on-disk cache when it matches.
+
+    Pass cache_dir=None to always compile.
+    """
+    with open(path, 'rb') as f:
+        spec_bytes = f.read()
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, f"spec-{_cache_key(spec_bytes)}.pickle")
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            pass
+
+    tables = compile_spec(json.loads(spec_bytes))
+    if cache_path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            temp = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temp, 'wb') as f:
+                pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, cache_path)
+        except OSError:
+            # A read-only cache only costs the next run a recompile
+            pass
+    return tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write or check incident dataset specs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    write = commands.add_parser("write", help="write the built-in tables as a spec file")
+    write.add_argument("path")
+    check = commands.add_parser("check", help="compile a spec and summarize it")
+    check.add_argument("path")
+    check.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "write":
+        with open(args.path, 'w', encoding='utf-8') as f:
+            json.dump(spec_from_tables(), f, indent=2)
+            f.write("\n")
+        print(f"Spec written to '{args.path}'")
+        return
+
+    tables = load_tables(args.path, cache_dir=None if args.no_cache else default_cache_dir)
+    for name in ("services", "categories", "states", "priorities", "impact_levels",
+                 "resolution_codes"):
+        choice = getattr(tables, name)
+        print(f"{name}: {len(choice.values)} values, "
+              f"{'uniform' if choice.uniform else 'weighted'}")
+    print(f"issues: {sum(len(i) for i in tables.incident_types.values())}, "
+          f"description templates: {len(tables.description_templates)}")
+    if tables.same_values(generator.default_tables):
+        print("Same values as the built-in tables (works with the batch engine)")
+    else:
+        print("Values differ from the built-in tables (row engine only)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,588 @@
+"""Incremental delta generation against an existing incident dataset.
+
+A delta run advances part of an earlier output without regenerating it:
+
+* updates - a sampled subset of open or resolved incidents moves one step
+  through New -> In Progress -> Resolved -> Closed, with a later updated
+  date and, on resolution, a resolution code and close notes,
+* new incidents - ids continue after the last one and INC numbers come from
+  the same keyed permutation, so they never collide with existing ones.
+  They are built like fresh rows (generate_incident), created since the
+  previous as-of time: updated dates follow generate_dates' rules, and
+  Duplicate close notes point at a similar earlier incident as in
+  related_records.
+
+The state needed for that lives in a compact index next to the dataset,
+built once from its CSV (``<output>.delta.idx`` plus ``<output>.delta.json``).
+The index holds one fixed-width record per id: state, resolution, close note
+template and parameter, created and updated. It is memory-mapped, and a
+record's position is its id - 1. Since INC numbers invert back to ids
+(Generate_Records_v3.inc_number_id), a lookup by inc_number is O(1) too.
+A delta run only touches the records it samples or appends, so its cost
+grows with the delta, not with the base dataset. Duplicate targets come from
+``<output>.delta.recent.npz``: the related_records.SimilarIncidents state
+for incidents created in the last 30 days, a few per issue and week.
+
+Each run writes two CSV files:
+
+* ``<output>``: inc_number, id, state, updated_date, resolution_code,
+  close_notes and Active per updated incident,
+* ``<root>.new.csv``: the new incidents in the Generate_Records_v3 layout.
+
+The index is updated to match, and its as-of time moves forward (one day
+per run by default), so deltas can be chained. The changes of a run are
+first written to ``<output>.delta.idx.journal`` and only then applied, so
+a run that stops part way leaves the index either as it was or, once it is
+next opened, fully advanced. The recent incidents file is part of that
+journal.
+
+Examples:
+    python Generate_Records_v3.py --count 1000000 --seed 7 --as-of 2026-01-01 --output base.csv
+    python delta_generation.py index base.csv --seed 7 --as-of 2026-01-01
+    python delta_generation.py delta base.csv --updates 20000 --new 5000 --output day1.csv
+    python delta_generation.py show base.csv INC0123456
+"""
+import argparse
+import csv
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from Generate_Records_v3 import (
+    EPOCH,
+    SECONDS_PER_DAY,
+    GenerationContext,
+    csv_header,
+    format_epoch,
+    generate_incident,
+    generate_updated_epoch,
+    inc_number_id,
+    inc_number_key,
+    is_active,
+    naive_epoch,
+    permute_inc_number,
+    placeholder_names,
+    placeholder_ranges,
+    resolution_codes,
+    states,
+)
+from incident_batch import (
+    close_note_kind,
+    close_note_prefix,
+    close_note_suffix,
+    resolution_template_counts,
+    resolution_template_offsets,
+)
+from incident_sinks import CsvSink
+from related_records import SimilarIncidents
+
+INDEX_VERSION = 2
+
+# One index record per incident id; -1 marks no resolution / no close note
+record_dtype = np.dtype([
+    ("state", np.uint8),
+    ("resolution", np.int8),
+    ("close_note", np.int16),
+    ("close_note_param", np.int32),
+    ("created", np.int64),
+    ("updated", np.int64),
+])
+
+# close_note value for the generic "Incident resolved." text
+GENERIC_CLOSE_NOTE = -2
+GENERIC_CLOSE_NOTE_TEXT = "Incident resolved."
+
+delta_header = ['inc_number', 'id', 'state', 'updated_date', 'resolution_code', 'close_notes',
+                'Active']
+
+# Where an incident can go next; repeats weight the choice
+next_states = {
+    "New": ["In Progress", "In Progress", "In Progress", "Resolved"],
+    "In Progress": ["Resolved"],
+    "Resolved": ["Closed"],
+}
+
+state_codes = {state: code for code, state in enumerate(states)}
+resolution_indexes = {code: index for index, code in enumerate(resolution_codes)}
+INC_KIND = placeholder_names.index("inc_number")
+
+
+def index_paths(output):
+    """incidents.csv -> (incidents.csv.delta.idx, incidents.csv.delta.json)"""
+    return f"{output}.delta.idx", f"{output}.delta.json"
+
+
+def recent_incidents_path(output):
+    """incidents.csv -> incidents.csv.delta.recent.npz"""
+    return f"{output}.delta.recent.npz"
+
+
+def similar_arrays(similar):
+    """A SimilarIncidents as arrays for np.savez (issue entries, then service entries)"""
+    entries = ([(0, service, short_description, created, inc_number)
+                for (service, short_description), created, inc_number in similar.issues.entries()]
+               + [(1, service, "", created, inc_number)
+                  for service, created, inc_number in similar.services.entries()])
+    kind, service, short_description, created, inc_number = zip(*entries) if entries else [()] * 5
+    # Texts repeat across entries, so store each once plus a code per entry
+    services, service_codes = np.unique(np.array(service, dtype=str), return_inverse=True)
+    descriptions, description_codes = np.unique(np.array(short_description, dtype=str),
+                                                return_inverse=True)
+    return {"recent_kind": np.array(kind, dtype=np.uint8),
+            "recent_services": services,
+            "recent_service": service_codes.astype(np.int32),
+            "recent_short_descriptions": descriptions,
+            "recent_short_description": description_codes.astype(np.int32),
+            "recent_created": np.array(created, dtype=np.int64),
+            "recent_inc_number": np.array(inc_number, dtype=str)}
+
+
+def load_similar(arrays):
+    """The SimilarIncidents saved by similar_arrays"""
+    similar = SimilarIncidents()
+    services = arrays["recent_services"].tolist()
+    descriptions = arrays["recent_short_descriptions"].tolist()
+    for kind, service, short_description, created, inc_number in zip(
+            arrays["recent_kind"].tolist(),
+            [services[code] for code in arrays["recent_service"].tolist()],
+            [descriptions[code] for code in arrays["recent_short_description"].tolist()],
+            arrays["recent_created"].tolist(), arrays["recent_inc_number"].tolist()):
+        if kind == 0:
+            similar.issues.add((service, short_description), inc_number, created)
+        else:
+            similar.services.add(service, inc_number, created)
+    return similar
+
+
+def save_similar(path, arrays):
+    """Atomically replace the recent incidents file"""
+    temp = f"{path}.tmp"
+    with open(temp, 'wb') as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+def new_incidents_path(output):
+    """day1.csv -> day1.new.csv"""
+    root, ext = os.path.splitext(output)
+    return f"{root}.new{ext or '.csv'}"
+
+
+def parse_timestamp(text):
+    return naive_epoch(datetime.fromisoformat(text))
+
+
+def parse_close_note(resolution, text):
+    """(template, parameter) for a close note produced by the built-in templates"""
+    if not text:
+        return -1, 0
+    if text == GENERIC_CLOSE_NOTE_TEXT:
+        return GENERIC_CLOSE_NOTE, 0
+    first = resolution_template_offsets[resolution]
+    for template in range(first, first + resolution_template_counts[resolution]):
+        prefix, suffix = close_note_prefix[template], close_note_suffix[template]
+        kind = close_note_kind[template]
+        if kind < 0:
+            if text == prefix:
+                return template, 0
+            continue
+        if not (text.startswith(prefix) and text.endswith(suffix)
+                and len(text) > len(prefix) + len(suffix)):
+            continue
+        token = text[len(prefix):len(text) - len(suffix)]
+        if kind == INC_KIND:
+            if not token.startswith("INC"):
+                continue
+            token = token[3:]
+        if token.isdigit():
+            return template, int(token)
+    raise ValueError(f"Close note is not from the built-in templates: {text!r}")
+
+
+def close_note_text(template, param):
+    if template == GENERIC_CLOSE_NOTE:
+        return GENERIC_CLOSE_NOTE_TEXT
+    if template < 0:
+        return ""
+    kind = close_note_kind[template]
+    if kind < 0:
+        return close_note_prefix[template]
+    token = f"INC{param:07d}" if kind == INC_KIND else param
+    return f"{close_note_prefix[template]}{token}{close_note_suffix[template]}"
+
+
+def row_record(row):
+    """Index record fields for a row in the Generate_Records_v3 layout"""
+    state = row[6]
+    resolution = resolution_indexes[row[12]] if row[12] else -1
+    close_note, param = parse_close_note(resolution, row[13]) if resolution >= 0 else (-1, 0)
+    return (state_codes[state], resolution, close_note, param, parse_timestamp(row[10]),
+            parse_timestamp(row[11]))
+
+
+class DeltaIndex:
+    """The memory-mapped per-id index of one dataset plus its metadata"""
+
+    def __init__(self, output):
+        self.path, self.meta_path = index_paths(output)
+        self.recent_path = recent_incidents_path(output)
+        with open(self.meta_path, encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"'{self.meta_path}' is not a version {INDEX_VERSION} delta index; "
+                             "rebuild it with 'delta_generation.py index'")
+        self.count = self.meta["count"]
+        self.inc_key = tuple(self.meta["inc_key"])
+        self.journal_path = f"{self.path}.journal"
+        if os.path.exists(f"{self.journal_path}.tmp"):
+            # Never renamed into place, so never applied
+            os.remove(f"{self.journal_path}.tmp")
+        if os.path.exists(self.journal_path):
+            # A delta committed its changes but stopped before applying them all
+            self._apply_journal()
+        else:
+            # Records past `count` are from a run that stopped before its metadata was saved
+            with open(self.path, 'r+b') as f:
+                f.truncate(self.count * record_dtype.itemsize)
+        self.records = self._map()
+
+    def _map(self, mode='r'):
+        if not self.count:
+            return np.zeros(0, dtype=record_dtype)
+        return np.memmap(self.path, dtype=record_dtype, mode=mode, shape=(self.count,))
+
+    @property
+    def as_of_epoch(self):
+        return self.meta["as_of_epoch"]
+
+    def lookup(self, inc_number):
+        """(id, record) for an INC number, or None if the dataset has no such incident"""
+        incident_id = inc_number_id(inc_number, self.inc_key)
+        if not 1 <= incident_id <= self.count:
+            return None
+        return incident_id, self.records[incident_id - 1]
+
+    def similar(self):
+        """The SimilarIncidents of the recent incidents, for new incidents to link to"""
+        with np.load(self.recent_path) as arrays:
+            return load_similar(arrays)
+
+    def commit(self, updates, appended, similar, **meta):
+        """Replace records ({id: record}), add records for ids count + 1 onward, replace
+        the recent incidents with `similar` and update meta.
+
+        Everything is first written to a journal, fsynced and renamed into
+        place, then applied; see _apply_journal.
+        """
+        ids = np.array(sorted(updates), dtype=np.int64)
+        records = np.array([updates[incident_id] for incident_id in ids.tolist()],
+                           dtype=record_dtype)
+        new_meta = dict(self.meta, **meta, count=self.count + len(appended))
+        temp = f"{self.journal_path}.tmp"
+        with open(temp, 'wb') as f:
+            np.savez(f, base_count=np.int64(self.count), ids=ids, records=records,
+                     appended=np.asarray(appended, dtype=record_dtype),
+                     meta=np.array(json.dumps(new_meta)), **similar_arrays(similar))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.journal_path)
+        self._apply_journal()
+
+    def _apply_journal(self):
+        """Apply a committed journal to the index, then remove it.
+
+        Applying is idempotent: the index is cut back to the journal's base
+        count before the appended records are written again, so it can be
+        repeated after a crash at any point.
+        """
+        with np.load(self.journal_path) as journal:
+            base_count = int(journal["base_count"])
+            ids, records, appended = journal["ids"], journal["records"], journal["appended"]
+            meta = json.loads(str(journal["meta"]))
+            recent = {name: journal[name] for name in journal.files if name.startswith("recent_")}
+        self.records = None
+        with open(self.path, 'r+b') as f:
+            f.truncate(base_count * record_dtype.itemsize)
+            f.seek(0, os.SEEK_END)
+            f.write(appended.tobytes())
+        self.count = meta["count"]
+        if len(ids):
+            mapped = self._map('r+')
+            mapped[ids - 1] = records
+            mapped.flush()
+            del mapped
+        with open(self.path, 'rb') as f:
+            os.fsync(f.fileno())
+        save_similar(self.recent_path, recent)
+        self.meta = meta
+        self.save()
+        os.remove(self.journal_path)
+        self.records = self._map()
+
+    def save(self, **meta):
+        """Atomically replace the metadata"""
+        self.meta.update(meta, count=self.count)
+        temp = f"{self.meta_path}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.meta_path)
+
+
+def build_index(output, seed=None, as_of=None, paths=None, chunk_rows=100000):
+    """Index an existing CSV dataset (one pass over it) for delta runs.
+
+    `seed` must be the seed the dataset was generated with, since INC
+    numbers are checked against its key. `paths` lists the CSV files in id
+    order when the dataset was written as parts (default: [output]).
+    `as_of` defaults to the latest updated date in the data. Returns the
+    number of incidents indexed.
+    """
+    inc_key = inc_number_key(seed)
+    index_path, meta_path = index_paths(output)
+    count = 0
+    latest = 0
+    # Fed in id order, as related_records does while generating
+    similar = SimilarIncidents()
+    # Start of the oldest slot trim() keeps at the latest updated date so far
+    keep_from = 0
+    with open(index_path, 'wb') as index:
+        for path in paths or [output]:
+            with open(path, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                if next(reader, None) != csv_header:
+                    raise ValueError(f"'{path}' does not have the Generate_Records_v3 header")
+                chunk = []
+                for row in reader:
+                    count += 1
+                    if int(row[1]) != count:
+                        raise ValueError(f"'{path}': expected id {count}, found {row[1]}; "
+                                         "ids must run 1, 2, ... in file order")
+                    if row[0] != f"INC{permute_inc_number(count, inc_key):07d}":
+                        raise ValueError(f"'{path}': {row[0]} was not numbered with seed {seed}")
+                    record = row_record(row)
+                    chunk.append(record)
+                    if record[4] >= keep_from:
+                        similar.add(row[0], row[4], row[2], record[4])
+                    if len(chunk) >= chunk_rows:
+                        records = np.array(chunk, dtype=record_dtype)
+                        latest = max(latest, int(records["updated"].max()))
+                        index.write(records.tobytes())
+                        chunk = []
+                        # as_of is at least `latest`, so older slots are never read
+                        similar.trim(latest)
+                        window = similar.issues.window
+                        keep_from = (latest - similar.wide_window) // window * window
+                if chunk:
+                    records = np.array(chunk, dtype=record_dtype)
+                    latest = max(latest, int(records["updated"].max()))
+                    index.write(records.tobytes())
+
+    as_of_epoch = naive_epoch(as_of) if as_of else latest
+    if as_of_epoch < latest:
+        os.remove(index_path)
+        raise ValueError(f"as_of {format_epoch(as_of_epoch)} is before the latest updated date "
+                         f"in the data, {format_epoch(latest)}; pass that time or a later one")
+    similar.trim(as_of_epoch)
+    save_similar(recent_incidents_path(output), similar_arrays(similar))
+    meta = {
+        "version": INDEX_VERSION,
+        "seed": seed,
+        "inc_key": list(inc_key),
+        "count": count,
+        "as_of_epoch": as_of_epoch,
+        "as_of": format_epoch(as_of_epoch),
+        "deltas": 0,
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return count
+
+
+def _resolve(rng, incident_id, inc_key):
+    """(resolution, close note template, parameter) for a newly resolved incident"""
+    resolution = rng.randrange(len(resolution_codes))
+    template = int(resolution_template_offsets[resolution]
+                   + rng.randrange(resolution_template_counts[resolution]))
+    kind = close_note_kind[template]
+    if kind < 0:
+        return resolution, template, 0
+    if kind == INC_KIND:
+        if incident_id == 1:
+            return resolution, GENERIC_CLOSE_NOTE, 0
+        # Duplicates point at a real, earlier incident
+        return resolution, template, permute_inc_number(rng.randint(1, incident_id - 1), inc_key)
+    low, high = placeholder_ranges[placeholder_names[kind]]
+    return resolution, template, rng.randint(low, high)
+
+
+class EarlierIncidents:
+    """GenerationContext references for new incidents: Duplicate close notes point
+    at a similar earlier incident, other placeholders get random numbers as they
+    do without references"""
+
+    def __init__(self, similar, rng):
+        self.similar = similar
+        self.rng = rng
+
+    def resolver(self, inc_number, service, short_description, priority, created, updated):
+        def reference(name):
+            if name == "inc_number":
+                return self.similar.find(service, short_description, created)
+            low, high = placeholder_ranges[name]
+            return self.rng.randint(low, high)
+        return reference
+
+    def add_incident(self, inc_number, service, short_description, created):
+        self.similar.add(inc_number, service, short_description, created)
+
+
+def write_delta(base, output, updates=1000, new=0, as_of=None, seed=None, progress=print):
+    """Advance the indexed dataset `base` by one delta, written to `output`.
+
+    `updates` incidents that are not yet closed move one state forward and
+    `new` incidents are created after the previous as-of time. `as_of`
+    defaults to one day after it. `seed` defaults to one derived from the
+    dataset seed and the delta number, so a chain of deltas replays exactly.
+    Returns (updated, created).
+    """
+    index = DeltaIndex(base)
+    previous = index.as_of_epoch
+    now_epoch = naive_epoch(as_of) if as_of else previous + SECONDS_PER_DAY
+    if now_epoch <= previous:
+        raise ValueError(f"as_of must be after the index as-of time {index.meta['as_of']}")
+    sequence = index.meta["deltas"]
+    if seed is None:
+        seed = f"delta:{index.meta['seed']}:{sequence}"
+    rng = random.Random(seed)
+    records = index.records
+    changes = {}
+    closed = state_codes["Closed"]
+
+    # Rejection-sample open ids; tries are bounded so a mostly closed dataset
+    # yields fewer updates instead of scanning it
+    picked = set()
+    tries = 0
+    while index.count and len(picked) < updates and tries < updates * 20 + 100:
+        tries += 1
+        incident_id = rng.randint(1, index.count)
+        if incident_id not in picked and records[incident_id - 1]["state"] != closed:
+            picked.add(incident_id)
+
+    updated = 0
+    with CsvSink.open(output, header=delta_header) as sink:
+        rows = []
+        for incident_id in sorted(picked):
+            record = records[incident_id - 1]
+            state = rng.choice(next_states[states[record["state"]]])
+            resolution, template, param = (int(record["resolution"]), int(record["close_note"]),
+                                           int(record["close_note_param"]))
+            if not is_active(state) and resolution < 0:
+                resolution, template, param = _resolve(rng, incident_id, index.inc_key)
+            when = rng.randint(max(int(record["updated"]), previous) + 1, now_epoch)
+            changes[incident_id] = (state_codes[state], resolution, template, param,
+                                    record["created"], when)
+            rows.append([
+                f"INC{permute_inc_number(incident_id, index.inc_key):07d}", incident_id, state,
+                format_epoch(when), resolution_codes[resolution] if resolution >= 0 else "",
+                close_note_text(template, param), is_active(state),
+            ])
+            updated += 1
+            if len(rows) >= 10000:
+                sink.write_rows(rows)
+                rows = []
+        sink.write_rows(rows)
+
+    def dates(state, rng):
+        # Created since the previous delta; updated by generate_dates' rules
+        created = rng.randint(previous + 1, now_epoch)
+        return created, generate_updated_epoch(state, created, now_epoch, rng)
+
+    new_path = new_incidents_path(output)
+    similar = index.similar()
+    context = GenerationContext(EPOCH + timedelta(seconds=now_epoch), f"{seed}:new",
+                                inc_key=index.inc_key, dates=dates)
+    context.references = EarlierIncidents(similar, context.rng)
+    appended = []
+    with CsvSink.open(new_path) as sink:
+        rows = []
+        start_id = index.count + 1
+        for incident_id in range(start_id, start_id + new):
+            row = generate_incident(incident_id, context)
+            appended.append(row_record(row))
+            rows.append(row)
+            if len(rows) >= 10000:
+                sink.write_rows(rows)
+                rows = []
+        sink.write_rows(rows)
+
+    similar.trim(now_epoch)
+    index.commit(changes, appended, similar, as_of_epoch=now_epoch, as_of=format_epoch(now_epoch),
+                 deltas=sequence + 1)
+    if progress:
+        progress(f"Delta {sequence + 1}: {updated:,} updates to '{output}', "
+                 f"{len(appended):,} new incidents to '{new_path}' "
+                 f"(as of {format_epoch(now_epoch)}, {index.count:,} incidents indexed)")
+    return updated, len(appended)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate incremental deltas of an incident dataset")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("index", help="index an existing CSV dataset for delta runs")
+    build.add_argument("output", help="the dataset CSV (or its name when --parts is given)")
+    build.add_argument("--seed", type=int, default=None,
+                       help="seed the dataset was generated with")
+    build.add_argument("--as-of", type=datetime.fromisoformat, default=None,
+                       help="as-of time of the dataset (default: its latest updated date)")
+    build.add_argument("--parts", nargs="+", default=None,
+                       help="part files of the dataset, in id order")
+
+    delta = commands.add_parser("delta", help="write the next delta of an indexed dataset")
+    delta.add_argument("base", help="the indexed dataset CSV")
+    delta.add_argument("--output", required=True, help="CSV for the updates")
+    delta.add_argument("--updates", type=int, default=1000)
+    delta.add_argument("--new", type=int, default=0)
+    delta.add_argument("--as-of", type=datetime.fromisoformat, default=None,
+                       help="as-of time of the delta (default: one day after the last one)")
+    delta.add_argument("--seed", default=None)
+
+    show = commands.add_parser("show", help="print the indexed state of incidents")
+    show.add_argument("base")
+    show.add_argument("inc_numbers", nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "index":
+        try:
+            count = build_index(args.output, seed=args.seed, as_of=args.as_of, paths=args.parts)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Indexed {count:,} incidents to '{index_paths(args.output)[0]}'")
+    elif args.command == "delta":
+        write_delta(args.base, args.output, updates=args.updates, new=args.new, as_of=args.as_of,
+                    seed=args.seed)
+    else:
+        index = DeltaIndex(args.base)
+        for inc_number in args.inc_numbers:
+            found = index.lookup(inc_number)
+            if found is None:
+                print(f"{inc_number}: not in the dataset")
+                continue
+            incident_id, record = found
+            resolution = int(record["resolution"])
+            print(f"{inc_number}: id {incident_id}, {states[record['state']]}, "
+                  f"created {format_epoch(int(record['created']))}, "
+                  f"updated {format_epoch(int(record['updated']))}, "
+                  f"resolution {resolution_codes[resolution] if resolution >= 0 else '-'}, "
+                  f"close notes {close_note_text(int(record['close_note']), int(record['close_note_param']))!r}")
+
+
+if __name__ == "__main__":
+    main()
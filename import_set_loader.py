@@ -0,0 +1,478 @@
+"""Stream generated incidents to the ServiceNow Import Set REST API.
+
+Rows from `iter_incidents` (or an existing CSV) are grouped into batches and
+POSTed to ``/api/now/import/{staging_table}/insertMultiple`` by a fixed
+number of asyncio workers sharing a pool of keep-alive HTTP connections.
+A bounded queue between the generator and the workers provides
+back-pressure, 429/5xx responses are retried with exponential backoff, and
+throughput plus batch latency percentiles are reported at the end.
+
+The Import Set then runs TransformMapScript.js as usual. For local testing,
+``python import_set_loader.py stub`` starts a server that records every
+batch it receives (and can inject 429/503 responses).
+
+Examples:
+    python import_set_loader.py stub --port 8080 --record batches.jsonl
+    python import_set_loader.py load --url http://127.0.0.1:8080 --count 100000
+"""
+import argparse
+import asyncio
+import base64
+import csv
+import json
+import math
+import os
+import random
+import ssl
+import sys
+import time
+import urllib.parse
+from itertools import islice
+
+from Generate_Records_v3 import csv_header, iter_incidents
+
+# Import set staging columns for each CSV column. TransformMapScript.js reads
+# the two date columns as u_create_date / u_update_date.
+import_field_names = {
+    name: "u_" + name.lower() for name in csv_header
+}
+import_field_names["created_date"] = "u_create_date"
+import_field_names["updated_date"] = "u_update_date"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def import_record(row):
+    """Convert a row in the CSV layout into an import set record"""
+    return {import_field_names[name]: str(value) for name, value in zip(csv_header, row)}
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list (0.0 when empty)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class HttpError(Exception):
+    def __init__(self, status, body):
+        super().__init__(f"HTTP {status}: {body[:200]!r}")
+        self.status = status
+        self.body = body
+
+
+class HttpConnectionPool:
+    """A small HTTP/1.1 client that reuses up to `size` keep-alive connections"""
+
+    def __init__(self, url, size=4, timeout=60.0, headers=None):
+        parts = urllib.parse.urlsplit(url)
+        self.secure = parts.scheme == "https"
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.secure else 80)
+        self.base_path = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        self.slots = asyncio.Semaphore(size)
+        self.idle = []
+
+    async def _connect(self):
+        context = ssl.create_default_context() if self.secure else None
+        return await asyncio.open_connection(self.host, self.port, ssl=context)
+
+    async def _roundtrip(self, connection, method, path, body, headers):
+        reader, writer = connection
+        lines = [f"{method} {self.base_path}{path} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 f"Content-Length: {len(body)}", "Connection: keep-alive"]
+        lines += [f"{name}: {value}" for name, value in {**self.headers, **headers}.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            data = b"".join(chunks)
+        elif "content-length" in response_headers:
+            data = await reader.readexactly(int(response_headers["content-length"]))
+        else:
+            data = await reader.read()
+            response_headers["connection"] = "close"
+        return status, response_headers, data
+
+    async def request(self, method, path, body=b"", headers=None):
+        """Send one request and return (status, headers, body)"""
+        async with self.slots:
+            reused = bool(self.idle)
+            connection = self.idle.pop() if reused else await self._connect()
+            try:
+                result = await asyncio.wait_for(
+                    self._roundtrip(connection, method, path, body, headers or {}), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError) as error:
+                connection[1].close()
+                if not reused:
+                    raise
+                # An idle keep-alive connection may have been closed by the server; retry fresh
+                connection = await self._connect()
+                try:
+                    result = await asyncio.wait_for(
+                        self._roundtrip(connection, method, path, body, headers or {}),
+                        self.timeout)
+                except BaseException:
+                    connection[1].close()
+                    raise error
+            except BaseException:
+                connection[1].close()
+                raise
+
+            if result[1].get("connection", "").lower() == "close":
+                connection[1].close()
+            else:
+                self.idle.append(connection)
+            return result
+
+    async def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        for _, writer in self.idle:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+        self.idle = []
+
+
+class LoadReport:
+    """Counters and batch latencies collected during a load"""
+
+    def __init__(self):
+        self.rows = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed_batches = 0
+        self.failed_rows = 0
+        self.latencies = []
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed_batches": self.failed_batches,
+            "failed_rows": self.failed_rows,
+            "elapsed_s": round(self.elapsed, 3),
+            "rows_per_s": round(self.rows / self.elapsed, 1) if self.elapsed else 0.0,
+            "batch_latency_p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "batch_latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "batch_latency_max_ms": round((latencies[-1] if latencies else 0.0) * 1000, 2),
+        }
+
+
+class ImportSetLoader:
+    """Push row batches to an Import Set staging table with bounded concurrency"""
+
+    def __init__(self, url, table="u_incident_import", user=None, password=None,
+                 batch_size=200, concurrency=8, max_retries=6, backoff=0.5, max_backoff=30.0,
+                 queue_batches=None, timeout=60.0):
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if user:
+            token = base64.b64encode(f"{user}:{password or ''}".encode()).decode()
+            headers["Authorization"] = f"Basic {token}"
+        self.pool = HttpConnectionPool(url, size=concurrency, timeout=timeout, headers=headers)
+        self.path = f"/api/now/import/{table}/insertMultiple"
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # Generation may only run this many batches ahead of the uploads
+        self.queue_batches = queue_batches or concurrency * 2
+        self.report = LoadReport()
+
+    async def _send(self, records):
+        body = json.dumps({"records": records}).encode()
+        started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                status, headers, data = await self.pool.request("POST", self.path, body)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError,
+                    ValueError, IndexError) as error:
+                # Connection trouble or a garbled response (bad status line, chunk size): retry
+                status, headers, data = None, {}, str(error).encode()
+            if status is not None and 200 <= status < 300:
+                self.report.latencies.append(time.perf_counter() - started)
+                return
+            if status is not None and status not in RETRY_STATUSES:
+                raise HttpError(status, data)
+            if attempt == self.max_retries:
+                break
+            self.report.retries += 1
+            # Honour Retry-After, otherwise exponential backoff with full jitter
+            delay = headers.get("retry-after")
+            if delay and delay.replace(".", "", 1).isdigit():
+                delay = float(delay)
+            else:
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            await asyncio.sleep(delay)
+        raise HttpError(status or 0, data)
+
+    async def send_batch(self, records):
+        """Upload one batch with retries, counting it in the report; True on success.
+
+        Any failure only fails this batch, so the worker stays alive for the
+        next one and load() never waits on a queue nobody reads.
+        """
+        try:
+            await self._send(records)
+        except Exception as error:
+            self.report.failed_batches += 1
+            self.report.failed_rows += len(records)
+            reason = error if isinstance(error, HttpError) else f"{type(error).__name__}: {error}"
+            print(f"Batch of {len(records)} rows failed: {reason}", file=sys.stderr)
+            return False
+        self.report.rows += len(records)
+        self.report.batches += 1
+        return True
+
+    async def _worker(self, queue):
+        while True:
+            records = await queue.get()
+            try:
+                if records is None:
+                    return
+                await self.send_batch(records)
+            finally:
+                queue.task_done()
+
+    async def load(self, rows, progress=None):
+        """Upload all rows; returns the LoadReport"""
+        queue = self.queue = asyncio.Queue(maxsize=self.queue_batches)
+        workers = [asyncio.create_task(self._worker(queue)) for _ in range(self.concurrency)]
+        rows = iter(rows)
+        queued = 0
+        try:
+            while True:
+                records = [import_record(row) for row in islice(rows, self.batch_size)]
+                if not records:
+                    break
+                # Blocks while the queue is full, so generation never runs far ahead
+                await queue.put(records)
+                queued += len(records)
+                if progress and queued % (self.batch_size * 50) < self.batch_size:
+                    progress(f"Queued {queued} records, uploaded {self.report.rows}...")
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await self.pool.close()
+            self.report.finished = time.perf_counter()
+        return self.report
+
+
+class ImportSetStubServer:
+    """Local stand-in for the Import Set API that records every batch received.
+
+    `fail_every` makes every Nth request fail with `fail_status` (429 by
+    default) so retry handling can be exercised; `delay` adds server latency.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, record_path=None, fail_every=0,
+                 fail_status=429, delay=0.0):
+        self.host = host
+        self.port = port
+        self.record_path = record_path
+        self.fail_every = fail_every
+        self.fail_status = fail_status
+        self.delay = delay
+        self.batches = []
+        self.requests = 0
+        self.record_file = None
+        self.server = None
+        self.connections = set()
+
+    async def start(self):
+        if self.record_path:
+            self.record_file = open(self.record_path, "a", encoding="utf-8")
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def close(self):
+        self.server.close()
+        # Drop idle keep-alive clients so their handlers see EOF and finish
+        for writer in list(self.connections):
+            writer.close()
+        await self.server.wait_closed()
+        while self.connections:
+            await asyncio.sleep(0.01)
+        if self.record_file:
+            self.record_file.close()
+
+    def _respond(self, writer, status, payload, extra_headers=()):
+        body = json.dumps(payload).encode()
+        reason = {200: "OK", 201: "Created", 429: "Too Many Requests"}.get(status, "Error")
+        head = [f"HTTP/1.1 {status} {reason}", "Content-Type: application/json",
+                f"Content-Length: {len(body)}", "Connection: keep-alive", *extra_headers]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+
+    def handle_batch(self, path, payload):
+        """Record one request body; returns (status, response payload)"""
+        records = payload.get("records", [])
+        self.batches.append(records)
+        if self.record_file:
+            self.record_file.write(json.dumps({"path": path, "records": records}) + "\n")
+        return 201, {"import_set_id": f"ISET{len(self.batches):07d}",
+                     "result": [{"status": "inserted"} for _ in records]}
+
+    async def _handle(self, reader, writer):
+        self.connections.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                self.requests += 1
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                if self.fail_every and self.requests % self.fail_every == 0:
+                    self._respond(writer, self.fail_status, {"error": "injected failure"},
+                                  ["Retry-After: 0.05"] if self.fail_status == 429 else [])
+                else:
+                    status, payload = self.handle_batch(path, json.loads(body or b"{}"))
+                    self._respond(writer, status, payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+
+def read_csv_rows(path):
+    """Yield data rows of an incidents CSV, skipping the header"""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        yield from reader
+
+
+async def _run_stub(args):
+    stub = await ImportSetStubServer(args.host, args.port, args.record, args.fail_every,
+                                     args.fail_status, args.delay).start()
+    print(f"Import set stub listening on {stub.url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stub.close()
+
+
+async def _run_load(args):
+    metrics = None
+    if args.metrics_json or args.metrics_port:
+        import instrumentation
+
+        metrics = instrumentation.enable(loader=sys.modules[__name__])
+        if args.metrics_port:
+            metrics.serve(args.metrics_port)
+    rows = read_csv_rows(args.input) if args.input else iter_incidents(
+        args.count, seed=args.seed, batch_size=args.generate_batch_size)
+    loader = ImportSetLoader(args.url, table=args.table, user=args.user,
+                             password=os.environ.get("SN_PASSWORD"), batch_size=args.batch_size,
+                             concurrency=args.concurrency, max_retries=args.max_retries)
+    report = await loader.load(rows, progress=print)
+    summary = report.summary()
+    print(f"Uploaded {summary['rows']:,} rows in {summary['elapsed_s']}s "
+          f"({summary['rows_per_s']:,} rows/s), {summary['retries']} retries, "
+          f"{summary['failed_batches']} failed batches")
+    print(f"Batch latency p50 {summary['batch_latency_p50_ms']} ms, "
+          f"p99 {summary['batch_latency_p99_ms']} ms")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    if args.metrics_json:
+        metrics.dump(args.metrics_json)
+    return 1 if summary["failed_batches"] else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("load", help="upload incidents to an import set table")
+    load.add_argument("--url", required=True, help="instance URL, e.g. https://dev123.service-now.com")
+    load.add_argument("--table", default="u_incident_import", help="import set staging table")
+    load.add_argument("--user", help="basic auth user (password from $SN_PASSWORD)")
+    load.add_argument("--input", help="upload this CSV instead of generating rows")
+    load.add_argument("--count", type=int, default=15000, help="number of incidents to generate")
+    load.add_argument("--seed", type=int, default=None)
+    load.add_argument("--generate-batch-size", type=int, default=0,
+                      help="use the NumPy batch engine with this batch size")
+    load.add_argument("--batch-size", type=int, default=200, help="records per request")
+    load.add_argument("--concurrency", type=int, default=8, help="requests in flight")
+    load.add_argument("--max-retries", type=int, default=6)
+    load.add_argument("--report", help="write the throughput/latency summary as JSON")
+    load.add_argument("--metrics-json", help="record per-stage timings (generation, upload, HTTP) "
+                                             "to this JSON file")
+    load.add_argument("--metrics-port", type=int,
+                      help="serve the metrics in Prometheus text format on 127.0.0.1:PORT/metrics")
+
+    stub = commands.add_parser("stub", help="run a local import set stub that records batches")
+    stub.add_argument("--host", default="127.0.0.1")
+    stub.add_argument("--port", type=int, default=8080)
+    stub.add_argument("--record", help="append received batches to this JSONL file")
+    stub.add_argument("--fail-every", type=int, default=0, help="fail every Nth request")
+    stub.add_argument("--fail-status", type=int, default=429)
+    stub.add_argument("--delay", type=float, default=0.0, help="seconds of latency per request")
+
+    args = parser.parse_args()
+    if args.command == "stub":
+        try:
+            asyncio.run(_run_stub(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    return asyncio.run(_run_load(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
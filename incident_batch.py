@@ -0,0 +1,372 @@
+"""Vectorized NumPy batch engine for Generate_Records_v3.
+
+Instead of building one Python list per incident, `generate_incident_batch`
+draws a whole block of rows at once as columnar arrays: integer codes into
+the lookup tables of Generate_Records_v3 and int64 timestamps (seconds since
+1970-01-01 on the same naive wall clock `datetime.now()` uses). Strings are
+only materialized by `IncidentBatch.rows()` when the rows are written.
+"""
+from datetime import datetime
+
+import numpy as np
+
+from Generate_Records_v3 import (
+    INC_NUMBER_SPACE,
+    SECONDS_PER_DAY,
+    FEISTEL_HALF_BITS,
+    FEISTEL_HALF_MASK,
+    close_notes_templates,
+    compiled_issues,
+    counter_key,
+    default_inc_key,
+    default_tables,
+    description_templates,
+    impact_levels,
+    incident_categories,
+    incident_types,
+    is_active,
+    naive_epoch,
+    placeholder_names,
+    placeholder_ranges,
+    priorities,
+    resolution_codes,
+    services,
+    split_close_note,
+    states,
+    time_of_day_strings,
+)
+
+# Issues are flattened into one table; each category owns a contiguous slice
+category_names = incident_categories
+issue_names = [issue for category in category_names for issue in incident_types[category]]
+category_issue_counts = np.array([len(incident_types[c]) for c in category_names], dtype=np.int64)
+category_issue_offsets = np.concatenate(([0], np.cumsum(category_issue_counts)[:-1]))
+
+state_is_active = np.array([is_active(state) for state in states])
+
+# Close note templates flattened the same way as issues, per resolution code;
+# kind is the index into placeholder_names, or -1 for fixed text
+close_note_prefix = []
+close_note_kind = []
+close_note_suffix = []
+resolution_template_offsets = []
+resolution_template_counts = []
+for code in resolution_codes:
+    resolution_template_offsets.append(len(close_note_prefix))
+    resolution_template_counts.append(len(close_notes_templates[code]))
+    for template in close_notes_templates[code]:
+        prefix, name, suffix = split_close_note(template)
+        close_note_prefix.append(prefix)
+        close_note_kind.append(placeholder_names.index(name) if name else -1)
+        close_note_suffix.append(suffix)
+
+close_note_prefix = np.array(close_note_prefix, dtype=object)
+close_note_suffix = np.array(close_note_suffix, dtype=object)
+close_note_kind = np.array(close_note_kind, dtype=np.int64)
+resolution_template_offsets = np.array(resolution_template_offsets, dtype=np.int64)
+resolution_template_counts = np.array(resolution_template_counts, dtype=np.int64)
+placeholder_low = np.array([placeholder_ranges[n][0] for n in placeholder_names], dtype=np.int64)
+placeholder_high = np.array([placeholder_ranges[n][1] for n in placeholder_names], dtype=np.int64)
+
+# The (service, issue) and (template, service, issue) text compiled by
+# Generate_Records_v3, rearranged so per-row text is a single array lookup
+short_description_table = np.array(
+    [[entry[1] for issues in per_service for entry in issues] for per_service in compiled_issues],
+    dtype=object,
+)
+description_table = np.array(
+    [[[entry[2][template] for issues in per_service for entry in issues]
+      for per_service in compiled_issues]
+     for template in range(len(description_templates))],
+    dtype=object,
+)
+
+_time_of_day = None
+
+
+def numpy_rng(seed=None):
+    """Return the NumPy generator used for batch generation"""
+    return np.random.default_rng(seed)
+
+
+GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+
+
+def splitmix64(x):
+    """SplitMix64 output for an array of uint64 states (arithmetic wraps mod 2**64)"""
+    x = x + GOLDEN_GAMMA
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+class CounterGenerator:
+    """Stand-in for a NumPy Generator whose draws are a function of (seed, id, draw).
+
+    Built for one batch of ids: the n-th call returns, for every row, the
+    SplitMix64 hash of that row's stream (seed key and id) advanced n steps.
+    generate_incident_batch makes the same calls in the same order for
+    every batch, so a row gets the same values however the id range is cut
+    into batches. Only the calls the batch engine makes are provided, and
+    every draw covers the whole batch or, via integers_where, a masked part.
+    """
+
+    def __init__(self, key, ids):
+        self.streams = splitmix64(np.uint64(key) ^ splitmix64(ids.astype(np.uint64)))
+        self.draws = 0
+
+    def _uniform(self, mask=None):
+        self.draws += 1
+        streams = self.streams if mask is None else self.streams[mask]
+        # Step in Python ints: NumPy warns when uint64 scalars wrap around
+        step = np.uint64(self.draws * int(GOLDEN_GAMMA) & 0xFFFFFFFFFFFFFFFF)
+        return (splitmix64(streams + step) >> np.uint64(11)) * 2.0 ** -53
+
+    def random(self, size=None):
+        return self._uniform()
+
+    def integers(self, low, high=None, size=None):
+        if high is None:
+            low, high = 0, low
+        return self._integers(self._uniform(), low, high)
+
+    def integers_where(self, mask, low, high):
+        """integers(low, high) for the rows selected by `mask` only"""
+        return self._integers(self._uniform(mask), low, high)
+
+    @staticmethod
+    def _integers(uniform, low, high):
+        low = np.asarray(low, dtype=np.int64)
+        return low + (uniform * (np.asarray(high, dtype=np.int64) - low)).astype(np.int64)
+
+
+def _integers_where(rng, mask, low, high):
+    """rng.integers(low, high) where low/high cover only the rows in `mask`"""
+    if isinstance(rng, CounterGenerator):
+        return rng.integers_where(mask, low, high)
+    return rng.integers(low, high)
+
+
+def format_epochs(epochs):
+    """Format epoch seconds as '%Y-%m-%d %H:%M:%S' strings (object array)"""
+    global _time_of_day
+    if _time_of_day is None:
+        _time_of_day = np.array(time_of_day_strings(), dtype=object)
+    days, seconds = np.divmod(epochs, SECONDS_PER_DAY)
+    # Only a few hundred distinct days per batch, so format each one once
+    unique_days, day_index = np.unique(days, return_inverse=True)
+    day_strings = np.array(
+        [str(np.datetime64(int(day), "D")) + " " for day in unique_days], dtype=object
+    )
+    return day_strings[day_index] + _time_of_day[seconds]
+
+
+class IncidentBatch:
+    """A block of generated incidents stored as columnar arrays.
+
+    Categorical columns hold integer codes into the Generate_Records_v3
+    tables, dates are epoch seconds, and rows without a resolution carry
+    -1 in `resolution` and `close_note`.
+    """
+
+    def __init__(self, ids, inc_numbers, service, issue, description_template, state,
+                 priority, impact, urgency, created, updated, resolution, close_note,
+                 close_note_param):
+        self.ids = ids
+        self.inc_numbers = inc_numbers
+        self.service = service
+        self.issue = issue
+        self.description_template = description_template
+        self.state = state
+        self.priority = priority
+        self.impact = impact
+        self.urgency = urgency
+        self.created = created
+        self.updated = updated
+        self.resolution = resolution
+        self.close_note = close_note
+        self.close_note_param = close_note_param
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def category(self):
+        return np.searchsorted(category_issue_offsets, self.issue, side="right") - 1
+
+    @property
+    def active(self):
+        return state_is_active[self.state]
+
+    def close_notes(self):
+        """Build the close_notes column; empty for rows without a resolution"""
+        notes = np.full(len(self), "", dtype=object)
+        has_note = self.close_note >= 0
+        template = self.close_note[has_note]
+        kind = close_note_kind[template]
+        param = self.close_note_param[has_note]
+
+        values = np.full(len(template), "", dtype=object)
+        is_inc = kind == placeholder_names.index("inc_number")
+        is_number = (kind >= 0) & ~is_inc
+        values[is_inc] = np.char.mod("INC%07d", param[is_inc]).astype(object)
+        values[is_number] = np.char.mod("%d", param[is_number]).astype(object)
+
+        notes[has_note] = close_note_prefix[template] + values + close_note_suffix[template]
+        return notes
+
+    def columns(self):
+        """Materialize the batch as string/number columns in CSV column order"""
+        categories = np.array([c.capitalize() for c in category_names], dtype=object)
+        resolution_names = np.array([""] + resolution_codes, dtype=object)
+        return [
+            np.char.mod("INC%07d", self.inc_numbers).astype(object),
+            self.ids,
+            short_description_table[self.service, self.issue],
+            description_table[self.description_template, self.service, self.issue],
+            np.array(services, dtype=object)[self.service],
+            categories[self.category],
+            np.array(states, dtype=object)[self.state],
+            np.array(priorities, dtype=object)[self.priority],
+            np.array(impact_levels, dtype=object)[self.impact],
+            np.array(impact_levels, dtype=object)[self.urgency],
+            format_epochs(self.created),
+            format_epochs(self.updated),
+            resolution_names[self.resolution + 1],
+            self.close_notes(),
+            self.active,
+        ]
+
+    def rows(self):
+        """Iterate over the batch as rows in the generate_incident layout"""
+        return zip(*(column.tolist() for column in self.columns()))
+
+
+def permute_inc_numbers(ids, key=default_inc_key):
+    """Vectorized permute_inc_number: the same keyed Feistel permutation per id"""
+    block, value = np.divmod(ids.astype(np.uint64), np.uint64(INC_NUMBER_SPACE))
+    pending = np.ones(len(value), dtype=bool)
+    while pending.any():
+        walk = value[pending]
+        left = walk >> np.uint64(FEISTEL_HALF_BITS)
+        right = walk & np.uint64(FEISTEL_HALF_MASK)
+        for round_key in key:
+            # Same round function as Generate_Records_v3._feistel_round
+            mixed = ((right ^ np.uint64(round_key)) * np.uint64(0x9E3779B1)) & np.uint64(0xFFFFFFFF)
+            mixed ^= mixed >> np.uint64(15)
+            mixed = (mixed * np.uint64(0x85EBCA6B)) & np.uint64(0xFFFFFFFF)
+            left, right = right, left ^ ((mixed >> np.uint64(13)) & np.uint64(FEISTEL_HALF_MASK))
+        value[pending] = (left << np.uint64(FEISTEL_HALF_BITS)) | right
+        # Cycle-walk until every value lands back inside the 7-digit space
+        pending[pending] = value[pending] >= INC_NUMBER_SPACE
+    return (block * np.uint64(INC_NUMBER_SPACE) + value).astype(np.int64)
+
+
+def generate_batch_dates(state, rng, now_epoch):
+    """Vectorized generate_dates: created/updated epoch seconds per state code"""
+    count = len(state)
+    active = state_is_active[state]
+
+    # Created date in the last 12 months (365 days)
+    created_days_ago = rng.integers(0, 366, count)
+    created = now_epoch - created_days_ago * SECONDS_PER_DAY
+
+    # Active tickets move 0..30 days forward, closed ones 1..60 days (never past now)
+    low = np.where(active, 0, 1)
+    max_days_difference = np.minimum(created_days_ago, np.where(active, 30, 60))
+    days_difference = rng.integers(low, np.maximum(max_days_difference, low) + 1)
+    hours_difference = rng.integers(low, 24)
+    minutes_difference = rng.integers(0, 60, count)
+
+    updated = (created + days_difference * SECONDS_PER_DAY
+               + hours_difference * 3600 + minutes_difference * 60)
+
+    # Ensure updated date doesn't exceed current date (nor fall before created)
+    fallback = np.maximum(created, now_epoch - rng.integers(1, 13, count) * 3600)
+    updated = np.where(updated > now_epoch, fallback, updated)
+    return created, updated
+
+
+def generate_incident_batch(start_id, count, rng, now, inc_key=default_inc_key, arrivals=None,
+                            tables=default_tables):
+    """Generate incidents start_id .. start_id + count - 1 as an IncidentBatch.
+
+    `rng` is a NumPy Generator, or a CounterGenerator for these ids, and
+    `now` the naive datetime all dates are relative to, pinned for the
+    whole batch. `arrivals` is an optional
+    arrival_model.ArrivalSampler replacing the uniform date model. `tables`
+    may reweight the built-in values (see check_tables) but not change them.
+    """
+    ids = np.arange(start_id, start_id + count, dtype=np.int64)
+
+    service = tables.services.sample(rng, count)
+    category = tables.categories.sample(rng, count)
+    issue = category_issue_offsets[category] + rng.integers(0, category_issue_counts[category])
+    description_template = rng.integers(0, len(description_templates), count)
+
+    # Generate INC numbers (unique per id for a given key)
+    inc_numbers = permute_inc_numbers(ids, inc_key)
+
+    state = tables.states.sample(rng, count)
+    priority = tables.priorities.sample(rng, count)
+    impact = tables.impact_levels.sample(rng, count)
+    urgency = tables.impact_levels.sample(rng, count)
+
+    if arrivals is None:
+        created, updated = generate_batch_dates(state, rng, naive_epoch(now))
+    else:
+        created, updated = arrivals.dates(service, state, rng)
+
+    # For resolved/closed incidents, pick a resolution code and close note template
+    resolved = ~state_is_active[state]
+    resolution = np.where(resolved, tables.resolution_codes.sample(rng, count), -1)
+    code = resolution[resolved]
+    close_note = np.full(count, -1, dtype=np.int64)
+    close_note[resolved] = (resolution_template_offsets[code]
+                            + _integers_where(rng, resolved, 0, resolution_template_counts[code]))
+
+    # Numeric placeholder values (reference INC, KA, CHG or PRB ids)
+    kind = np.where(close_note >= 0, close_note_kind[close_note], -1)
+    close_note_param = np.zeros(count, dtype=np.int64)
+    has_param = kind >= 0
+    close_note_param[has_param] = _integers_where(rng, has_param, placeholder_low[kind[has_param]],
+                                                  placeholder_high[kind[has_param]] + 1)
+
+    return IncidentBatch(ids, inc_numbers, service, issue, description_template, state,
+                         priority, impact, urgency, created, updated, resolution,
+                         close_note, close_note_param)
+
+
+def check_tables(tables):
+    """The batch engine's text and code tables are built from the built-in
+    values, so other IncidentTables may only change the weights"""
+    if tables is not default_tables and not tables.same_values(default_tables):
+        raise ValueError("The batch engine only supports reweighting the built-in tables; "
+                         "use the row engine for specs with other values")
+
+
+def counter_rng(seed, start_id, count):
+    """CounterGenerator for ids start_id .. start_id + count - 1"""
+    return CounterGenerator(counter_key(seed), np.arange(start_id, start_id + count, dtype=np.int64))
+
+
+def iter_incident_batches(count, seed=None, start_id=1, now=None, batch_size=100000,
+                          inc_key=default_inc_key, arrivals=None, tables=default_tables,
+                          counter=False):
+    """Yield IncidentBatch blocks of up to `batch_size` rows covering `count` ids
+
+    With `counter` every row is a function of (seed, id) alone, so any id
+    range can be generated on its own.
+    """
+    check_tables(tables)
+    if counter and arrivals is not None:
+        raise ValueError("The arrival model draws per outage, not per id; "
+                         "it cannot be combined with counter-based generation")
+    if now is None:
+        now = datetime.now()
+    rng = None if counter else numpy_rng(seed)
+    stop_id = start_id + count
+    for start in range(start_id, stop_id, batch_size):
+        size = min(batch_size, stop_id - start)
+        yield generate_incident_batch(start, size, rng or counter_rng(seed, start, size), now,
+                                      inc_key, arrivals, tables)
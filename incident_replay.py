@@ -0,0 +1,421 @@
+"""Replay incidents at the pace of their created_date, compressed N times.
+
+Instead of uploading a dataset as fast as possible, a replay sends each
+incident when its created_date comes up on a compressed clock: with
+``--speedup 720`` a month of incidents arrives over one hour. Rows are read
+as a stream (an existing CSV in created_date order, or generated rows put
+in order with partitioned_output.sort_rows) and only a short horizon ahead
+of the clock is held in memory.
+
+Scheduling has three stages:
+
+* a timer wheel (`TimerWheel`) holds upcoming rows in per-tick slots, so
+  everything due in one tick (10 ms by default) is fired by one wakeup,
+* an optional token bucket (`TokenBucket`) caps the rows per second sent,
+* a bounded in-flight window limits the requests outstanding at once.
+
+Batches go to the Import Set API through import_set_loader.ImportSetLoader
+(keep-alive pool, retries), or to an in-process ImportSetStubServer with
+``--stub``.
+
+The report compares the achieved rate with the target rate and breaks each
+row's schedule lag (send time - due time) into its parts: throttle waits
+(the token bucket), window waits (every in-flight slot taken, i.e. the
+server is slow) and the rest, client lag (timer and event loop running
+late, i.e. this client is slow), next to the server's request latency.
+The dispatcher only queues due batches for a sender task, and a batch that
+queues behind a throttled or blocked one is charged that wait, so the
+split holds up under back-pressure too.
+
+Examples:
+    python incident_replay.py --input incidents.csv --speedup 720 --url https://dev123.service-now.com
+    python incident_replay.py --count 100000 --seed 7 --speedup 8760 --stub --stub-delay 0.02
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+from datetime import datetime
+from itertools import chain
+
+from Generate_Records_v3 import csv_header, iter_incidents, naive_epoch
+from import_set_loader import ImportSetLoader, ImportSetStubServer, import_record, read_csv_rows
+from incident_stats import LogSketch
+
+CREATED_COLUMN = csv_header.index("created_date")
+
+report_quantiles = [0.5, 0.9, 0.99]
+
+
+class TimerWheel:
+    """Hashed timing wheel of `slots` buckets, `tick` seconds each.
+
+    schedule() is O(1) and advance() returns everything due in the current
+    tick at once. Entries more than one revolution out stay in their slot
+    until their own turn comes round.
+    """
+
+    def __init__(self, origin, tick=0.01, slots=1024):
+        self.origin = origin
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        # Next tick to fire
+        self.current = 0
+        self.pending = 0
+
+    @property
+    def span(self):
+        return self.tick * len(self.slots)
+
+    def time(self):
+        """Clock time the current tick fires at"""
+        return self.origin + self.current * self.tick
+
+    def schedule(self, due, item):
+        # Anything already overdue fires with the current tick
+        tick = max(self.current, math.ceil((due - self.origin) / self.tick))
+        self.slots[tick % len(self.slots)].append((tick, due, item))
+        self.pending += 1
+
+    def advance(self):
+        """Fire the current tick: returns its (tick, due, item) entries in insertion order"""
+        index = self.current % len(self.slots)
+        slot = self.slots[index]
+        current = self.current
+        self.current += 1
+        if not slot:
+            return slot
+        if all(entry[0] == current for entry in slot):
+            self.slots[index] = []
+            fired = slot
+        else:
+            fired = [entry for entry in slot if entry[0] == current]
+            self.slots[index] = [entry for entry in slot if entry[0] != current]
+        self.pending -= len(fired)
+        return fired
+
+
+class TokenBucket:
+    """Allow `rate` units per second on average, in bursts of up to `burst`"""
+
+    def __init__(self, rate, burst=None, clock=None):
+        self.rate = rate
+        self.burst = burst or rate
+        self.clock = clock or asyncio.get_running_loop().time
+        self.tokens = self.burst
+        self.updated = self.clock()
+
+    async def acquire(self, amount=1):
+        """Take `amount` tokens, sleeping until they are available; returns the wait"""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Going into debt lets a request bigger than the burst through after a longer wait
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        wait = -self.tokens / self.rate
+        await asyncio.sleep(wait)
+        return wait
+
+
+class ReplayReport:
+    """Target vs achieved rate and lag sketches for one replay"""
+
+    def __init__(self, speedup, late_after=0.1):
+        self.speedup = speedup
+        self.late_after = late_after
+        self.rows = 0
+        self.late_rows = 0
+        self.out_of_order = 0
+        self.first_created = None
+        self.last_created = None
+        self.started = None
+        self.finished = None
+        self.schedule_lag = LogSketch()
+        self.client_lag = LogSketch()
+        self.throttle_wait = LogSketch()
+        self.window_wait = LogSketch()
+
+    def summary(self, load_report):
+        span = (self.last_created - self.first_created) if self.rows else 0
+        scheduled = span / self.speedup
+        elapsed = (self.finished or 0.0) - (self.started or 0.0)
+        sent = load_report.rows
+        latency = LogSketch()
+        for seconds in load_report.latencies:
+            latency.add(seconds)
+        summary = {
+            "rows": self.rows,
+            "rows_sent": sent,
+            "failed_rows": load_report.failed_rows,
+            "batches": load_report.batches,
+            "retries": load_report.retries,
+            "out_of_order_rows": self.out_of_order,
+            "speedup": self.speedup,
+            "data_span_s": span,
+            "scheduled_s": round(scheduled, 3),
+            "elapsed_s": round(elapsed, 3),
+            "target_rows_per_s": round(self.rows / scheduled, 1) if scheduled else None,
+            "achieved_rows_per_s": round(sent / elapsed, 1) if elapsed else 0.0,
+            "late_rows": self.late_rows,
+            "late_after_ms": round(self.late_after * 1000, 3),
+        }
+        for name, sketch in [("schedule_lag", self.schedule_lag), ("client_lag", self.client_lag),
+                             ("throttle_wait", self.throttle_wait),
+                             ("window_wait", self.window_wait), ("request_latency", latency)]:
+            for q in report_quantiles:
+                value = sketch.quantile(q)
+                summary[f"{name}_p{round(q * 100)}_ms"] = round((value or 0.0) * 1000, 3)
+            summary[f"{name}_max_ms"] = round(max(sketch.max, 0.0) * 1000, 3)
+        return summary
+
+
+class ReplayScheduler:
+    """Send rows to an ImportSetLoader when their compressed created_date comes due"""
+
+    def __init__(self, loader, speedup=1.0, max_rate=None, burst=None, window=8, batch_size=1,
+                 tick=0.01, slots=1024, late_after=0.1, max_backlog=100000):
+        self.loader = loader
+        self.speedup = speedup
+        self.max_rate = max_rate
+        self.burst = burst
+        self.window = window
+        self.batch_size = batch_size
+        self.tick = tick
+        self.slots = slots
+        self.max_backlog = max_backlog
+        self.report = ReplayReport(speedup, late_after)
+        # Rows fired but not yet sent, and the sender's blocked-time totals
+        self.backlog = 0
+        self.throttled = 0.0
+        self.windowed = 0.0
+        self.blocked_on = None
+        self.blocked_since = 0.0
+
+    async def _feed(self, rows, wheel):
+        """Read rows and put each on the wheel once it is within the horizon"""
+        report = self.report
+        # Half a revolution ahead, so no entry waits a full turn in its slot
+        horizon = wheel.span / 2
+        clock_origin = wheel.origin
+        for count, row in enumerate(rows, 1):
+            created = naive_epoch(datetime.fromisoformat(row[CREATED_COLUMN]))
+            if report.first_created is None:
+                report.first_created = report.last_created = created
+            elif created < report.last_created:
+                report.out_of_order += 1
+            else:
+                report.last_created = created
+            due = clock_origin + (created - report.first_created) / self.speedup
+            # Relative to the wheel, not the wall clock, so a wheel running
+            # behind does not pile up rows; nor does a sender that is held up
+            while (ahead := due - wheel.time() - horizon) > 0:
+                await asyncio.sleep(ahead)
+            while self.backlog >= self.max_backlog:
+                await asyncio.sleep(wheel.tick)
+            wheel.schedule(due, row)
+            report.rows += 1
+            if count % 1000 == 0:
+                # Let the dispatcher in between bursts of rows that are already due
+                await asyncio.sleep(0)
+
+    async def _send(self, rows, window):
+        try:
+            await self.loader.send_batch([import_record(row) for row in rows])
+        finally:
+            window.release()
+
+    def _blocked(self, now):
+        """Seconds the sender has spent on the token bucket and the window so far"""
+        throttled, windowed = self.throttled, self.windowed
+        if self.blocked_on == "throttle":
+            throttled += now - self.blocked_since
+        elif self.blocked_on == "window":
+            windowed += now - self.blocked_since
+        return throttled, windowed
+
+    async def _dispatch(self, wheel, feeding, queue):
+        """Fire the wheel tick by tick, handing due batches to the sender without blocking"""
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = wheel.time() - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            entries = wheel.advance()
+            if not entries:
+                if feeding.done() and not wheel.pending:
+                    queue.put_nowait(None)
+                    return
+                continue
+            # The sender's blocked time from here on is what these rows wait for
+            blocked = self._blocked(loop.time())
+            for start in range(0, len(entries), self.batch_size):
+                queue.put_nowait((blocked, entries[start:start + self.batch_size]))
+            self.backlog += len(entries)
+
+    async def _sender(self, queue, bucket, window, sending):
+        """Send queued batches in order through the token bucket and the in-flight window"""
+        loop = asyncio.get_running_loop()
+        report = self.report
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            blocked, batch = item
+            if bucket is not None:
+                self.blocked_on, self.blocked_since = "throttle", loop.time()
+                await bucket.acquire(len(batch))
+                self.throttled += loop.time() - self.blocked_since
+            self.blocked_on, self.blocked_since = "window", loop.time()
+            await window.acquire()
+            sent_at = loop.time()
+            self.windowed += sent_at - self.blocked_since
+            self.blocked_on = None
+            self.backlog -= len(batch)
+            # Waiting behind earlier batches counts towards what held those up
+            throttled = self.throttled - blocked[0]
+            windowed = self.windowed - blocked[1]
+            for _, due, _ in batch:
+                lag = sent_at - due
+                report.schedule_lag.add(lag)
+                report.client_lag.add(max(0.0, lag - throttled - windowed))
+                report.throttle_wait.add(throttled)
+                report.window_wait.add(windowed)
+                if lag > report.late_after:
+                    report.late_rows += 1
+            task = asyncio.create_task(self._send([row for _, _, row in batch], window))
+            sending.add(task)
+            task.add_done_callback(sending.discard)
+
+    async def replay(self, rows):
+        """Replay all rows; returns the summary dict"""
+        loop = asyncio.get_running_loop()
+        report = self.report
+        # Start the clock only once the first row is in hand; a sorted
+        # stream does all its sorting before it yields anything
+        rows = iter(rows)
+        first = next(rows, None)
+        rows = chain([first], rows) if first is not None else ()
+        wheel = TimerWheel(loop.time(), self.tick, self.slots)
+        bucket = TokenBucket(self.max_rate, self.burst) if self.max_rate else None
+        window = asyncio.Semaphore(self.window)
+        queue = asyncio.Queue()
+        sending = set()
+        report.started = loop.time()
+        feeding = asyncio.create_task(self._feed(rows, wheel))
+        try:
+            await asyncio.gather(feeding, self._dispatch(wheel, feeding, queue),
+                                 self._sender(queue, bucket, window, sending))
+            await asyncio.gather(*sending)
+        finally:
+            feeding.cancel()
+            for task in sending:
+                task.cancel()
+            await self.loader.pool.close()
+            report.finished = loop.time()
+        return report.summary(self.loader.report)
+
+
+def print_summary(summary):
+    target = summary["target_rows_per_s"]
+    print(f"Replayed {summary['rows_sent']:,} of {summary['rows']:,} rows in "
+          f"{summary['elapsed_s']}s (scheduled {summary['scheduled_s']}s at {summary['speedup']}x)")
+    print(f"Rate: achieved {summary['achieved_rows_per_s']:,} rows/s, target "
+          f"{f'{target:,} rows/s' if target is not None else 'n/a'}; "
+          f"{summary['late_rows']:,} rows more than {summary['late_after_ms']} ms late")
+    for name, label in [("schedule_lag", "Schedule lag"), ("client_lag", "  client"),
+                        ("throttle_wait", "  token bucket"), ("window_wait", "  window (server)"),
+                        ("request_latency", "Request latency")]:
+        print(f"{label:<18} p50 {summary[f'{name}_p50_ms']} ms, p90 {summary[f'{name}_p90_ms']} ms, "
+              f"p99 {summary[f'{name}_p99_ms']} ms, max {summary[f'{name}_max_ms']} ms")
+    if summary["out_of_order_rows"]:
+        print(f"{summary['out_of_order_rows']:,} rows were out of created_date order and were sent "
+              f"late; pass --sort for unsorted input")
+
+
+async def _run(args):
+    if args.input:
+        rows = (row for path in args.input for row in read_csv_rows(path))
+    else:
+        rows = iter_incidents(args.count, seed=args.seed, now=args.as_of,
+                              batch_size=args.generate_batch_size)
+    if args.sort or not args.input:
+        from partitioned_output import sort_rows
+
+        # Generated rows come in id order; put them in created_date order
+        rows = sort_rows(rows, memory_mb=args.memory_mb)
+
+    stub = None
+    url = args.url
+    if args.stub:
+        stub = await ImportSetStubServer(delay=args.stub_delay, fail_every=args.stub_fail_every,
+                                         record_path=args.stub_record).start()
+        url = stub.url
+    loader = ImportSetLoader(url, table=args.table, user=args.user,
+                             password=os.environ.get("SN_PASSWORD"), batch_size=args.batch_size,
+                             concurrency=args.window, max_retries=args.max_retries)
+    scheduler = ReplayScheduler(loader, speedup=args.speedup, max_rate=args.max_rate,
+                                burst=args.burst, window=args.window, batch_size=args.batch_size,
+                                tick=args.tick_ms / 1000, late_after=args.late_ms / 1000)
+    try:
+        summary = await scheduler.replay(rows)
+    finally:
+        if stub is not None:
+            await stub.close()
+    print_summary(summary)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    return 1 if summary["failed_rows"] else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="instance URL, e.g. https://dev123.service-now.com")
+    target.add_argument("--stub", action="store_true",
+                        help="replay into an in-process import set stub server")
+    parser.add_argument("--input", nargs="+",
+                        help="CSV files to replay, in created_date order (e.g. partition files)")
+    parser.add_argument("--sort", action="store_true",
+                        help="sort --input by created_date first (generated rows always are)")
+    parser.add_argument("--memory-mb", type=float, default=512,
+                        help="memory budget for sorting before rows spill to disk")
+    parser.add_argument("--count", type=int, default=15000, help="number of incidents to generate")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None,
+                        help="reference 'now' for generated dates")
+    parser.add_argument("--generate-batch-size", type=int, default=0,
+                        help="use the NumPy batch engine with this batch size")
+    parser.add_argument("--speedup", type=float, default=1.0,
+                        help="compress created_date time by this factor (720: a month per hour)")
+    parser.add_argument("--max-rate", type=float, default=None,
+                        help="token-bucket cap on rows sent per second")
+    parser.add_argument("--burst", type=float, default=None,
+                        help="token-bucket burst in rows (default: one second of --max-rate)")
+    parser.add_argument("--window", type=int, default=8, help="requests in flight at most")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="rows per request at most; only rows due in the same tick are batched")
+    parser.add_argument("--tick-ms", type=float, default=10.0, help="timer wheel resolution")
+    parser.add_argument("--late-ms", type=float, default=100.0,
+                        help="count rows sent more than this late as late")
+    parser.add_argument("--table", default="u_incident_import", help="import set staging table")
+    parser.add_argument("--user", help="basic auth user (password from $SN_PASSWORD)")
+    parser.add_argument("--max-retries", type=int, default=6)
+    parser.add_argument("--stub-delay", type=float, default=0.0,
+                        help="with --stub, seconds of server latency per request")
+    parser.add_argument("--stub-fail-every", type=int, default=0,
+                        help="with --stub, answer every Nth request with 429")
+    parser.add_argument("--stub-record", help="with --stub, append received batches to this JSONL")
+    parser.add_argument("--report", help="write the rate/lag summary as JSON")
+    args = parser.parse_args()
+    if args.speedup <= 0:
+        parser.error("--speedup must be positive")
+    return asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""Pluggable sinks for generated incident rows.
+
+A sink receives rows in the generate_incident layout through
+`write_rows(rows)` and is closed with `close()` (or by using it as a context
+manager). Sinks let `iter_incidents` feed a file, stdout, a socket or any
+Python callable without staging the whole dataset on disk first.
+"""
+import csv
+import io
+import socket
+import sys
+
+from Generate_Records_v3 import csv_header
+
+
+class IncidentSink:
+    """Base class: subclasses implement write_rows() and optionally close()"""
+
+    def write_rows(self, rows):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CsvSink(IncidentSink):
+    """Write rows as CSV, with the standard header, to any text stream
+
+    `header` may also be a list of column names for other row layouts.
+    """
+
+    def __init__(self, stream, header=True, owns_stream=False):
+        self.stream = stream
+        self.owns_stream = owns_stream
+        self.writer = csv.writer(stream)
+        if header:
+            # Write header with new Active field
+            self.writer.writerow(csv_header if header is True else header)
+
+    @classmethod
+    def open(cls, path, header=True):
+        """Open a CSV sink on a file path, or on stdout when path is '-'"""
+        if path == "-":
+            return cls(sys.stdout, header=header)
+        stream = open(path, 'w', newline='', encoding='utf-8')
+        return cls(stream, header=header, owns_stream=True)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        if self.owns_stream:
+            self.stream.close()
+        else:
+            self.stream.flush()
+
+
+class SocketSink(CsvSink):
+    """Stream CSV over a TCP connection, e.g. to a loader listening on a port"""
+
+    def __init__(self, host, port, header=True):
+        self.socket = socket.create_connection((host, port))
+        stream = io.TextIOWrapper(self.socket.makefile('wb'), encoding='utf-8', newline='')
+        super().__init__(stream, header=header, owns_stream=True)
+
+    def close(self):
+        super().close()
+        self.socket.close()
+
+
+class CallbackSink(IncidentSink):
+    """Hand rows to a callable in lists of up to `batch_size` rows"""
+
+    def __init__(self, callback, batch_size=1000):
+        self.callback = callback
+        self.batch_size = batch_size
+        self.pending = []
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.pending.append(row)
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.callback(self.pending)
+            self.pending = []
+
+    def close(self):
+        self.flush()
+
+
+compression_suffixes = {"gzip": ".gz", "zstd": ".zst"}
+
+
+def _compressor(compression, level=None):
+    """Return a function compressing one bytes block into a self-contained gzip member or zstd frame"""
+    if compression == "gzip":
+        import gzip
+
+        return lambda data: gzip.compress(data, 6 if level is None else level, mtime=0)
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+class CompressedCsvSink(IncidentSink):
+    """Write CSV compressed with gzip or zstd from a background thread
+
+    Rows are encoded to CSV bytes on the calling thread and handed over
+    through a bounded queue, so generation keeps running while the writer
+    thread compresses and does the disk I/O. Each block is compressed as its
+    own gzip member / zstd frame (concatenated members are a valid stream for
+    zcat, gzip.open and zstd -d), which makes the compressed size of a block
+    known before it is written. With `chunk_bytes` the output is split into
+    part files, each with its own header and at most `chunk_bytes` bytes
+    (unless a single block is larger), to fit import-set attachment limits.
+    """
+
+    def __init__(self, path, compression="gzip", chunk_bytes=None, level=None, queue_size=8,
+                 header=True):
+        import queue
+        import threading
+
+        self.path = path
+        self.compression = compression
+        self.chunk_bytes = chunk_bytes
+        self.header = self._encode([csv_header]) if header else b""
+        self.compress = _compressor(compression, level)
+        self.paths = []
+        self.file = None
+        self.chunk_size = 0
+        self.bytes_written = 0
+        self.error = None
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._run, name="compressed-csv-writer", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def _encode(rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+    def chunk_path(self, index):
+        """incidents.csv.gz -> incidents.part0001.csv.gz"""
+        suffix = compression_suffixes[self.compression]
+        root = self.path[:-len(suffix)] if self.path.endswith(suffix) else self.path
+        root, ext = (root[:-4], ".csv") if root.endswith(".csv") else (root, "")
+        return f"{root}.part{index:04d}{ext}{suffix}"
+
+    def _open_chunk(self):
+        if self.file:
+            self.file.close()
+        path = self.chunk_path(len(self.paths) + 1) if self.chunk_bytes else self.path
+        self.paths.append(path)
+        self.file = open(path, 'wb')
+        self.chunk_size = 0
+
+    def _write_block(self, data):
+        if self.file is None:
+            self._open_chunk()
+            block = self.compress(self.header + data)
+        else:
+            block = self.compress(data)
+            if self.chunk_bytes and self.chunk_size + len(block) > self.chunk_bytes:
+                # Start the next part; recompress so it begins with its own header
+                self._open_chunk()
+                block = self.compress(self.header + data)
+        self.file.write(block)
+        self.chunk_size += len(block)
+        self.bytes_written += len(block)
+
+    def _run(self):
+        data = b""
+        try:
+            while True:
+                data = self.queue.get()
+                if data is None:
+                    break
+                self._write_block(data)
+            if self.file is None:
+                # No rows at all: still produce a file with just the header
+                self._write_block(b"")
+        except BaseException as error:
+            self.error = error
+            # Keep draining so the producer never blocks on a full queue
+            while data is not None:
+                data = self.queue.get()
+        finally:
+            if self.file:
+                self.file.close()
+
+    def write_rows(self, rows):
+        if self.error:
+            raise self.error
+        data = self._encode(rows)
+        if data:
+            self.queue.put(data)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        if self.error:
+            raise self.error
@@ -0,0 +1,351 @@
+"""Streaming distribution statistics for generated incidents.
+
+IncidentStats is fed rows (or IncidentBatch blocks) while they are
+generated, so a run can describe its own output without re-reading it:
+
+* row counts per service, incident_category, state, priority, impact,
+  urgency, resolution_code and Active,
+* the time from created_date to updated_date per state, for Resolved and
+  Closed rows the resolution time, in a LogSketch,
+* created dates per day, hour of day and weekday.
+
+Everything is counts, so stats from shards or separate runs merge exactly
+(`merge`), and they round-trip through JSON (`to_dict`/`from_dict`).
+`write_report(output)` writes ``<output>.stats.json`` and a Markdown summary
+``<output>.stats.md`` next to the data.
+
+Example:
+    python Generate_Records_v3.py --count 50000000 --batch-size 100000 --shards 8 --stats
+    python incident_stats.py merge total incidents_a.csv.stats.json incidents_b.csv.stats.json
+"""
+import argparse
+import json
+import math
+import operator
+from collections import Counter
+from datetime import date
+
+from Generate_Records_v3 import (
+    SECONDS_PER_DAY,
+    format_epoch,
+    impact_levels,
+    priorities,
+    resolution_codes,
+    services,
+    states,
+)
+
+# Row layout column -> position, for the columns that are counted
+counted_columns = {
+    "service": 4,
+    "incident_category": 5,
+    "state": 6,
+    "priority": 7,
+    "impact": 8,
+    "urgency": 9,
+    "resolution_code": 12,
+    "Active": 14,
+}
+report_quantiles = [0.5, 0.9, 0.99]
+weekday_names = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+class LogSketch:
+    """Mergeable quantile sketch with a relative error bound.
+
+    Positive values are counted in logarithmic buckets [g^(k-1), g^k) with
+    g = (1 + a) / (1 - a), so any quantile is returned within a relative
+    error `a` (`relative_accuracy`) of a true value while the sketch holds
+    only a few hundred buckets. Zeros are counted separately.
+    """
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        if value > 0:
+            key = math.ceil(math.log(value) / self.log_gamma)
+            self.buckets[key] = self.buckets.get(key, 0) + 1
+        else:
+            self.zeros += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def add_array(self, values):
+        """Add a NumPy array of non-negative values"""
+        import numpy as np
+
+        if not len(values):
+            return
+        positive = values[values > 0]
+        keys, counts = np.unique(np.ceil(np.log(positive) / self.log_gamma).astype(np.int64),
+                                 return_counts=True)
+        buckets = self.buckets
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            buckets[key] = buckets.get(key, 0) + count
+        self.zeros += len(values) - len(positive)
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """Approximate q-quantile (0 <= q <= 1), or None when empty"""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zeros:
+            return 0.0
+        seen = self.zeros
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                # Midpoint of the bucket in relative terms
+                value = 2 * self.gamma ** key / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def to_dict(self):
+        return {"relative_accuracy": self.relative_accuracy, "zeros": self.zeros,
+                "count": self.count, "sum": self.sum,
+                "min": self.min if self.count else None, "max": self.max if self.count else None,
+                "buckets": {str(key): count for key, count in sorted(self.buckets.items())}}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"])
+        sketch.buckets = {int(key): count for key, count in data["buckets"].items()}
+        sketch.zeros, sketch.count, sketch.sum = data["zeros"], data["count"], data["sum"]
+        if sketch.count:
+            sketch.min, sketch.max = data["min"], data["max"]
+        return sketch
+
+
+class IncidentStats:
+    """Mergeable counts, resolution-time sketches and created-date histograms"""
+
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.rows = 0
+        self.counts = {column: Counter() for column in counted_columns}
+        self.resolution = {state: LogSketch(relative_accuracy) for state in states}
+        self.created_days = Counter()
+        self.created_hours = Counter()
+
+    def add_rows(self, rows):
+        """Count a list of rows in the generate_incident / CSV layout"""
+        if not rows:
+            return
+        self.rows += len(rows)
+        for column, position in counted_columns.items():
+            # Counter(iterable) counts in C; Active is kept as 'True'/'False'
+            values = map(operator.itemgetter(position), rows)
+            self.counts[column].update(map(str, values) if column == "Active" else values)
+
+        import numpy as np
+
+        # NumPy parses 'YYYY-MM-DD HH:MM:SS' itself, much faster than slicing in Python
+        created = np.array(list(map(operator.itemgetter(10), rows)), dtype="datetime64[s]")
+        updated = np.array(list(map(operator.itemgetter(11), rows)), dtype="datetime64[s]")
+        state = np.array(list(map(operator.itemgetter(6), rows)))
+        self._add_dates(created.astype(np.int64), updated.astype(np.int64),
+                        [state == name for name in states])
+
+    def _add_dates(self, created, updated, state_masks):
+        """Created histograms and per-state hours to update, from epoch seconds"""
+        import numpy as np
+
+        days, counts = np.unique(created // SECONDS_PER_DAY, return_counts=True)
+        for day, count in zip(days.tolist(), counts.tolist()):
+            self.created_days[format_epoch(day * SECONDS_PER_DAY)[:10]] += count
+        hours = np.bincount(created // 3600 % 24, minlength=24)
+        for hour, count in enumerate(hours.tolist()):
+            if count:
+                self.created_hours[f"{hour:02d}"] += count
+        hours = (updated - created) / 3600
+        for name, mask in zip(states, state_masks):
+            self.resolution[name].add_array(hours[mask])
+
+    def add_batch(self, batch):
+        """Count an incident_batch.IncidentBatch from its codes, without building strings"""
+        import numpy as np
+
+        from incident_batch import category_names
+
+        self.rows += len(batch)
+        code_columns = {
+            "service": (batch.service, services),
+            "incident_category": (batch.category, [c.capitalize() for c in category_names]),
+            "state": (batch.state, states),
+            "priority": (batch.priority, priorities),
+            "impact": (batch.impact, impact_levels),
+            "urgency": (batch.urgency, impact_levels),
+            "resolution_code": (batch.resolution + 1, [""] + resolution_codes),
+            "Active": (batch.active.astype(np.int64), ["False", "True"]),
+        }
+        for column, (codes, names) in code_columns.items():
+            counter = self.counts[column]
+            for code, count in enumerate(np.bincount(codes, minlength=len(names)).tolist()):
+                if count:
+                    counter[names[code]] += count
+        self._add_dates(batch.created, batch.updated,
+                        [batch.state == code for code in range(len(states))])
+
+    def merge(self, other):
+        self.rows += other.rows
+        for column, counter in other.counts.items():
+            self.counts[column].update(counter)
+        for state, sketch in other.resolution.items():
+            self.resolution.setdefault(state, LogSketch(self.relative_accuracy)).merge(sketch)
+        self.created_days.update(other.created_days)
+        self.created_hours.update(other.created_hours)
+        return self
+
+    def to_dict(self):
+        return {
+            "rows": self.rows,
+            "relative_accuracy": self.relative_accuracy,
+            "counts": {column: dict(counter.most_common()) for column, counter in self.counts.items()},
+            "resolution_hours": {state: sketch.to_dict() for state, sketch in self.resolution.items()},
+            "created_days": dict(sorted(self.created_days.items())),
+            "created_hours": dict(sorted(self.created_hours.items())),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(data["relative_accuracy"])
+        stats.rows = data["rows"]
+        for column, counts in data["counts"].items():
+            stats.counts[column] = Counter(counts)
+        stats.resolution = {state: LogSketch.from_dict(sketch)
+                            for state, sketch in data["resolution_hours"].items()}
+        stats.created_days = Counter(data["created_days"])
+        stats.created_hours = Counter(data["created_hours"])
+        return stats
+
+    def summary(self):
+        """Quantiles and histograms derived from the counts"""
+        resolution = {}
+        for state, sketch in self.resolution.items():
+            resolution[state] = {
+                "rows": sketch.count,
+                "mean": _round(sketch.mean),
+                **{f"p{round(q * 100)}": _round(sketch.quantile(q)) for q in report_quantiles},
+                "max": _round(sketch.max if sketch.count else None),
+            }
+        weekdays = Counter()
+        months = Counter()
+        for day, count in self.created_days.items():
+            weekdays[weekday_names[date.fromisoformat(day).weekday()]] += count
+            months[day[:7]] += count
+        days = sorted(self.created_days)
+        return {
+            "rows": self.rows,
+            "resolution_hours": resolution,
+            "created": {
+                "first_day": days[0] if days else None,
+                "last_day": days[-1] if days else None,
+                "per_month": dict(sorted(months.items())),
+                "per_weekday": {name: weekdays[name] for name in weekday_names},
+                "per_hour": {f"{hour:02d}": self.created_hours[f"{hour:02d}"] for hour in range(24)},
+            },
+        }
+
+    def markdown(self, title="Incident dataset"):
+        summary = self.summary()
+        lines = [f"# {title}", "", f"{self.rows:,} incidents.", ""]
+        for column, counter in self.counts.items():
+            lines += [f"## {column}", "", "| value | rows | share |", "| --- | ---: | ---: |"]
+            for value, count in counter.most_common():
+                lines.append(f"| {value or '(empty)'} | {count:,} | {_share(count, self.rows)} |")
+            lines.append("")
+
+        lines += ["## Hours from created to updated", "",
+                  "| state | rows | mean | p50 | p90 | p99 | max |",
+                  "| --- | ---: | ---: | ---: | ---: | ---: | ---: |"]
+        for state, row in summary["resolution_hours"].items():
+            cells = [f"{row[key]:,.1f}" if row[key] is not None else "-"
+                     for key in ("mean", "p50", "p90", "p99", "max")]
+            lines.append(f"| {state} | {row['rows']:,} | " + " | ".join(cells) + " |")
+        lines += ["", f"Quantiles are within {self.relative_accuracy:.0%} of the true value.", ""]
+
+        created = summary["created"]
+        lines += ["## Created", "", f"From {created['first_day']} to {created['last_day']}.", ""]
+        for name, histogram in (("month", created["per_month"]), ("weekday", created["per_weekday"]),
+                                ("hour", created["per_hour"])):
+            lines += [f"| {name} | rows | share |", "| --- | ---: | ---: |"]
+            lines += [f"| {key} | {count:,} | {_share(count, self.rows)} |"
+                      for key, count in histogram.items()]
+            lines.append("")
+        return "\n".join(lines)
+
+    def write_report(self, output):
+        """Write <output>.stats.json and <output>.stats.md; returns both paths"""
+        json_path, markdown_path = f"{output}.stats.json", f"{output}.stats.md"
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(dict(self.to_dict(), summary=self.summary()), f, indent=2)
+        with open(markdown_path, 'w', encoding='utf-8') as f:
+            f.write(self.markdown(f"Incident dataset: {output}"))
+        return json_path, markdown_path
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def _share(count, total):
+    return f"{count / total:.2%}" if total else "-"
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as f:
+        return IncidentStats.from_dict(json.load(f))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge or print incident stats reports")
+    commands = parser.add_subparsers(dest="command", required=True)
+    merge = commands.add_parser("merge", help="merge .stats.json reports into <output>.stats.*")
+    merge.add_argument("output")
+    merge.add_argument("reports", nargs="+")
+    show = commands.add_parser("show", help="print a .stats.json report as Markdown")
+    show.add_argument("report")
+    args = parser.parse_args()
+
+    if args.command == "merge":
+        stats = load_report(args.reports[0])
+        for path in args.reports[1:]:
+            stats.merge(load_report(path))
+        paths = stats.write_report(args.output)
+        print(f"Merged {len(args.reports)} reports ({stats.rows:,} rows) into {', '.join(paths)}")
+    else:
+        print(load_report(args.report).markdown(args.report))
+
+
+if __name__ == "__main__":
+    main()
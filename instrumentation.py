@@ -0,0 +1,294 @@
+"""Opt-in instrumentation for generation and load runs.
+
+`enable()` wraps the hot paths in timing shims:
+
+* generation: generate_incident, generate_date_epochs (what generate_dates
+  runs), generate_close_notes, and the batch engine's
+  generate_incident_batch,
+* the writer: write_rows of every sink, counting rows and recording bytes
+  written and the compressed writer's queue depth,
+* loading: import_set_loader's batch uploads and HTTP requests, plus the
+  upload queue depth.
+
+Each stage gets a call counter and a latency histogram. `disable()` puts the
+original functions back. Nothing is wrapped until enable() is called, so a
+run without metrics pays nothing.
+
+Metrics can be read with `Metrics.snapshot()`, written with `dump(path)` as
+JSON, or served in Prometheus text format with `serve(port)`, for a local
+scrape of http://127.0.0.1:<port>/metrics.
+
+Example:
+    python Generate_Records_v3.py --count 1000000 --metrics-json metrics.json --metrics-port 9109
+"""
+import inspect
+import json
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROMETHEUS_PREFIX = "incident_generator_"
+
+# Latency histogram upper bounds in seconds, 1 us to 10 s
+duration_buckets = [
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+]
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts[i] holds values <= buckets[i], the last one the rest"""
+
+    def __init__(self, buckets=duration_buckets):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Counters, gauges and latency histograms for one run"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        # Only taken when a new metric appears, so readers never see a dict resize
+        self.lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        if name in self.counters:
+            self.counters[name] += amount
+        else:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        if name in self.gauges:
+            self.gauges[name] = value
+        else:
+            with self.lock:
+                self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        histogram.observe(seconds)
+
+    def snapshot(self):
+        """All metrics as a JSON-friendly dict"""
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {
+                name: {
+                    "count": h.count,
+                    "sum_s": round(h.sum, 6),
+                    "mean_us": round(h.sum / h.count * 1e6, 3) if h.count else 0,
+                    "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts)),
+                }
+                for name, h in self.histograms.items()
+            }
+        rows = counters.get("rows_written", 0)
+        return {
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_s": round(rows / elapsed, 1) if elapsed else 0.0,
+            "counters": counters,
+            "gauges": gauges,
+            "stages": histograms,
+        }
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines += [f"# TYPE {PROMETHEUS_PREFIX}{name}_total counter",
+                      f"{PROMETHEUS_PREFIX}{name}_total {value}"]
+        for name, value in sorted(dict(snapshot["gauges"], rows_per_s=snapshot["rows_per_s"],
+                                       elapsed_seconds=snapshot["elapsed_s"]).items()):
+            lines += [f"# TYPE {PROMETHEUS_PREFIX}{name} gauge", f"{PROMETHEUS_PREFIX}{name} {value}"]
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+        for name, histogram in histograms:
+            metric = f"{PROMETHEUS_PREFIX}{name}_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ["+Inf"], list(histogram.counts)):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f"{metric}_sum {histogram.sum}", f"{metric}_count {cumulative}"]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics from a daemon thread; returns the server (call shutdown() to stop)"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        return server
+
+
+def timed(metrics, name, function):
+    """Wrap a function (or coroutine function) to record its latency under `name`"""
+    perf_counter = time.perf_counter
+    if inspect.iscoroutinefunction(function):
+        @wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                metrics.observe(name, perf_counter() - started)
+        return async_wrapper
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        started = perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            metrics.observe(name, perf_counter() - started)
+    return wrapper
+
+
+def _sink_write_rows(metrics, write_rows):
+    """write_rows wrapper counting rows and tracking bytes written and queue depth"""
+    @wraps(write_rows)
+    def wrapper(sink, rows):
+        counted = [0]
+        if hasattr(rows, "__len__"):
+            counted[0] = len(rows)
+        else:
+            # Count a lazy iterable as it is consumed rather than materializing it
+            def counting(rows):
+                for row in rows:
+                    counted[0] += 1
+                    yield row
+            rows = counting(rows)
+        started = time.perf_counter()
+        write_rows(sink, rows)
+        metrics.observe("write", time.perf_counter() - started)
+        metrics.count("rows_written", counted[0])
+        if hasattr(sink, "queue"):
+            metrics.set("writer_queue_depth", sink.queue.qsize())
+        if hasattr(sink, "bytes_written"):
+            metrics.set("bytes_written", sink.bytes_written)
+        elif getattr(sink, "owns_stream", False):
+            try:
+                metrics.set("bytes_written", sink.stream.tell())
+            except (OSError, ValueError):
+                pass
+    return wrapper
+
+
+# (object, attribute) -> original, for disable()
+_patched = {}
+_active = None
+
+
+def _patch(owner, attribute, replacement):
+    _patched.setdefault((owner, attribute), owner.__dict__[attribute])
+    setattr(owner, attribute, replacement)
+
+
+def enable(metrics=None, generator=None, loader=None):
+    """Start recording into `metrics` (a new Metrics by default) and return it.
+
+    `generator` and `loader` are Generate_Records_v3 / import_set_loader
+    modules to instrument besides the importable ones; scripts pass
+    sys.modules["__main__"] for themselves.
+    """
+    global _active
+    if _active is not None:
+        disable()
+    metrics = metrics or Metrics()
+    _active = metrics
+
+    import Generate_Records_v3
+    import incident_sinks
+
+    for module in {Generate_Records_v3, generator or Generate_Records_v3}:
+        _patch(module, "generate_incident",
+               timed(metrics, "generate_incident", module.generate_incident))
+        _patch(module, "generate_date_epochs",
+               timed(metrics, "generate_dates", module.generate_date_epochs))
+        _patch(module, "generate_close_notes",
+               timed(metrics, "generate_close_notes", module.generate_close_notes))
+    for sink_class in (incident_sinks.CsvSink, incident_sinks.CallbackSink,
+                       incident_sinks.CompressedCsvSink):
+        _patch(sink_class, "write_rows",
+               _sink_write_rows(metrics, sink_class.__dict__["write_rows"]))
+
+    try:
+        import incident_batch
+    except ImportError:
+        # No NumPy: the batch engine is unavailable anyway
+        pass
+    else:
+        _patch(incident_batch, "generate_incident_batch",
+               timed(metrics, "generate_incident_batch", incident_batch.generate_incident_batch))
+
+    import import_set_loader
+
+    for module in {import_set_loader, loader or import_set_loader}:
+        _patch(module.ImportSetLoader, "_send",
+               _send_batch(metrics, module.ImportSetLoader.__dict__["_send"]))
+        _patch(module.HttpConnectionPool, "request",
+               timed(metrics, "http_request", module.HttpConnectionPool.request))
+    return metrics
+
+
+def _send_batch(metrics, send):
+    """ImportSetLoader._send wrapper: batch latency, rows uploaded and queue depth"""
+    @wraps(send)
+    async def wrapper(loader, records):
+        if getattr(loader, "queue", None) is not None:
+            metrics.set("upload_queue_depth", loader.queue.qsize())
+        started = time.perf_counter()
+        try:
+            return await send(loader, records)
+        finally:
+            metrics.observe("upload_batch", time.perf_counter() - started)
+            metrics.count("rows_uploaded", len(records))
+    return wrapper
+
+
+def disable():
+    """Restore every wrapped function; returns the metrics that were being recorded"""
+    global _active
+    for (owner, attribute), original in _patched.items():
+        setattr(owner, attribute, original)
+    _patched.clear()
+    metrics, _active = _active, None
+    return metrics
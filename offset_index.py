@@ -0,0 +1,365 @@
+"""Byte-offset index for generated CSV files, and lookups that memory-map it.
+
+A CSV written with an offset index gets two sidecar files:
+
+* ``<output>.offsets.idx`` - fixed-width little-endian arrays, each `count`
+  long: the ids sorted, the byte offset and length of each of those rows,
+  the INC numbers (as integers) sorted, and for each of those the position
+  of its row in the first three arrays,
+* ``<output>.offsets.json`` - count, data file size, header length and
+  whether the file itself is in id order (`in_id_order`).
+
+`OffsetIndex` memory-maps the index and the CSV. A lookup by id or
+inc_number is a binary search touching a few pages, and an id range in a
+file written in id order is one contiguous slice of the CSV, so neither
+depends on the size of the file.
+
+`IndexedCsvSink` builds the index while the CSV is written (see
+Generate_Records_v3 --offset-index), and `build_index` makes one for an
+existing file in a single pass.
+
+Examples:
+    python Generate_Records_v3.py --count 50000000 --batch-size 100000 --offset-index
+    python offset_index.py build incidents_15000.csv
+    python offset_index.py get incidents_15000.csv INC0012345 INC7654321
+    python offset_index.py range incidents_15000.csv 30000000-30010000 --output repro.csv
+"""
+import argparse
+import csv
+import io
+import json
+import mmap
+import os
+import sys
+from array import array
+
+import numpy as np
+
+from incident_sinks import CsvSink
+
+INDEX_VERSION = 1
+
+# Sections of the .idx file, in order
+index_sections = [
+    ("ids", np.dtype("<i8")),
+    ("offsets", np.dtype("<i8")),
+    ("lengths", np.dtype("<u4")),
+    ("inc_numbers", np.dtype("<i8")),
+    ("inc_rows", np.dtype("<i8")),
+]
+
+# Unsorted (id, inc_number, offset, length) records spilled while writing; a
+# temporary file in the native byte order of array('q')
+spill_dtype = np.dtype([("id", "i8"), ("inc_number", "i8"), ("offset", "i8"), ("length", "i8")])
+
+
+def index_paths(output):
+    """incidents.csv -> (incidents.csv.offsets.idx, incidents.csv.offsets.json)"""
+    return f"{output}.offsets.idx", f"{output}.offsets.json"
+
+
+def inc_number_value(text):
+    """'INC0001234' -> 1234"""
+    if not text.startswith("INC"):
+        raise ValueError(f"Not an INC number: {text!r}")
+    return int(text[3:])
+
+
+class OffsetCollector:
+    """Gather one record per row, spilling to disk, and write the sorted index at the end.
+
+    Rows are kept in arrays of at most `spill_rows` before they go to a
+    temporary file, so collecting costs little memory; sorting the INC
+    numbers at the end takes about 16 bytes per row.
+    """
+
+    def __init__(self, output, spill_rows=1000000):
+        self.output = output
+        self.index_path, self.meta_path = index_paths(output)
+        self.spill_path = f"{self.index_path}.tmp"
+        self.spill = open(self.spill_path, 'wb')
+        # Records are kept flat, four values each, in the layout of spill_dtype
+        self.spill_items = spill_rows * len(spill_dtype.names)
+        self.pending = array('q')
+        self.count = 0
+
+    def add(self, incident_id, inc_number, offset, length):
+        self.pending.extend((incident_id, inc_number, offset, length))
+        if len(self.pending) >= self.spill_items:
+            self._spill()
+
+    def _spill(self):
+        self.pending.tofile(self.spill)
+        self.count += len(self.pending) // len(spill_dtype.names)
+        self.pending = array('q')
+
+    def abort(self):
+        self.spill.close()
+        os.remove(self.spill_path)
+
+    def finish(self, data_size, header_bytes, chunk_rows=1000000):
+        """Sort the spilled records into the index and save its metadata"""
+        self._spill()
+        self.spill.close()
+        count = self.count
+        if count:
+            records = np.memmap(self.spill_path, dtype=spill_dtype, mode='r', shape=(count,))
+        else:
+            records = np.zeros(0, dtype=spill_dtype)
+        ids = np.ascontiguousarray(records["id"])
+        in_id_order = bool(np.all(ids[1:] > ids[:-1]))
+        id_order = None if in_id_order else np.argsort(ids, kind="stable")
+        if id_order is not None:
+            ids = ids[id_order]
+
+        with open(self.index_path, 'wb') as index:
+            ids.tofile(index)
+            for name, dtype in [("offset", "<i8"), ("length", "<u4")]:
+                for start in range(0, count, chunk_rows):
+                    rows = slice(start, start + chunk_rows)
+                    chosen = records[name][rows] if id_order is None else records[name][id_order[rows]]
+                    chosen.astype(dtype).tofile(index)
+            del ids
+            inc_numbers = np.ascontiguousarray(records["inc_number"])
+            if id_order is not None:
+                inc_numbers = inc_numbers[id_order]
+            inc_order = np.argsort(inc_numbers, kind="stable")
+            inc_numbers[inc_order].tofile(index)
+            inc_order.astype("<i8").tofile(index)
+        del records
+        os.remove(self.spill_path)
+
+        meta = {
+            "version": INDEX_VERSION,
+            "count": count,
+            "data_size": data_size,
+            "header_bytes": header_bytes,
+            "in_id_order": in_id_order,
+        }
+        temp = f"{self.meta_path}.tmp"
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(temp, self.meta_path)
+        return count
+
+
+class _RecordingStream:
+    """Binary file behind a csv.writer; the writer makes one write() per row"""
+
+    def __init__(self, path, collector):
+        self.raw = open(path, 'wb')
+        self.collector = collector
+        self.position = 0
+        self.indexing = False
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        self.raw.write(data)
+        if self.indexing:
+            # inc_number and id never need quoting, so they are the first two fields
+            inc_number, incident_id, _ = text.split(",", 2)
+            collector = self.collector
+            collector.pending.extend((int(incident_id), int(inc_number[3:]), self.position,
+                                      len(data)))
+            if len(collector.pending) >= collector.spill_items:
+                collector._spill()
+        self.position += len(data)
+        return len(text)
+
+    def flush(self):
+        self.raw.flush()
+
+    def close(self):
+        self.raw.close()
+
+
+class IndexedCsvSink(CsvSink):
+    """CsvSink to a file that also writes its offset index when closed"""
+
+    def __init__(self, path, header=True):
+        self.path = path
+        self.collector = OffsetCollector(path)
+        stream = _RecordingStream(path, self.collector)
+        super().__init__(stream, header=header, owns_stream=True)
+        self.header_bytes = stream.position
+        stream.indexing = True
+
+    @property
+    def bytes_written(self):
+        return self.stream.position
+
+    def close(self):
+        super().close()
+        self.collector.finish(self.stream.position, self.header_bytes)
+
+
+def build_index(path):
+    """Index an existing CSV in the Generate_Records_v3 layout; returns the row count"""
+    collector = OffsetCollector(path)
+    try:
+        with open(path, 'rb') as f:
+            header = f.readline()
+            if not header.startswith(b"inc_number,id,"):
+                raise ValueError(f"'{path}' does not have the Generate_Records_v3 header")
+            position = len(header)
+            pending = b""
+            for line in f:
+                # A quoted field may hold line breaks: join lines until the quotes balance
+                if pending:
+                    pending += line
+                    if pending.count(b'"') % 2:
+                        continue
+                    line, pending = pending, b""
+                elif line.count(b'"') % 2:
+                    pending = line
+                    continue
+                inc_number, incident_id, _ = line.split(b",", 2)
+                collector.add(int(incident_id), int(inc_number[3:]), position, len(line))
+                position += len(line)
+    except BaseException:
+        collector.abort()
+        raise
+    return collector.finish(position, len(header))
+
+
+class OffsetIndex:
+    """A CSV file and its offset index, both memory-mapped for lookups"""
+
+    def __init__(self, path):
+        self.path = path
+        index_path, meta_path = index_paths(path)
+        with open(meta_path, encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"'{meta_path}' is not a version {INDEX_VERSION} offset index")
+        if os.path.getsize(path) != self.meta["data_size"]:
+            raise ValueError(f"'{path}' changed since it was indexed; run "
+                             f"'python offset_index.py build {path}' again")
+        self.count = count = self.meta["count"]
+        position = 0
+        for name, dtype in index_sections:
+            if count:
+                section = np.memmap(index_path, dtype=dtype, mode='r', offset=position,
+                                    shape=(count,))
+            else:
+                section = np.zeros(0, dtype=dtype)
+            setattr(self, name, section)
+            position += count * dtype.itemsize
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def header(self):
+        return self.data[:self.meta["header_bytes"]]
+
+    def _row_bytes(self, row):
+        offset = int(self.offsets[row])
+        return self.data[offset:offset + int(self.lengths[row])]
+
+    def _position(self, keys, key):
+        position = int(np.searchsorted(keys, key))
+        if position < len(keys) and keys[position] == key:
+            return position
+        return None
+
+    def find_id(self, incident_id):
+        """The raw CSV bytes of the row with this id, or None"""
+        row = self._position(self.ids, incident_id)
+        return None if row is None else self._row_bytes(row)
+
+    def find_inc_number(self, inc_number):
+        """The raw CSV bytes of the row with this INC number ('INC0001234' or 1234), or None"""
+        if isinstance(inc_number, str):
+            inc_number = inc_number_value(inc_number)
+        position = self._position(self.inc_numbers, inc_number)
+        return None if position is None else self._row_bytes(int(self.inc_rows[position]))
+
+    def id_range_bytes(self, start_id, stop_id):
+        """Raw CSV bytes of every row with start_id <= id <= stop_id"""
+        first = int(np.searchsorted(self.ids, start_id, side="left"))
+        stop = int(np.searchsorted(self.ids, stop_id, side="right"))
+        if first >= stop:
+            return b""
+        if self.meta["in_id_order"]:
+            # Rows in id order sit back to back in the file: one slice
+            return self.data[int(self.offsets[first]):
+                             int(self.offsets[stop - 1]) + int(self.lengths[stop - 1])]
+        return b"".join(self._row_bytes(row) for row in range(first, stop))
+
+
+def parse_row(data):
+    """Raw CSV bytes of one row -> list of field strings"""
+    return next(csv.reader(io.StringIO(data.decode('utf-8'), newline='')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offset index and fast row lookup for incident CSVs")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="index an existing incident CSV")
+    build.add_argument("csv")
+
+    get = commands.add_parser("get", help="print the rows with these INC numbers (or ids)")
+    get.add_argument("csv")
+    get.add_argument("keys", nargs="+", help="INC numbers such as INC0012345, or ids with --id")
+    get.add_argument("--id", action="store_true", help="keys are incident ids")
+
+    extract = commands.add_parser("range", help="extract an inclusive id range as CSV")
+    extract.add_argument("csv")
+    extract.add_argument("ids", metavar="START-STOP")
+    extract.add_argument("--output", default="-", help="CSV file to write (default: stdout)")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = build_index(args.csv)
+        print(f"Indexed {count:,} rows to '{index_paths(args.csv)[0]}'")
+        return 0
+
+    try:
+        index = OffsetIndex(args.csv)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    with index:
+        if args.command == "get":
+            out = sys.stdout.buffer
+            out.write(index.header)
+            missing = 0
+            for key in args.keys:
+                try:
+                    data = index.find_id(int(key)) if args.id else index.find_inc_number(key)
+                except ValueError:
+                    data = None
+                if data is None:
+                    print(f"{key}: not in '{args.csv}'", file=sys.stderr)
+                    missing += 1
+                else:
+                    out.write(data)
+            out.flush()
+            return 1 if missing else 0
+
+        start, _, stop = args.ids.partition("-")
+        data = index.id_range_bytes(int(start), int(stop or start))
+        if args.output == "-":
+            sys.stdout.buffer.write(index.header + data)
+            sys.stdout.buffer.flush()
+        else:
+            with open(args.output, 'wb') as f:
+                f.write(index.header)
+                f.write(data)
+            rows = data.count(b"\n")
+            print(f"Wrote {rows:,} rows to '{args.output}'", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
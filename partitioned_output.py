@@ -0,0 +1,231 @@
+"""Time-partitioned CSV output sorted by created_date.
+
+Rows are generated in id order, but their created dates are spread over the
+whole year. `partition_rows` rewrites a row stream as one CSV per day, ISO
+week or month of created_date, e.g. ``incidents.2026-03.csv``, with the rows
+of each partition sorted by created_date (ties stay in id order).
+
+It is an external merge sort with a fixed memory budget:
+
+* rows are buffered until the budget is full, sorted by created_date and
+  spilled as pickled chunks to a run file in a temporary directory next to
+  the output,
+* the runs are then merged with heapq.merge, at most `fan_in` at a time
+  (wider inputs get intermediate merge passes), and the merged stream is cut
+  into partitions as the period changes.
+
+created_date is "YYYY-MM-DD HH:MM:SS", so comparing the strings compares the
+times, and day, week and month partitions come out of the merge one after
+another. Input that fits in one buffer is written straight from memory.
+`sort_rows` is the sort on its own, for consumers that want rows in time
+order, such as incident_replay.
+
+Examples:
+    python Generate_Records_v3.py --count 50000000 --batch-size 100000 --partition-by month
+    python partitioned_output.py incidents.csv --by day --memory-mb 256
+"""
+import argparse
+import csv
+import gc
+import heapq
+import os
+import pickle
+import shutil
+import tempfile
+from datetime import date
+from functools import lru_cache
+from itertools import groupby, islice
+from operator import itemgetter
+
+from incident_sinks import CsvSink
+
+CREATED_COLUMN = 10
+
+# Rough size of one row held in memory (a list of 15 short strings and ints)
+ROW_BYTES = 1024
+
+created_date = itemgetter(CREATED_COLUMN)
+
+
+@lru_cache(maxsize=None)
+def _iso_week(day):
+    year, week, _ = date.fromisoformat(day).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+# Period -> function from a row to its partition name
+partition_keys = {
+    "day": lambda row: row[CREATED_COLUMN][:10],
+    "week": lambda row: _iso_week(row[CREATED_COLUMN][:10]),
+    "month": lambda row: row[CREATED_COLUMN][:7],
+}
+
+
+def partition_path(output, name):
+    """Name of the file one partition is written to, e.g. incidents.2026-03.csv"""
+    root, ext = os.path.splitext(output)
+    return f"{root}.{name}{ext or '.csv'}"
+
+
+def _write_run(rows, directory, index, chunk_rows):
+    """Spill rows to a run file as pickled chunks; much cheaper than CSV to write and read"""
+    path = os.path.join(directory, f"run{index:06d}.pickle")
+    rows = iter(rows)
+    with open(path, 'wb') as f:
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                return path
+            pickle.dump(chunk, f, pickle.HIGHEST_PROTOCOL)
+
+
+def _read_run(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                chunk = pickle.load(f)
+            except EOFError:
+                break
+            yield from chunk
+    os.remove(path)
+
+
+def _merge_runs(paths):
+    # heapq.merge is stable, so runs listed in id order keep equal dates in id order
+    return heapq.merge(*[_read_run(path) for path in paths], key=created_date)
+
+
+def _reduce_runs(runs, directory, fan_in, chunk_rows):
+    """Merge adjacent runs, fan_in at a time, until at most fan_in are left"""
+    index = len(runs)
+    while len(runs) > fan_in:
+        merged = []
+        for start in range(0, len(runs), fan_in):
+            group = runs[start:start + fan_in]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            merged.append(_write_run(_merge_runs(group), directory, index, chunk_rows))
+            index += 1
+        runs = merged
+    return runs
+
+
+def _write_partitions(rows, output, period, progress):
+    """Cut a created_date-sorted row stream into one CSV per period"""
+    partitions = {}
+    for name, group in groupby(rows, partition_keys[period]):
+        path = partition_path(output, name)
+        with CsvSink.open(path) as sink:
+            sink.write_rows(group)
+        partitions[name] = path
+        if progress:
+            progress(f"Wrote partition {name} ({path})")
+    return partitions
+
+
+def sort_rows(rows, memory_mb=512, fan_in=64, temp_dir=None, progress=None):
+    """Yield rows sorted by created_date, ties in input order, within a memory budget.
+
+    At most about `memory_mb` of rows are held at once; the rest is spilled
+    to sorted run files under `temp_dir` (default: the system temp directory),
+    which are removed as they are merged.
+    """
+    run_rows = max(1000, int(memory_mb * 1024 * 1024) // ROW_BYTES)
+    # A merge holds one chunk per run; keep those within half the budget
+    chunk_rows = max(64, run_rows // (2 * fan_in))
+    rows = iter(rows)
+    directory = None
+    runs = []
+    spilled = 0
+    try:
+        # Buffers are lists of row lists with no reference cycles; pausing the
+        # cyclic collector saves it from rescanning every row as they pile up
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            while True:
+                buffer = list(islice(rows, run_rows))
+                buffer.sort(key=created_date)
+                if not runs and len(buffer) < run_rows:
+                    # Everything fits in memory; no run files needed
+                    break
+                if not buffer:
+                    break
+                if directory is None:
+                    directory = tempfile.mkdtemp(prefix=".partition-runs-", dir=temp_dir)
+                runs.append(_write_run(buffer, directory, len(runs), chunk_rows))
+                spilled += len(buffer)
+                last = len(buffer) < run_rows
+                buffer = []
+                if progress:
+                    progress(f"Sorted {spilled:,} records into {len(runs)} runs...")
+                if last:
+                    break
+        finally:
+            if enabled:
+                gc.enable()
+        if not runs:
+            yield from buffer
+            return
+        yield from _merge_runs(_reduce_runs(runs, directory, fan_in, chunk_rows))
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+def partition_rows(rows, output, period="month", memory_mb=512, fan_in=64, temp_dir=None,
+                   progress=print):
+    """Write rows as one created_date-sorted CSV per day, week or month.
+
+    Rows are ordered with `sort_rows`; its run files go under `temp_dir`
+    (default: the output's directory). Returns {partition name: path}.
+    """
+    if period not in partition_keys:
+        raise ValueError(f"period must be one of {', '.join(partition_keys)}, not {period!r}")
+    rows = sort_rows(rows, memory_mb, fan_in,
+                     temp_dir or os.path.dirname(os.path.abspath(output)), progress)
+    return _write_partitions(rows, output, period, progress)
+
+
+def write_partitioned(output, count, period="month", memory_mb=512, seed=None, now=None,
+                      batch_size=None, arrivals=None, tables=None, stats=None, progress=print,
+                      start_id=1, counter=False):
+    """Generate `count` incidents straight into created_date partitions"""
+    from Generate_Records_v3 import iter_incidents
+
+    rows = iter_incidents(count, seed=seed, start_id=start_id, now=now, batch_size=batch_size,
+                          arrivals=arrivals, tables=tables, stats=stats, counter=counter)
+    return partition_rows(rows, output, period, memory_mb=memory_mb, progress=progress)
+
+
+def iter_csv_rows(paths):
+    """Rows of existing incident CSV files, headers skipped"""
+    for path in paths:
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            yield from reader
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Split incident CSVs into created_date-sorted day, week or month partitions")
+    parser.add_argument("inputs", nargs="+", help="incident CSV files in the Generate_Records_v3 layout")
+    parser.add_argument("--by", choices=list(partition_keys), default="month",
+                        help="partition period (default: month)")
+    parser.add_argument("--output", default=None,
+                        help="name the partitions are derived from (default: the first input)")
+    parser.add_argument("--memory-mb", type=float, default=512,
+                        help="rows held in memory before a sorted run is spilled to disk")
+    parser.add_argument("--temp-dir", default=None,
+                        help="directory for the sorted runs (default: next to the output)")
+    args = parser.parse_args()
+
+    partitions = partition_rows(iter_csv_rows(args.inputs), args.output or args.inputs[0],
+                                args.by, memory_mb=args.memory_mb, temp_dir=args.temp_dir)
+    print(f"Wrote {len(partitions)} {args.by} partitions")
+
+
+if __name__ == "__main__":
+    main()
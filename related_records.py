@@ -0,0 +1,460 @@
+"""Related problem, change_request and kb_knowledge tables for incidents.
+
+Close notes reference PRB, CHG and KA numbers and duplicate INC numbers.
+With a RelatedRecords attached to the GenerationContext, those references
+point at real rows. The referenced rows are created on demand while the
+incidents are generated in id order, and written straight to their own CSV
+files:
+
+* ``<root>.problem.csv``, ``<root>.change_request.csv`` and
+  ``<root>.kb_knowledge.csv``, numbered PRB/CHG/KA + 7 digits,
+* ``<root>.references.csv``, the index of every incident -> record edge.
+
+Memory stays bounded however many incidents are generated. Each service
+keeps only a small pool of recent problems, changes and articles for later
+incidents to reuse, known-error problems apart from the rest. An incident
+only reuses a record already opened (started, published) by its updated
+date. Every lookup scans a fixed-size pool, so nothing grows with the row
+count.
+
+Duplicates point at a similar earlier incident (lower id, created no
+later), the most similar one found of:
+
+1. the same issue (service and short description), created at most
+   `window_days` before it - the earliest such, i.e. the original ticket,
+2. the same service, within that window - the nearest one,
+3. the same service, within `wide_window_days` - the nearest one.
+
+`DuplicateIndex` buckets incidents by issue or service and created-date
+window, so each lookup reads a few small slots. Only when all three come up
+empty does the duplicate get the generic close note. `check_duplicates`
+measures the result from the written files.
+
+Example:
+    python related_records.py --count 1000000 --output incidents.csv --seed 7
+"""
+import argparse
+import csv
+import os
+import sys
+from collections import deque
+from datetime import datetime
+
+from Generate_Records_v3 import (
+    GenerationContext,
+    SECONDS_PER_DAY,
+    format_epoch,
+    generate_incident,
+    naive_epoch,
+    write_incidents,
+)
+from incident_sinks import CsvSink
+
+problem_header = ["number", "id", "short_description", "service", "state", "priority",
+                  "known_error", "opened_date", "resolved_date"]
+change_header = ["number", "id", "short_description", "service", "type", "state", "problem",
+                 "start_date", "end_date"]
+kb_header = ["number", "id", "short_description", "service", "problem", "workflow_state",
+             "published_date"]
+reference_header = ["inc_number", "table", "number"]
+
+# How a Duplicate close note can be linked, most similar first
+duplicate_link_kinds = ["issue", "service", "wide_window", "unlinked"]
+
+change_types = ["Standard", "Normal", "Normal", "Emergency"]
+
+# Placeholder in the close note -> (table, number prefix)
+reference_tables = {
+    "problem_id": ("problem", "PRB"),
+    "change_id": ("change_request", "CHG"),
+    "ka_id": ("kb_knowledge", "KA"),
+    "inc_number": ("incident", "INC"),
+}
+
+
+def table_path(output, table):
+    """incidents.csv -> incidents.problem.csv"""
+    root, ext = os.path.splitext(output)
+    return f"{root}.{table}{ext or '.csv'}"
+
+
+class DuplicateIndex:
+    """Recent incidents by a bucket key (an issue or a service) and created-date window
+
+    Each bucket keeps, for every `window`-second slot of created dates, the
+    `slot_size` incidents of that slot generated last. An incident created
+    at t can only duplicate one created in [t - window, t], which lies in
+    t's slot or the one before, so a lookup reads at most 2 * slot_size
+    entries. Memory is bounded by buckets x slots in the date range x
+    slot_size, whatever the row count: about 100 MB for the built-in issues
+    over a year with the defaults.
+    """
+
+    def __init__(self, window=7 * SECONDS_PER_DAY, slot_size=4):
+        self.window = window
+        self.slot_size = slot_size
+        # key -> {slot number: [(created, inc_number), ...]}
+        self.buckets = {}
+
+    def add(self, key, inc_number, created):
+        slots = self.buckets.get(key)
+        if slots is None:
+            slots = self.buckets[key] = {}
+        slot = slots.get(created // self.window)
+        if slot is None:
+            # Plain lists: there are far more slots than buckets, and a deque is 10x larger
+            slot = slots[created // self.window] = []
+        elif len(slot) >= self.slot_size:
+            del slot[0]
+        slot.append((created, inc_number))
+
+    def _entries(self, key, created, window):
+        """Indexed (created, inc_number) of the key in [created - window, created]"""
+        slots = self.buckets.get(key)
+        if not slots:
+            return []
+        earliest = created - window
+        entries = []
+        for slot in range(earliest // self.window, created // self.window + 1):
+            entries.extend(entry for entry in slots.get(slot, ())
+                           if earliest <= entry[0] <= created)
+        return entries
+
+    def find(self, key, created):
+        """The earliest indexed incident of the key created in [created - window, created]"""
+        entries = self._entries(key, created, self.window)
+        return min(entries)[1] if entries else None
+
+    def nearest(self, key, created, window=None):
+        """The latest indexed incident of the key created in [created - window, created].
+
+        `window` defaults to the slot width; a wider one reads
+        window / slot width + 1 slots.
+        """
+        entries = self._entries(key, created, window or self.window)
+        return max(entries)[1] if entries else None
+
+    def trim(self, earliest):
+        """Drop the slots before the one holding `earliest`; no later lookup reads them"""
+        first = earliest // self.window
+        for key in list(self.buckets):
+            slots = self.buckets[key]
+            for slot in [slot for slot in slots if slot < first]:
+                del slots[slot]
+            if not slots:
+                del self.buckets[key]
+
+    def entries(self):
+        """(key, created, inc_number) of everything indexed; add()ing them back in
+        this order rebuilds the same index"""
+        for key, slots in self.buckets.items():
+            for slot in slots.values():
+                for created, inc_number in slot:
+                    yield key, created, inc_number
+
+
+class SimilarIncidents:
+    """The duplicate target lookup described in the module docstring.
+
+    Issues and services each get a DuplicateIndex of `window_days` slots;
+    `counts` tallies how each find() was linked (see duplicate_link_kinds).
+    """
+
+    def __init__(self, window_days=7, slot_size=4, wide_window_days=30):
+        window = max(1, int(window_days * SECONDS_PER_DAY))
+        self.wide_window = max(window, int(wide_window_days * SECONDS_PER_DAY))
+        self.issues = DuplicateIndex(window, slot_size)
+        self.services = DuplicateIndex(window, slot_size)
+        self.counts = dict.fromkeys(duplicate_link_kinds, 0)
+
+    def find(self, service, short_description, created):
+        """The most similar earlier incident's number, or None"""
+        number = self.issues.find((service, short_description), created)
+        kind = "issue"
+        if number is None:
+            number, kind = self.services.nearest(service, created), "service"
+        if number is None:
+            number = self.services.nearest(service, created, self.wide_window)
+            kind = "wide_window" if number is not None else "unlinked"
+        self.counts[kind] += 1
+        return number
+
+    def add(self, inc_number, service, short_description, created):
+        self.issues.add((service, short_description), inc_number, created)
+        self.services.add(service, inc_number, created)
+
+    def trim(self, now_epoch):
+        """Forget what no incident created after `now_epoch` can link to"""
+        self.issues.trim(now_epoch - self.wide_window)
+        self.services.trim(now_epoch - self.wide_window)
+
+
+class RelatedRecords:
+    """Create and pool related records while incidents are generated in id order
+
+    `reuse` is the chance that an incident references a pooled record of its
+    service opened by the incident's updated date instead of opening a new
+    one; `pool_size` bounds those pools.
+    Duplicates reference an incident of the same issue created at most
+    `window_days` earlier, else the nearest of the same service in that
+    window, else in `wide_window_days` (SimilarIncidents); DuplicateIndexes
+    keep `slot_size` incidents per issue (or service) and window.
+    """
+
+    def __init__(self, output, rng, now_epoch, pool_size=8, reuse=0.6, window_days=7,
+                 slot_size=4, wide_window_days=30):
+        self.rng = rng
+        self.now_epoch = now_epoch
+        self.pool_size = pool_size
+        self.reuse = reuse
+        self.paths = {}
+        self.files = []
+        self.writers = {}
+        for table, header in (("problem", problem_header), ("change_request", change_header),
+                              ("kb_knowledge", kb_header), ("references", reference_header)):
+            path = self.paths[table] = table_path(output, table)
+            f = open(path, 'w', newline='', encoding='utf-8')
+            self.files.append(f)
+            self.writers[table] = csv.writer(f)
+            self.writers[table].writerow(header)
+        self.counts = {"problem": 0, "change_request": 0, "kb_knowledge": 0}
+        # service -> deque of recent (citable from, record number): problems by opened
+        # date, changes by start and articles by published date. Known-error problems
+        # have their own pool so an article never cites a plain resolved problem.
+        self.pools = {pool: {} for pool in ("problem", "known_error", "change_request",
+                                            "kb_knowledge")}
+        self.similar = SimilarIncidents(window_days, slot_size, wide_window_days)
+        # How each Duplicate close note was linked: same issue, same service in
+        # the window, same service in the wide window, or not at all
+        self.duplicate_counts = self.similar.counts
+
+    def _pool(self, name, service):
+        pool = self.pools[name].get(service)
+        if pool is None:
+            pool = self.pools[name][service] = deque(maxlen=self.pool_size)
+        return pool
+
+    def _reuse(self, pool, before):
+        """A pooled (date, number) dated at or before `before`, or None to open a new record"""
+        if pool and self.rng.random() < self.reuse:
+            candidates = [entry for entry in pool if entry[0] <= before]
+            if candidates:
+                return self.rng.choice(candidates)
+        return None
+
+    def _next_number(self, table, prefix):
+        self.counts[table] += 1
+        return self.counts[table], f"{prefix}{self.counts[table]:07d}"
+
+    def _clamp(self, epoch):
+        return min(epoch, self.now_epoch)
+
+    def problem(self, service, short_description, priority, created, updated, known_error=False):
+        """Number of a pooled problem for the service, or of a new one"""
+        return self._problem(service, short_description, priority, created, updated,
+                             known_error)[1]
+
+    def _problem(self, service, short_description, priority, created, updated, known_error):
+        """(opened, number) of a problem opened by `updated`, pooled or new"""
+        pool = self._pool("known_error" if known_error else "problem", service)
+        entry = self._reuse(pool, updated)
+        if entry:
+            return entry
+        rng = self.rng
+        problem_id, number = self._next_number("problem", "PRB")
+        opened = created - rng.randint(0, 14 * SECONDS_PER_DAY)
+        if known_error:
+            state, resolved = rng.choice(["Root Cause Analysis", "Fix in Progress"]), ""
+        else:
+            state = rng.choice(["Resolved", "Closed"])
+            resolved = format_epoch(self._clamp(updated + rng.randint(0, 7 * SECONDS_PER_DAY)))
+        self.writers["problem"].writerow([
+            number, problem_id, short_description, service, state, priority, known_error,
+            format_epoch(opened), resolved,
+        ])
+        pool.append((opened, number))
+        return opened, number
+
+    def change(self, service, short_description, priority, created, updated):
+        pool = self._pool("change_request", service)
+        entry = self._reuse(pool, updated)
+        if entry:
+            return entry[1]
+        rng = self.rng
+        change_id, number = self._next_number("change_request", "CHG")
+        # The change was implemented between the incident opening and its update
+        start = created + rng.randint(0, max(0, updated - created))
+        problems = [entry for entry in self._pool("problem", service) if entry[0] <= start]
+        problem = rng.choice(problems)[1] if problems and rng.random() < 0.5 else ""
+        end = min(updated, start + rng.randint(1800, 8 * 3600))
+        self.writers["change_request"].writerow([
+            number, change_id, f"Fix for {short_description}", service, rng.choice(change_types),
+            "Closed", problem, format_epoch(start), format_epoch(max(start, end)),
+        ])
+        pool.append((start, number))
+        return number
+
+    def article(self, service, short_description, priority, created, updated):
+        pool = self._pool("kb_knowledge", service)
+        entry = self._reuse(pool, updated)
+        if entry:
+            return entry[1]
+        rng = self.rng
+        kb_id, number = self._next_number("kb_knowledge", "KA")
+        # Known errors are documented against an open problem, once it is opened
+        opened, problem = self._problem(service, short_description, priority, created, updated,
+                                        known_error=True)
+        published = min(max(opened, created - rng.randint(0, 30 * SECONDS_PER_DAY)), updated)
+        self.writers["kb_knowledge"].writerow([
+            number, kb_id, f"Known error: {short_description}", service, problem, "published",
+            format_epoch(published),
+        ])
+        pool.append((published, number))
+        return number
+
+    def similar_incident(self, service, short_description, created):
+        """The most similar earlier incident (see the module docstring), or None"""
+        return self.similar.find(service, short_description, created)
+
+    def resolver(self, inc_number, service, short_description, priority, created, updated):
+        """reference() callable for generate_close_notes on one incident"""
+        def reference(name):
+            table, prefix = reference_tables[name]
+            if name == "inc_number":
+                number = self.similar_incident(service, short_description, created)
+                if number is None:
+                    return None
+            elif name == "problem_id":
+                number = self.problem(service, short_description, priority, created, updated)
+            elif name == "change_id":
+                number = self.change(service, short_description, priority, created, updated)
+            else:
+                number = self.article(service, short_description, priority, created, updated)
+            self.writers["references"].writerow([inc_number, table, number])
+            # Templates already carry the prefix where the text wants it
+            return number if name == "inc_number" else number[len(prefix):]
+        return reference
+
+    def add_incident(self, inc_number, service, short_description, created):
+        """Make an incident available as a duplicate target for later ones"""
+        self.similar.add(inc_number, service, short_description, created)
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+
+def write_related_dataset(output, count, seed=None, now=None, progress=print, **options):
+    """Write `count` incidents to `output` plus the tables their close notes reference"""
+    context = GenerationContext(now, seed)
+    related = RelatedRecords(output, context.rng, context.now_epoch, **options)
+    context.references = related
+    try:
+        with CsvSink.open(output) as sink:
+            rows = (generate_incident(i, context) for i in range(1, count + 1))
+            written = write_incidents(sink, rows, progress=progress)
+    finally:
+        related.close()
+    return written, related
+
+
+def check_duplicates(output, window_days=7):
+    """Measure how the Duplicate close notes of a written dataset are linked.
+
+    Reads `output` and its references file once, keeping only the incidents
+    that are referenced, and counts Duplicate rows by the most similar
+    relation to their target (see duplicate_link_kinds). Targets that are
+    not earlier, or of another service, count as 'invalid'. Returns the
+    counts plus 'duplicates' and 'linked_ratio'.
+    """
+    targets = {}
+    with open(table_path(output, "references"), newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for inc_number, table, number in reader:
+            if table == "incident":
+                targets[inc_number] = number
+    wanted = set(targets.values())
+    window = window_days * SECONDS_PER_DAY
+    seen = {}
+    counts = dict.fromkeys(duplicate_link_kinds + ["invalid"], 0)
+    with open(output, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            # Rows come in id order, so a valid target is always seen before its duplicate
+            created = naive_epoch(datetime.fromisoformat(row[10]))
+            if row[0] in wanted:
+                seen[row[0]] = (row[2], row[4], created)
+            if row[12] != "Duplicate":
+                continue
+            target = seen.get(targets.get(row[0]))
+            if row[0] not in targets:
+                counts["unlinked"] += 1
+            elif target is None or target[1] != row[4] or target[2] > created:
+                counts["invalid"] += 1
+            elif target[0] == row[2] and created - target[2] <= window:
+                counts["issue"] += 1
+            elif created - target[2] <= window:
+                counts["service"] += 1
+            else:
+                counts["wide_window"] += 1
+    counts["duplicates"] = sum(counts[kind] for kind in duplicate_link_kinds + ["invalid"])
+    linked = counts["issue"] + counts["service"] + counts["wide_window"]
+    counts["linked_ratio"] = linked / counts["duplicates"] if counts["duplicates"] else 0.0
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate incidents plus the problem, change_request and kb_knowledge "
+                    "records their close notes reference")
+    parser.add_argument("--count", type=int, default=15000)
+    parser.add_argument("--output", default="incidents_15000.csv")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None)
+    parser.add_argument("--pool-size", type=int, default=8,
+                        help="recent problems/changes/articles kept per service for reuse")
+    parser.add_argument("--duplicate-window-days", type=float, default=7,
+                        help="duplicates reference an incident of the same issue, else the "
+                             "nearest of the same service, created at most this many days earlier")
+    parser.add_argument("--duplicate-wide-window-days", type=float, default=30,
+                        help="failing that, the nearest incident of the same service created at "
+                             "most this many days earlier")
+    parser.add_argument("--duplicate-slot-size", type=int, default=4,
+                        help="recent incidents kept per issue (and service) and window as "
+                             "duplicate targets")
+    parser.add_argument("--check", action="store_true",
+                        help="re-read the written files and report how Duplicate close notes "
+                             "are linked")
+    args = parser.parse_args()
+    if args.duplicate_window_days <= 0 or args.duplicate_slot_size < 1:
+        parser.error("--duplicate-window-days and --duplicate-slot-size must be positive")
+    if args.duplicate_wide_window_days < args.duplicate_window_days:
+        parser.error("--duplicate-wide-window-days must be at least --duplicate-window-days")
+
+    written, related = write_related_dataset(
+        args.output, args.count, seed=args.seed, now=args.as_of or datetime.now(),
+        progress=None, pool_size=args.pool_size, window_days=args.duplicate_window_days,
+        slot_size=args.duplicate_slot_size, wide_window_days=args.duplicate_wide_window_days)
+    print(f"Wrote {written:,} incidents to '{args.output}'")
+    for table, rows in related.counts.items():
+        print(f"Wrote {rows:,} {table} records to '{related.paths[table]}'")
+    counts = related.duplicate_counts
+    print(f"Duplicates linked to the same issue: {counts['issue']:,}, same service: "
+          f"{counts['service']:,}, same service within {args.duplicate_wide_window_days:g} days: "
+          f"{counts['wide_window']:,}, unlinked: {counts['unlinked']:,}")
+    print(f"Reference index: '{related.paths['references']}'")
+    if args.check:
+        report = check_duplicates(args.output, args.duplicate_window_days)
+        kinds = ", ".join(f"{kind}: {report[kind]:,}"
+                          for kind in duplicate_link_kinds + ["invalid"])
+        print(f"Check: {report['linked_ratio']:.1%} of {report['duplicates']:,} Duplicate close "
+              f"notes reference a similar earlier incident ({kinds})")
+        if report["invalid"]:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Multi-process sharded generation for Generate_Records_v3.
+
+The id range is split into contiguous shards that run in a
+ProcessPoolExecutor. Each shard is seeded from the master seed and its own
+index, and every shard uses the same reference time, so a given seed and
+shard count always reproduce the same bytes no matter how many worker
+processes run them or in which order they finish. With counter-based
+generation every shard draws from the master seed by id instead, and the
+output no longer depends on the shard count either.
+"""
+import hashlib
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from Generate_Records_v3 import inc_number_key, iter_incidents
+from incident_sinks import CsvSink
+
+
+def shard_ranges(count, shards):
+    """Split ids 1..count into `shards` contiguous (start_id, stop_id) ranges"""
+    shards = max(1, min(shards, count))
+    base, extra = divmod(count, shards)
+    ranges = []
+    start = 1
+    for index in range(shards):
+        stop = start + base + (1 if index < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+def shard_seed(master_seed, shard_index):
+    """Derive a stable 64-bit seed for one shard from the master seed"""
+    digest = hashlib.sha256(f"{master_seed}:{shard_index}".encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+def part_path(output, shard_index):
+    """Name of the part file a shard writes, e.g. incidents.part0003.csv"""
+    root, ext = os.path.splitext(output)
+    return f"{root}.part{shard_index:04d}{ext or '.csv'}"
+
+
+def _generate_shard(path, start_id, stop_id, seed, now, batch_size, inc_key, arrivals=None,
+                    tables=None, with_stats=False, counter=False):
+    """Worker entry point: write one shard, with header, to its own file.
+
+    Returns (path, rows, IncidentStats or None); the parent merges the stats.
+    """
+    stats = None
+    if with_stats:
+        from incident_stats import IncidentStats
+
+        stats = IncidentStats()
+    with CsvSink.open(path) as sink:
+        sink.write_rows(iter_incidents(stop_id - start_id, seed=seed, start_id=start_id, now=now,
+                                       batch_size=batch_size, inc_key=inc_key, arrivals=arrivals,
+                                       tables=tables, stats=stats, counter=counter))
+    return path, stop_id - start_id, stats
+
+
+def merge_parts(output, paths):
+    """Concatenate part files in shard (and therefore id) order under one header"""
+    with open(output, 'wb') as merged:
+        for index, path in enumerate(paths):
+            with open(path, 'rb') as part:
+                header = part.readline()
+                if index == 0:
+                    merged.write(header)
+                shutil.copyfileobj(part, merged, 16 * 1024 * 1024)
+            os.remove(path)
+
+
+def generate_sharded(output, count, shards, workers=None, seed=None, batch_size=None,
+                     merge=True, now=None, arrivals=None, tables=None, stats=None, counter=False,
+                     progress=print):
+    """Generate `count` incidents across `shards` processes.
+
+    Returns the list of files written: the merged `output` when `merge` is
+    true, otherwise one part file per shard. An `arrivals` sampler is shared
+    by every shard, so outages line up across the whole id range. Each shard
+    counts its own rows when `stats` (an IncidentStats) is given, and the
+    shard stats are merged into it. With `counter` rows depend only on
+    (seed, id), so any shard count gives the same rows. Progress lines go to
+    `progress` (None for quiet).
+    """
+    if seed is None:
+        seed = int.from_bytes(os.urandom(8), "little")
+        if progress:
+            progress(f"Using master seed {seed}")
+    if now is None:
+        now = datetime.now()
+
+    # INC numbers are keyed by the master seed so they stay unique across shards
+    inc_key = inc_number_key(seed)
+    ranges = shard_ranges(count, shards)
+    paths = [part_path(output, index) for index in range(len(ranges))]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_generate_shard, path, start, stop,
+                            seed if counter else shard_seed(seed, index), now, batch_size,
+                            inc_key, arrivals, tables, stats is not None, counter)
+            for index, (path, (start, stop)) in enumerate(zip(paths, ranges))
+        ]
+        done = 0
+        for future in futures:
+            path, rows, shard_stats = future.result()
+            if shard_stats is not None:
+                stats.merge(shard_stats)
+            done += rows
+            if progress:
+                progress(f"Generated {done} records... ({path})")
+
+    if not merge:
+        return paths
+    merge_parts(output, paths)
+    return [output]
@@ -0,0 +1,32 @@
+import csv
+import os
+import sys
+from datetime import datetime
+
+import pytest
+
+# The generator modules are top-level scripts in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+AS_OF = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def as_of():
+    return AS_OF
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def read_rows(path):
+    """CSV rows of a file, header first"""
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def as_text(rows):
+    """Rows as CSV writes them (ids and flags as text), for comparing engines"""
+    return [[str(value) for value in row] for row in rows]
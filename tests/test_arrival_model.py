@@ -0,0 +1,47 @@
+import numpy as np
+from conftest import AS_OF
+
+import Generate_Records_v3 as generator
+from arrival_model import ArrivalModel
+
+
+def sample(seed, count=200000):
+    sampler = ArrivalModel().sampler(AS_OF, 3)
+    rng = np.random.default_rng(seed)
+    state = rng.integers(0, len(generator.states), count)
+    service = rng.integers(0, len(generator.services), count)
+    created, updated = sampler.dates(service, state, rng)
+    return state, created, updated
+
+
+def test_same_seed_same_dates():
+    assert all(np.array_equal(a, b) for a, b in zip(sample(1), sample(1)))
+
+
+def test_dates_stay_within_generate_dates_bounds():
+    state, created, updated = sample(2)
+    now = generator.naive_epoch(AS_OF)
+    hours = (updated - created) / 3600
+    assert (created <= updated).all() and (updated <= now).all()
+    assert (created >= now - 365 * generator.SECONDS_PER_DAY).all()
+    closed = np.isin(state, [generator.states.index(s) for s in generator.closed_states])
+    assert (hours[~closed] <= 30 * 24).all() and (hours[closed] <= 60 * 24).all()
+    # Closed tickets are only quicker than 25 h when near-now fallback applies
+    assert (updated[closed & (hours < 25)] >= now - 12 * 3600).all()
+
+
+def test_minimum_is_not_a_spike():
+    state, created, updated = sample(3)
+    hours = (updated - created) / 3600
+    resolved = hours[state == generator.states.index("Resolved")]
+    assert np.mean(np.isclose(resolved, 25)) < 0.01
+    assert np.median(resolved) > 30
+
+
+def test_weekday_business_hours_are_busier_than_weekend_nights():
+    _, created, _ = sample(4)
+    hour = created // 3600 % 24
+    weekday = (created // generator.SECONDS_PER_DAY + 3) % 7
+    busy = np.sum((weekday < 5) & (hour >= 9) & (hour < 17))
+    quiet = np.sum((weekday >= 5) & (hour < 8))
+    assert busy > 10 * quiet
@@ -0,0 +1,56 @@
+import pytest
+from conftest import AS_OF, read_bytes
+
+import checkpointed_generation
+from checkpointed_generation import load_checkpoint, write_checkpointed
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupted_run(path, monkeypatch, after_commits, **options):
+    """Start a run and stop it right after its `after_commits`-th checkpoint"""
+    save = checkpointed_generation._save_checkpoint
+    commits = []
+
+    def save_then_stop(*args):
+        save(*args)
+        commits.append(1)
+        if len(commits) == after_commits:
+            raise Interrupted
+
+    monkeypatch.setattr(checkpointed_generation, "_save_checkpoint", save_then_stop)
+    with pytest.raises(Interrupted):
+        write_checkpointed(str(path), 1000, seed=8, now=AS_OF, progress=None, **options)
+    monkeypatch.setattr(checkpointed_generation, "_save_checkpoint", save)
+
+
+@pytest.mark.parametrize("options", [
+    {"checkpoint_every": 150},
+    {"checkpoint_every": 150, "batch_size": 100},
+    {"checkpoint_every": 150, "counter": True},
+])
+def test_resumed_run_matches_an_uninterrupted_one(tmp_path, monkeypatch, options):
+    whole, resumed = tmp_path / "whole.csv", tmp_path / "resumed.csv"
+    write_checkpointed(str(whole), 1000, seed=8, now=AS_OF, progress=None, **options)
+
+    interrupted_run(resumed, monkeypatch, 3, **options)
+    # Rows written after the last checkpoint are dropped on resume
+    with open(resumed, 'ab') as f:
+        f.write(b"INC-partial,row")
+    checkpoint = load_checkpoint(str(resumed))
+    assert not checkpoint["complete"] and checkpoint["last_id"] < 1000
+    written = write_checkpointed(str(resumed), 0, resume=True, progress=None)
+
+    assert written == 1000 - checkpoint["last_id"]
+    assert load_checkpoint(str(resumed))["complete"]
+    assert read_bytes(resumed) == read_bytes(whole)
+
+
+def test_resuming_a_complete_run_writes_nothing(tmp_path):
+    path = tmp_path / "done.csv"
+    write_checkpointed(str(path), 200, 50, seed=1, now=AS_OF, progress=None)
+    before = read_bytes(path)
+    assert write_checkpointed(str(path), 0, resume=True, progress=None) == 0
+    assert read_bytes(path) == before
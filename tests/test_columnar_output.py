@@ -0,0 +1,23 @@
+import pytest
+from conftest import AS_OF, as_text
+
+import Generate_Records_v3 as generator
+from columnar_output import iter_columnar_rows, write_columnar
+
+
+def batch_rows(count, seed):
+    return as_text(generator.iter_incidents(count, seed=seed, now=AS_OF, batch_size=256))
+
+
+def test_dict_csv_round_trips_to_the_batch_engine_rows(tmp_path):
+    path = str(tmp_path / "columns")
+    assert write_columnar(path, 1000, "dict-csv", seed=6, now=AS_OF, batch_size=256,
+                          progress=None) == 1000
+    assert as_text(iter_columnar_rows(path)) == batch_rows(1000, 6)
+
+
+def test_parquet_round_trips_to_the_batch_engine_rows(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "incidents.parquet")
+    write_columnar(path, 1000, "parquet", seed=6, now=AS_OF, batch_size=256, progress=None)
+    assert as_text(iter_columnar_rows(path)) == batch_rows(1000, 6)
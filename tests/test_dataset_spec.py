@@ -0,0 +1,36 @@
+import json
+
+import pytest
+from conftest import AS_OF, as_text
+
+import Generate_Records_v3 as generator
+from dataset_spec import load_tables, spec_from_tables
+
+
+def test_built_in_spec_gives_the_built_in_rows(tmp_path):
+    tables = load_tables(generator.default_spec_path, cache_dir=str(tmp_path))
+    assert tables.same_values(generator.default_tables)
+    expected = as_text(generator.iter_incidents(300, seed=1, now=AS_OF))
+    assert as_text(generator.iter_incidents(300, seed=1, now=AS_OF, tables=tables)) == expected
+    # Second load comes from the cache
+    cached = load_tables(generator.default_spec_path, cache_dir=str(tmp_path))
+    assert as_text(generator.iter_incidents(300, seed=1, now=AS_OF, tables=cached)) == expected
+
+
+def test_written_spec_round_trips(tmp_path):
+    path = tmp_path / "spec.json"
+    path.write_text(json.dumps(spec_from_tables()), encoding="utf-8")
+    assert load_tables(str(path), cache_dir=None).same_values(generator.default_tables)
+
+
+def test_custom_values_need_the_row_engine(tmp_path):
+    spec = generator.load_spec()
+    spec["services"] = spec["services"][:3]
+    path = tmp_path / "spec.json"
+    path.write_text(json.dumps(spec), encoding="utf-8")
+    tables = load_tables(str(path), cache_dir=None)
+    assert not tables.same_values(generator.default_tables)
+    services = {row[4] for row in generator.iter_incidents(500, seed=1, now=AS_OF, tables=tables)}
+    assert services <= set(tables.services.values) and len(tables.services.values) == 3
+    with pytest.raises(ValueError):
+        list(generator.iter_incidents(10, seed=1, now=AS_OF, tables=tables, batch_size=10))
@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+from conftest import AS_OF, read_bytes, read_rows
+
+import delta_generation
+import Generate_Records_v3 as generator
+from delta_generation import DeltaIndex, build_index, index_paths, write_delta
+
+
+@pytest.fixture
+def base(tmp_path):
+    path = tmp_path / "base.csv"
+    generator.write_incidents_csv(str(path), 3000, seed=7, now=AS_OF, progress=None)
+    build_index(str(path), seed=7, as_of=AS_OF)
+    return path
+
+
+def copy_dataset(base, directory):
+    directory.mkdir()
+    for path in [base, *index_paths(str(base)), delta_generation.recent_incidents_path(str(base))]:
+        (directory / base.name).with_name(str(path).rsplit("/", 1)[-1]).write_bytes(read_bytes(path))
+    return directory / base.name
+
+
+def test_chained_deltas_replay_exactly(base, tmp_path):
+    runs = []
+    for name in ("a", "b"):
+        dataset = copy_dataset(base, tmp_path / name)
+        for day in (1, 2):
+            write_delta(str(dataset), str(dataset.parent / f"day{day}.csv"), updates=300, new=500,
+                        progress=None)
+        runs.append([read_bytes(dataset.parent / f) for f in
+                     ("day1.csv", "day1.new.csv", "day2.csv", "day2.new.csv", "base.csv.delta.idx")])
+    assert runs[0] == runs[1]
+
+
+def test_new_incidents_continue_ids_and_look_like_fresh_rows(base, tmp_path):
+    write_delta(str(base), str(tmp_path / "day1.csv"), updates=0, new=2000, progress=None)
+    old = {row[0]: row for row in read_rows(base)[1:]}
+    new = read_rows(tmp_path / "day1.new.csv")[1:]
+    assert [int(row[1]) for row in new] == list(range(3001, 5001))
+    assert not old.keys() & {row[0] for row in new}
+
+    as_of = generator.naive_epoch(AS_OF)
+    seen = dict(old)
+    for row in new:
+        created = generator.naive_epoch(datetime.fromisoformat(row[10]))
+        updated = generator.naive_epoch(datetime.fromisoformat(row[11]))
+        assert as_of < created <= updated <= as_of + generator.SECONDS_PER_DAY
+        if row[12] == "Duplicate" and row[13] != "Incident resolved.":
+            target = seen[next(word.strip(".") for word in row[13].split() if word.startswith("INC"))]
+            assert target[4] == row[4] and target[10] <= row[10]
+        seen[row[0]] = row
+
+
+def test_updates_move_states_forward(base, tmp_path):
+    write_delta(str(base), str(tmp_path / "day1.csv"), updates=500, progress=None)
+    before = {row[0]: row for row in read_rows(base)[1:]}
+    order = ["New", "In Progress", "Resolved", "Closed"]
+    for inc_number, _, state, updated, resolution, notes, active in read_rows(tmp_path / "day1.csv")[1:]:
+        assert order.index(state) > order.index(before[inc_number][6])
+        assert updated > before[inc_number][11]
+        assert active == str(generator.is_active(state))
+        assert bool(resolution) == bool(notes) == (state in generator.closed_states)
+
+
+def test_interrupted_delta_is_completed_on_next_open(base, tmp_path, monkeypatch):
+    clean, crashed = copy_dataset(base, tmp_path / "clean"), copy_dataset(base, tmp_path / "crashed")
+    write_delta(str(clean), str(clean.parent / "day1.csv"), updates=300, new=500, progress=None)
+
+    apply = DeltaIndex._apply_journal
+    monkeypatch.setattr(DeltaIndex, "_apply_journal", lambda self: (_ for _ in ()).throw(OSError))
+    with pytest.raises(OSError):
+        write_delta(str(crashed), str(crashed.parent / "day1.csv"), updates=300, new=500,
+                    progress=None)
+    monkeypatch.setattr(DeltaIndex, "_apply_journal", apply)
+
+    DeltaIndex(str(crashed))
+    for path in index_paths(str(clean)):
+        assert read_bytes(path) == read_bytes(str(path).replace("/clean/", "/crashed/"))
+
+
+def test_as_of_before_the_data_is_rejected(base):
+    with pytest.raises(ValueError):
+        build_index(str(base), seed=7, as_of=datetime(2025, 6, 1))
+
+
+def test_wrong_seed_is_rejected(base):
+    with pytest.raises(ValueError):
+        build_index(str(base), seed=8)
@@ -0,0 +1,68 @@
+import random
+
+from conftest import AS_OF, as_text, read_bytes, read_rows
+
+import Generate_Records_v3 as generator
+
+
+def rows(count, **options):
+    return as_text(generator.iter_incidents(count, now=AS_OF, **options))
+
+
+def test_same_seed_same_rows():
+    assert rows(500, seed=11) == rows(500, seed=11)
+    assert rows(500, seed=11) != rows(500, seed=12)
+
+
+def test_batch_engine_same_seed_same_rows():
+    assert rows(500, seed=11, batch_size=128) == rows(500, seed=11, batch_size=128)
+    assert rows(500, seed=11, batch_size=128) != rows(500, seed=12, batch_size=128)
+
+
+def test_iterating_leaves_global_random_state_alone():
+    state = random.getstate()
+    rows(100, seed=1)
+    assert random.getstate() == state
+
+
+def test_written_csv_matches_iterated_rows(tmp_path):
+    first, second = tmp_path / "a.csv", tmp_path / "b.csv"
+    generator.write_incidents_csv(str(first), 300, seed=5, now=AS_OF, progress=None)
+    generator.write_incidents_csv(str(second), 300, seed=5, now=AS_OF, progress=None)
+    assert read_bytes(first) == read_bytes(second)
+    assert read_rows(first) == [generator.csv_header] + rows(300, seed=5)
+
+
+def test_inc_numbers_unique_and_invertible():
+    key = generator.inc_number_key(3)
+    numbers = [generator.permute_inc_number(i, key) for i in range(1, 20001)]
+    assert len(set(numbers)) == len(numbers)
+    assert all(generator.inc_number_id(f"INC{number:07d}", key) == i
+               for i, number in enumerate(numbers, 1))
+
+
+def test_counter_rows_do_not_depend_on_the_range():
+    full = rows(400, seed=9, counter=True)
+    assert rows(100, seed=9, counter=True, start_id=201) == full[200:300]
+
+
+def test_counter_batches_do_not_depend_on_the_range():
+    full = rows(400, seed=9, counter=True, batch_size=64)
+    assert rows(100, seed=9, counter=True, batch_size=64, start_id=201) == full[200:300]
+    assert rows(100, seed=9, counter=True, batch_size=30, start_id=201) == full[200:300]
+
+
+def test_dates_follow_generate_dates_rules():
+    now = generator.naive_epoch(AS_OF)
+    rng = random.Random(4)
+    for state in generator.states * 2000:
+        created, updated = generator.generate_date_epochs(state, now, rng)
+        assert now - 365 * generator.SECONDS_PER_DAY <= created <= updated <= now
+        if state in generator.closed_states and updated < now - 12 * 3600:
+            assert updated - created >= 25 * 3600
+
+
+def test_active_matches_state():
+    for row in generator.iter_incidents(500, seed=2, now=AS_OF):
+        assert row[14] == generator.is_active(row[6])
+        assert bool(row[12]) == bool(row[13]) == (row[6] in generator.closed_states)
@@ -0,0 +1,42 @@
+import asyncio
+
+from conftest import AS_OF
+
+import Generate_Records_v3 as generator
+from import_set_loader import ImportSetLoader, ImportSetStubServer, import_record
+
+
+def load(rows, fail_every=0, patch=None):
+    async def run():
+        stub = await ImportSetStubServer(fail_every=fail_every).start()
+        try:
+            loader = ImportSetLoader(stub.url, batch_size=50, concurrency=2, backoff=0.001)
+            if patch:
+                patch(loader)
+            report = await asyncio.wait_for(loader.load(rows), 30)
+        finally:
+            await stub.close()
+        return report, stub
+    return asyncio.run(run())
+
+
+def test_every_row_arrives_once_despite_throttling():
+    rows = list(generator.iter_incidents(1000, seed=2, now=AS_OF))
+    report, stub = load(rows, fail_every=3)
+    assert report.rows == 1000 and report.failed_rows == 0
+    assert report.retries > 0
+    received = sorted((r for batch in stub.batches for r in batch), key=lambda r: r["u_inc_number"])
+    assert [r["u_inc_number"] for r in received] == sorted(row[0] for row in rows)
+    assert stub.requests > len(stub.batches) == 20
+    assert import_record(rows[0]) in received
+
+
+def test_unexpected_errors_fail_the_batch_not_the_load():
+    def broken(loader):
+        async def request(*args, **kwargs):
+            raise RuntimeError("boom")
+        loader.pool.request = request
+
+    report, _ = load(generator.iter_incidents(500, seed=2, now=AS_OF), patch=broken)
+    assert report.rows == 0
+    assert report.failed_batches == 10 and report.failed_rows == 500
@@ -0,0 +1,20 @@
+from conftest import AS_OF, as_text, read_bytes
+
+import Generate_Records_v3 as generator
+from incident_dataset import IncidentDataset
+
+
+def test_compact_dataset_holds_the_batch_rows(tmp_path):
+    dataset = IncidentDataset.generate(2500, seed=8, now=AS_OF, batch_size=1000)
+    rows = as_text(generator.iter_incidents(2500, seed=8, now=AS_OF, batch_size=1000))
+    assert len(dataset) == 2500
+    assert as_text(dataset) == rows
+    assert as_text([dataset[1234]]) == rows[1234:1235]
+    assert as_text(dataset[100:200]) == rows[100:200]
+
+    path = str(tmp_path / "dataset.csv")
+    expected = str(tmp_path / "expected.csv")
+    dataset.write_csv(path, chunk_rows=700)
+    generator.write_incidents_csv(expected, 2500, seed=8, now=AS_OF, batch_size=1000,
+                                  progress=None)
+    assert read_bytes(path) == read_bytes(expected)
@@ -0,0 +1,32 @@
+import gzip
+
+from conftest import AS_OF, read_bytes
+
+import Generate_Records_v3 as generator
+from incident_sinks import CompressedCsvSink
+
+
+def test_gzip_output_decompresses_to_the_plain_csv(tmp_path):
+    plain, packed = tmp_path / "plain.csv", tmp_path / "packed.csv.gz"
+    generator.write_incidents_csv(str(plain), 2000, seed=4, now=AS_OF, progress=None)
+    generator.write_incidents_csv(str(packed), 2000, seed=4, now=AS_OF, progress=None,
+                                  compression="gzip")
+    with gzip.open(packed, 'rb') as f:
+        assert f.read() == read_bytes(plain)
+
+
+def test_chunked_parts_each_have_a_header_and_together_hold_every_row(tmp_path):
+    plain = tmp_path / "plain.csv"
+    generator.write_incidents_csv(str(plain), 3000, seed=4, now=AS_OF, progress=None)
+    with CompressedCsvSink(str(tmp_path / "out.csv.gz"), "gzip", chunk_bytes=20000) as sink:
+        generator.write_incidents(sink, generator.iter_incidents(3000, seed=4, now=AS_OF),
+                                  progress=None)
+    assert len(sink.paths) > 1
+    header, *rows = read_bytes(plain).splitlines(keepends=True)
+    parts = []
+    for path in sink.paths:
+        with gzip.open(path, 'rb') as f:
+            part_header, *part_rows = f.read().splitlines(keepends=True)
+        assert part_header == header
+        parts += part_rows
+    assert parts == rows
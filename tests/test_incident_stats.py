@@ -0,0 +1,29 @@
+import pytest
+from conftest import AS_OF
+
+import Generate_Records_v3 as generator
+from incident_batch import iter_incident_batches
+from incident_stats import IncidentStats
+
+
+def test_batches_and_rows_count_the_same():
+    from_rows, from_batches = IncidentStats(), IncidentStats()
+    for batch in iter_incident_batches(5000, seed=6, now=AS_OF, batch_size=1000):
+        from_rows.add_rows(list(batch.rows()))
+        from_batches.add_batch(batch)
+    assert from_rows.to_dict() == from_batches.to_dict()
+
+
+def test_merged_halves_equal_the_whole():
+    rows = list(generator.iter_incidents(4000, seed=6, now=AS_OF))
+    whole, first, second = IncidentStats(), IncidentStats(), IncidentStats()
+    whole.add_rows(rows)
+    first.add_rows(rows[:1500])
+    second.add_rows(rows[1500:])
+    merged = IncidentStats.from_dict(first.to_dict()).merge(second)
+    merged, whole_dict = merged.to_dict(), whole.to_dict()
+    # Sketch sums are floats added in a different order
+    for state, sketch in whole_dict["resolution_hours"].items():
+        assert merged["resolution_hours"][state].pop("sum") == pytest.approx(sketch.pop("sum"))
+    assert merged == whole_dict
+    assert sum(whole.counts["state"].values()) == whole.rows == 4000
@@ -0,0 +1,23 @@
+import random
+
+from conftest import AS_OF, read_bytes
+
+import Generate_Records_v3 as generator
+from offset_index import OffsetIndex, build_index
+
+
+def test_written_and_rebuilt_indexes_find_every_row(tmp_path):
+    path = str(tmp_path / "incidents.csv")
+    generator.write_incidents_csv(path, 3000, seed=3, now=AS_OF, progress=None, offset_index=True)
+    lines = read_bytes(path).splitlines(keepends=True)[1:]
+    written = read_bytes(path + ".offsets.idx")
+    assert build_index(path) == 3000
+    assert read_bytes(path + ".offsets.idx") == written
+
+    with OffsetIndex(path) as index:
+        for incident_id in random.Random(1).sample(range(1, 3001), 200):
+            line = lines[incident_id - 1]
+            assert index.find_id(incident_id) == line
+            assert index.find_inc_number(line.split(b",")[0].decode()) == line
+        assert index.find_id(3001) is None
+        assert index.id_range_bytes(101, 200) == b"".join(lines[100:200])
@@ -0,0 +1,26 @@
+from conftest import AS_OF, as_text, read_rows
+
+import Generate_Records_v3 as generator
+from partitioned_output import partition_rows, sort_rows
+
+
+def test_external_sort_matches_an_in_memory_sort(tmp_path):
+    rows = as_text(generator.iter_incidents(3000, seed=5, now=AS_OF))
+    # A tiny budget forces spilled runs and intermediate merge passes
+    spilled = list(sort_rows(iter(rows), memory_mb=0.2, fan_in=2, temp_dir=str(tmp_path)))
+    assert as_text(spilled) == sorted(rows, key=lambda row: row[10])
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_partitions_hold_their_period_in_created_order(tmp_path):
+    rows = as_text(generator.iter_incidents(3000, seed=5, now=AS_OF))
+    paths = partition_rows(iter(rows), str(tmp_path / "incidents.csv"), "month", memory_mb=0.2,
+                           progress=None)
+    collected = []
+    for name, path in sorted(paths.items()):
+        header, *part = read_rows(path)
+        assert header == generator.csv_header
+        assert all(row[10].startswith(name) for row in part)
+        assert [row[10] for row in part] == sorted(row[10] for row in part)
+        collected += part
+    assert sorted(map(tuple, collected)) == sorted(map(tuple, rows))
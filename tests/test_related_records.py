@@ -0,0 +1,50 @@
+import pytest
+from conftest import AS_OF, read_rows
+
+from related_records import check_duplicates, table_path, write_related_dataset
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    output = str(tmp_path_factory.mktemp("related") / "incidents.csv")
+    written, related = write_related_dataset(output, 20000, seed=7, now=AS_OF, progress=None)
+    assert written == 20000
+    return output, related
+
+
+def test_duplicates_link_to_similar_earlier_incidents(dataset):
+    output, related = dataset
+    report = check_duplicates(output)
+    assert report["invalid"] == 0
+    assert report["linked_ratio"] > 0.9
+    assert {kind: report[kind] for kind in related.duplicate_counts} == related.duplicate_counts
+
+
+def test_references_never_postdate_the_incident(dataset):
+    output, _ = dataset
+    incidents = {row[0]: row for row in read_rows(output)[1:]}
+    dates = {}
+    for table, column in (("problem", 7), ("change_request", 7), ("kb_knowledge", 6)):
+        dates.update({row[0]: row[column] for row in read_rows(table_path(output, table))[1:]})
+    references = read_rows(table_path(output, "references"))[1:]
+    assert references
+    for inc_number, table, number in references:
+        if table != "incident":
+            assert dates[number] <= incidents[inc_number][11]
+
+
+def test_articles_cite_known_errors(dataset):
+    output, _ = dataset
+    problems = {row[0]: row for row in read_rows(table_path(output, "problem"))[1:]}
+    for article in read_rows(table_path(output, "kb_knowledge"))[1:]:
+        problem = problems[article[4]]
+        assert problem[6] == "True" and problem[7] <= article[6]
+
+
+def test_same_seed_same_files(dataset, tmp_path):
+    output, related = dataset
+    again = str(tmp_path / "incidents.csv")
+    write_related_dataset(again, 20000, seed=7, now=AS_OF, progress=None)
+    for table in ("problem", "change_request", "kb_knowledge", "references"):
+        assert read_rows(table_path(again, table)) == read_rows(related.paths[table])
+    assert read_rows(again) == read_rows(output)
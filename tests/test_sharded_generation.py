@@ -0,0 +1,44 @@
+from conftest import AS_OF, read_bytes, read_rows
+
+import Generate_Records_v3 as generator
+from sharded_generation import generate_sharded, shard_ranges
+
+
+def sharded(path, shards, workers=2, **options):
+    options.setdefault("seed", 21)
+    return generate_sharded(str(path), 1000, shards, workers=workers, now=AS_OF, progress=None,
+                            **options)
+
+
+def test_shard_ranges_cover_the_ids_once():
+    ranges = shard_ranges(1003, 4)
+    assert ranges[0][0] == 1 and ranges[-1][1] == 1004
+    assert all(stop == start for (_, stop), (start, _) in zip(ranges, ranges[1:]))
+
+
+def test_same_seed_and_shards_give_the_same_bytes_whatever_the_workers(tmp_path):
+    sharded(tmp_path / "one.csv", 3, workers=1)
+    sharded(tmp_path / "many.csv", 3, workers=3)
+    assert read_bytes(tmp_path / "one.csv") == read_bytes(tmp_path / "many.csv")
+
+
+def test_merged_output_is_the_parts_in_id_order(tmp_path):
+    merged = sharded(tmp_path / "merged.csv", 3)
+    parts = sharded(tmp_path / "parts.csv", 3, merge=False)
+    assert merged == [str(tmp_path / "merged.csv")] and len(parts) == 3
+    rows = [generator.csv_header] + [row for path in parts for row in read_rows(path)[1:]]
+    assert read_rows(merged[0]) == rows
+    assert [int(row[1]) for row in rows[1:]] == list(range(1, 1001))
+    assert len({row[0] for row in rows[1:]}) == 1000
+
+
+def test_counter_output_does_not_depend_on_the_shard_count(tmp_path):
+    sharded(tmp_path / "two.csv", 2, counter=True)
+    sharded(tmp_path / "five.csv", 5, counter=True)
+    assert read_bytes(tmp_path / "two.csv") == read_bytes(tmp_path / "five.csv")
+
+
+def test_batch_shards_are_deterministic(tmp_path):
+    sharded(tmp_path / "a.csv", 2, batch_size=100)
+    sharded(tmp_path / "b.csv", 2, batch_size=100, workers=1)
+    assert read_bytes(tmp_path / "a.csv") == read_bytes(tmp_path / "b.csv")
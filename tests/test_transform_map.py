@@ -0,0 +1,48 @@
+import pytest
+from conftest import AS_OF
+
+import Generate_Records_v3 as generator
+from import_set_loader import import_record
+from transform_map import TransformError, transform_batch, transform_record, transform_rows
+
+
+@pytest.fixture(scope="module")
+def records():
+    return [import_record(row) for row in generator.iter_incidents(500, seed=4, now=AS_OF)]
+
+
+def test_generated_rows_transform_cleanly(records):
+    result = transform_batch(records)
+    assert result.summary() == {"target_records": 500, "inserted": 500, "updated": 0, "rejected": 0}
+    target = result.records[records[0]["u_inc_number"]]
+    assert target["sys_created_on"] == records[0]["u_create_date"]
+    assert target["active"] == (records[0]["u_active"] == "True")
+
+
+def test_unknown_choice_follows_choice_action(records):
+    source = dict(records[0], u_state="Parked")
+    with pytest.raises(TransformError):
+        transform_record(source)
+    assert "state" not in transform_record(source, "ignore")
+    assert transform_record(source, "create")["state"] == "Parked"
+
+
+def test_rows_coalesce_on_number(records):
+    updated = dict(records[0], u_short_description="Edited")
+    result = transform_batch(records + [updated, dict(records[1], u_create_date="2026-02-30 00:00:00")])
+    assert result.summary() == {"target_records": 500, "inserted": 500, "updated": 1, "rejected": 1}
+    assert result.records[records[0]["u_inc_number"]]["short_description"] == "Edited"
+    assert result.rejected[0][0] == 502
+
+
+def test_column_wise_matches_record_wise(records):
+    sources = records + [dict(records[3], u_priority="9 - Whenever"), dict(records[4], u_inc_number="")]
+    fields = list(sources[0])
+    rows = [[source[field] for field in fields] for source in sources]
+    for keep in (True, False):
+        by_record = transform_batch(sources)
+        by_column = transform_rows(fields, rows, result=type(by_record)(keep_records=keep))
+        assert by_column.summary() == by_record.summary()
+        assert [r[:2] for r in by_column.rejected] == [r[:2] for r in by_record.rejected]
+        if keep:
+            assert by_column.records == by_record.records
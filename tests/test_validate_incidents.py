@@ -0,0 +1,99 @@
+import csv
+
+import pytest
+from conftest import AS_OF, read_rows
+
+import Generate_Records_v3 as generator
+from validate_incidents import validate
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "incidents.csv"
+    generator.write_incidents_csv(str(path), 3000, seed=12, now=AS_OF, progress=None)
+    return path
+
+
+def rewrite(source, target, change):
+    """Copy a dataset, passing each data row (a list) through change(index, row)"""
+    header, *rows = read_rows(source)
+    with open(target, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for index, row in enumerate(rows):
+            writer.writerow(change(index, row))
+
+
+def failures(report):
+    return {name: count for name, count in report["counts"].items() if count}
+
+
+def test_generated_output_passes(dataset):
+    report = validate([str(dataset)], now=AS_OF, workers=1)
+    assert report["rows"] == 3000 and report["violations"] == 0
+
+
+def test_generated_columnar_and_compressed_output_passes(tmp_path):
+    from columnar_output import write_columnar
+
+    write_columnar(str(tmp_path / "columns"), 1000, "dict-csv", seed=2, now=AS_OF,
+                   batch_size=300, progress=None)
+    generator.write_incidents_csv(str(tmp_path / "packed.csv.gz"), 1000, seed=3, now=AS_OF,
+                                  progress=None, compression="gzip")
+    report = validate([str(tmp_path / "columns"), str(tmp_path / "packed.csv.gz")], now=AS_OF,
+                      workers=1)
+    # Different seeds number their incidents with different keys, so a few may collide
+    assert report["rows"] == 2000
+    assert set(failures(report)) <= {"duplicate_inc_number"}
+
+
+def set_column(column, value, rows=(5,)):
+    position = generator.csv_header.index(column)
+
+    def change(index, row):
+        if index in rows:
+            row[position] = value
+        return row
+    return change
+
+
+@pytest.mark.parametrize("change, check", [
+    (set_column("updated_date", "2020-01-01 00:00:00"), "updated_before_created"),
+    (set_column("created_date", "2025-02-30 10:00:00"), "bad_timestamp"),
+    (set_column("updated_date", "2027-01-01 00:00:00"), "future_timestamp"),
+    (set_column("service", "Not A Service"), "unknown_service"),
+    (set_column("inc_number", "INC12X"), "bad_inc_number"),
+    (set_column("inc_number", "INC99999999999999"), "bad_inc_number"),
+    (set_column("inc_number", "INC" + "9" * 30), "bad_inc_number"),
+    (set_column("inc_number", "INC9999999999", rows=(5, 9)), "duplicate_inc_number"),
+])
+def test_each_corruption_is_reported_by_its_check(dataset, tmp_path, change, check):
+    broken = tmp_path / "broken.csv"
+    rewrite(dataset, broken, change)
+    report = validate([str(broken)], now=AS_OF, workers=1)
+    assert failures(report) == {check: 1}
+    assert report["samples"][check][0]["id"] in ("6", "10")
+
+
+def test_active_and_resolution_must_match_the_state(dataset, tmp_path):
+    broken = tmp_path / "broken.csv"
+
+    def change(index, row):
+        if index == 0:
+            row[14] = str(not generator.is_active(row[6]))
+        if index == 1:
+            row[6], row[12], row[13], row[14] = "New", "Duplicate", "Closing.", "True"
+        return row
+    rewrite(dataset, broken, change)
+    counts = failures(validate([str(broken)], now=AS_OF, workers=1))
+    assert counts.pop("active_mismatch") == 1
+    assert counts == {"resolution_on_active": 1}
+
+
+def test_duplicates_across_files_and_pieces_match_a_serial_run(dataset, tmp_path):
+    copy = tmp_path / "copy.csv"
+    with open(copy, 'w', newline='', encoding='utf-8') as f:
+        csv.writer(f).writerows(read_rows(dataset)[:11])
+    serial = validate([str(dataset), str(copy)], now=AS_OF, workers=1)
+    parallel = validate([str(dataset), str(copy)], now=AS_OF, workers=2)
+    assert failures(serial) == failures(parallel) == {"duplicate_inc_number": 10}
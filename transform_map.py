@@ -0,0 +1,379 @@
+"""Offline port of TransformMapScript.js for validating bulk imports locally.
+
+Applies the same mapping the import set transform does, without a round
+trip through an instance:
+
+* the staging fields map onto incident fields (u_inc_number -> number, ...),
+* ``target.autoSysFields(false)`` semantics: ``sys_created_on`` and
+  ``sys_updated_on`` come from u_create_date / u_update_date when present,
+* field coercions: glide date/times must be ``YYYY-MM-DD HH:MM:SS``,
+  ``Active`` becomes a boolean and choice labels become choice values,
+* the transform coalesces on ``number``, so a repeated INC number updates
+  the earlier record instead of inserting a new one.
+
+Rows that cannot be coerced are rejected with a reason, as the instance
+would skip them. Input can be an incidents CSV or the JSONL batches
+recorded by ``import_set_loader.py stub``.
+
+Example:
+    python transform_map.py incidents_15000.csv --output incident.jsonl --rejects rejects.csv
+"""
+import argparse
+import csv
+import gc
+import json
+import sys
+from datetime import date
+from functools import lru_cache
+from itertools import islice
+
+from Generate_Records_v3 import incident_types, resolution_codes
+from import_set_loader import import_field_names
+
+# Staging field -> incident field (the field maps configured on the transform)
+field_map = {
+    "u_inc_number": "number",
+    "u_short_description": "short_description",
+    "u_description": "description",
+    "u_service": "business_service",
+    "u_incident_category": "category",
+    "u_state": "state",
+    "u_priority": "priority",
+    "u_impact": "impact",
+    "u_urgency": "urgency",
+    "u_resolution_code": "close_code",
+    "u_close_notes": "close_notes",
+    "u_active": "active",
+}
+
+# Choice label -> stored value for the incident choice fields
+choice_values = {
+    "state": {"New": 1, "In Progress": 2, "On Hold": 3, "Resolved": 6, "Closed": 7,
+              "Canceled": 8},
+    "priority": {"Critical": 1, "High": 2, "Medium": 3, "Moderate": 3, "Low": 4,
+                 "Planning": 5},
+    # impact/urgency only go up to 1 - High on the instance; Critical lands there too
+    "impact": {"Critical": 1, "High": 1, "Medium": 2, "Low": 3},
+    "urgency": {"Critical": 1, "High": 1, "Medium": 2, "Low": 3},
+    "category": {category.capitalize(): category for category in incident_types},
+    "close_code": {code: code for code in resolution_codes},
+}
+
+boolean_values = {"true": True, "1": True, "yes": True, "false": False, "0": False, "no": False}
+
+
+class TransformError(ValueError):
+    """A source row that the transform would reject"""
+
+
+@lru_cache(maxsize=4096)
+def _valid_day(day):
+    year, month, dom = day.split("-")
+    date(int(year), int(month), int(dom))
+    return True
+
+
+def coerce_glide_date_time(value):
+    """Validate a 'YYYY-MM-DD HH:MM:SS' value and return it unchanged"""
+    if (len(value) != 19 or value[4] != "-" or value[7] != "-" or value[10] != " "
+            or value[13] != ":" or value[16] != ":"):
+        raise TransformError(f"bad date/time {value!r}")
+    try:
+        _valid_day(value[:10])
+        hour, minute, second = int(value[11:13]), int(value[14:16]), int(value[17:19])
+    except ValueError:
+        raise TransformError(f"bad date/time {value!r}") from None
+    if hour > 23 or minute > 59 or second > 59:
+        raise TransformError(f"bad date/time {value!r}")
+    return value
+
+
+def coerce_boolean(value):
+    try:
+        return boolean_values[value.strip().lower()]
+    except KeyError:
+        raise TransformError(f"bad boolean {value!r}") from None
+
+
+def transform_record(source, choice_action="reject"):
+    """Map one import set record onto an incident record.
+
+    `choice_action` mirrors the field map option: 'reject' the row, 'ignore'
+    the field, or 'create' the value as given when a choice label is unknown.
+    """
+    target = {}
+    for source_field, target_field in field_map.items():
+        value = source.get(source_field, "")
+        if value == "" or value is None:
+            continue
+        choices = choice_values.get(target_field)
+        if choices is not None:
+            if value in choices:
+                value = choices[value]
+            elif choice_action == "reject":
+                raise TransformError(f"unknown {target_field} choice {value!r}")
+            elif choice_action == "ignore":
+                continue
+        elif target_field == "active":
+            value = coerce_boolean(value)
+        target[target_field] = value
+
+    if not target.get("number"):
+        raise TransformError("missing number")
+
+    # target.autoSysFields(false): take the system dates from the source
+    if source.get("u_create_date"):
+        target["sys_created_on"] = coerce_glide_date_time(source["u_create_date"])
+    if source.get("u_update_date"):
+        target["sys_updated_on"] = coerce_glide_date_time(source["u_update_date"])
+    return target
+
+
+class TransformResult:
+    """Target records keyed by number, plus what happened to every source row.
+
+    With `keep_records=False` only the numbers are kept, which is enough to
+    count inserts, coalesced updates and rejects for very large imports.
+    """
+
+    def __init__(self, keep_records=True):
+        self.keep_records = keep_records
+        self.records = {}
+        self.numbers = set()
+        self.inserted = 0
+        self.updated = 0
+        self.rejected = []
+
+    def summary(self):
+        return {
+            "target_records": len(self.records) if self.keep_records else len(self.numbers),
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "rejected": len(self.rejected),
+        }
+
+
+def _add_record(result, target):
+    if not result.keep_records:
+        _add_number(result, target["number"])
+        return
+    existing = result.records.get(target["number"])
+    if existing is None:
+        result.records[target["number"]] = target
+        result.inserted += 1
+    else:
+        existing.update(target)
+        result.updated += 1
+
+
+def _add_number(result, number):
+    if number in result.numbers:
+        result.updated += 1
+    else:
+        result.numbers.add(number)
+        result.inserted += 1
+
+
+def transform_batch(sources, choice_action="reject", result=None, first_row=1):
+    """Transform a batch of import set records, coalescing on number"""
+    result = result or TransformResult()
+    for row_number, source in enumerate(sources, first_row):
+        try:
+            target = transform_record(source, choice_action)
+        except TransformError as error:
+            result.rejected.append((row_number, str(error), source))
+            continue
+        _add_record(result, target)
+    return result
+
+
+def _coerce_column(target_field, column, choice_action):
+    """Coerce a whole column at once; returns (values, {row index: reason})"""
+    choices = choice_values.get(target_field)
+    if choices is None and target_field != "active":
+        return column, {}
+    if target_field == "active":
+        choices = {v: flag for v, flag in boolean_values.items()}
+        choices.update({v.capitalize(): flag for v, flag in boolean_values.items()})
+    try:
+        return [choices[v] if v != "" else "" for v in column], {}
+    except KeyError:
+        pass
+
+    # Slow path: some values are unknown, so find and handle them one by one
+    values = []
+    failures = {}
+    for index, value in enumerate(column):
+        if value == "" or value in choices:
+            values.append(choices.get(value, value))
+        elif target_field == "active":
+            try:
+                values.append(coerce_boolean(value))
+            except TransformError as error:
+                failures[index] = str(error)
+                values.append("")
+        elif choice_action == "reject":
+            failures[index] = f"unknown {target_field} choice {value!r}"
+            values.append("")
+        else:
+            values.append("" if choice_action == "ignore" else value)
+    return values, failures
+
+
+def _invalid_date_times(column):
+    """Row indexes of malformed values in a date/time column ('' is allowed).
+
+    Distinct days and times of day are validated once each, so a column of
+    a million timestamps costs two set builds rather than a million parses.
+    """
+    shapes_ok = all(len(v) == 19 and v[10] == " " for v in column if v)
+    days_ok = all(_valid_day_or_false(day) for day in {v[:10] for v in column if v})
+    times_ok = all(_valid_time_or_false(time) for time in {v[11:] for v in column if v})
+    if shapes_ok and days_ok and times_ok:
+        return []
+    invalid = []
+    for index, value in enumerate(column):
+        if value:
+            try:
+                coerce_glide_date_time(value)
+            except TransformError:
+                invalid.append(index)
+    return invalid
+
+
+def _valid_day_or_false(day):
+    try:
+        return day[4] == "-" and day[7] == "-" and _valid_day(day)
+    except (ValueError, IndexError):
+        return False
+
+
+def _valid_time_or_false(value):
+    try:
+        return (value[2] == ":" and value[5] == ":" and int(value[:2]) < 24
+                and int(value[3:5]) < 60 and int(value[6:]) < 60)
+    except (ValueError, IndexError):
+        return False
+
+
+def transform_rows(fields, rows, choice_action="reject", result=None, first_row=1):
+    """Column-wise equivalent of transform_batch for rows of staging values.
+
+    `fields` names the staging field of each position in the rows. Every
+    column is coerced in one pass and distinct date values are validated
+    once, which is several times faster than transforming record by record.
+    """
+    result = result or TransformResult()
+    if not rows:
+        return result
+    columns = dict(zip(fields, zip(*rows)))
+    failures = {}
+
+    target_fields = []
+    target_columns = []
+    for source_field, target_field in field_map.items():
+        if source_field not in columns:
+            continue
+        values, column_failures = _coerce_column(target_field, columns[source_field],
+                                                 choice_action)
+        for index, reason in column_failures.items():
+            failures.setdefault(index, reason)
+        target_fields.append(target_field)
+        target_columns.append(values)
+
+    # target.autoSysFields(false): take the system dates from the source
+    for source_field, target_field in (("u_create_date", "sys_created_on"),
+                                       ("u_update_date", "sys_updated_on")):
+        if source_field not in columns:
+            continue
+        column = columns[source_field]
+        for index in _invalid_date_times(column):
+            failures.setdefault(index, f"bad date/time {column[index]!r}")
+        target_fields.append(target_field)
+        target_columns.append(column)
+
+    number_position = target_fields.index("number") if "number" in target_fields else None
+    if not result.keep_records and number_position is not None:
+        # Counting only: no target dicts are built
+        numbers = target_columns[number_position]
+        for index, number in enumerate(numbers):
+            if index in failures or not number:
+                reason = failures.get(index, "missing number")
+                result.rejected.append((first_row + index, reason, dict(zip(fields, rows[index]))))
+            else:
+                _add_number(result, number)
+        return result
+
+    for index, values in enumerate(zip(*target_columns)):
+        if index in failures or number_position is None or not values[number_position]:
+            reason = failures.get(index, "missing number")
+            result.rejected.append((first_row + index, reason, dict(zip(fields, rows[index]))))
+            continue
+        if "" in values:
+            target = {f: v for f, v in zip(target_fields, values) if v != ""}
+        else:
+            target = dict(zip(target_fields, values))
+        _add_record(result, target)
+    return result
+
+
+def iter_source_chunks(path, chunk_size=100000):
+    """Yield (staging fields, rows) chunks from an incidents CSV or recorded JSONL"""
+    if path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                records = json.loads(line)["records"]
+                if records:
+                    fields = list(records[0])
+                    yield fields, [[record.get(name, "") for name in fields] for record in records]
+        return
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        fields = [import_field_names.get(name, name) for name in header]
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                return
+            yield fields, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the incident transform map offline")
+    parser.add_argument("input", help="incidents CSV or import set stub JSONL")
+    parser.add_argument("--output", help="write the target records as JSONL")
+    parser.add_argument("--rejects", help="write rejected rows with their reason as CSV")
+    parser.add_argument("--choice-action", choices=["reject", "ignore", "create"],
+                        default="reject", help="what to do with unknown choice values")
+    args = parser.parse_args()
+
+    # Target records are only built when they are written out
+    result = TransformResult(keep_records=bool(args.output))
+    first_row = 1
+    for fields, rows in iter_source_chunks(args.input):
+        transform_rows(fields, rows, args.choice_action, result, first_row)
+        first_row += len(rows)
+        # Kept target records are long-lived; stop the GC from rescanning them every chunk
+        gc.freeze()
+    summary = result.summary()
+    print(f"Target records: {summary['target_records']:,} "
+          f"({summary['inserted']:,} inserted, {summary['updated']:,} updated by coalesce)")
+    print(f"Rejected rows: {summary['rejected']:,}")
+    for row_number, reason, _ in result.rejected[:10]:
+        print(f"  row {row_number}: {reason}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for record in result.records.values():
+                f.write(json.dumps(record) + "\n")
+    if args.rejects:
+        with open(args.rejects, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["row", "reason", "source"])
+            for row_number, reason, source in result.rejected:
+                writer.writerow([row_number, reason, json.dumps(source)])
+    return 1 if result.rejected else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,539 @@
+"""Streaming validator for generated incident files.
+
+Checks every row against the invariants the generator intends:
+
+* created_date and updated_date are well-formed, updated_date is not
+  before created_date, and neither is after the as-of time,
+* Active matches is_active(state),
+* resolution_code and close_notes are set for Resolved/Closed rows only,
+* inc_number is INC + at most 10 digits and unique across all inputs,
+* service, incident_category, state, priority, impact, urgency and
+  resolution_code come from the known tables (built-in, or --spec).
+
+Inputs are CSV files (optionally .gz/.zst), dict-csv directories or Parquet
+files, read in chunks so memory stays flat. Plain CSV files are split into
+byte ranges at line boundaries (generated rows never contain newlines), and
+all pieces are checked in parallel by worker processes. Each piece marks its
+INC numbers in a bitmap, and the bitmaps are merged at the end to find
+duplicates across pieces and files. That costs one bit per possible number,
+about 12 MB per hundred million. The bitmap stops at 100 million (the
+generator numbers from 1 with 7 digits); numbers past it are kept in a
+sorted array instead, so a stray huge number costs 8 bytes, not gigabytes.
+
+Prints a violation summary with sample rows and exits with status 1 when
+anything fails.
+
+Example:
+    python validate_incidents.py incidents.csv --as-of 2026-01-01 --workers 8
+    python validate_incidents.py incidents.part*.csv.gz columnar_dir --json report.json
+"""
+import argparse
+import csv
+import gc
+import io
+import json
+import operator
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from functools import lru_cache
+from itertools import islice
+
+import numpy as np
+
+from Generate_Records_v3 import (
+    active_states,
+    closed_states,
+    csv_header,
+    default_tables,
+    format_epoch,
+    naive_epoch,
+)
+
+# Longest accepted INC number, well past the generator's 7 digits and short of int64's 18
+max_inc_digits = 10
+# INC numbers below this are marked in the bitmap, larger ones in a sorted array
+bitmap_inc_limit = 10 ** 8
+
+# Check name -> description, in report order
+checks = {
+    "bad_row": "wrong number of fields",
+    "bad_timestamp": "created_date/updated_date not YYYY-MM-DD HH:MM:SS",
+    "updated_before_created": "updated_date earlier than created_date",
+    "future_timestamp": "created_date/updated_date after the as-of time",
+    "active_mismatch": "Active does not match is_active(state)",
+    "resolution_on_active": "resolution_code/close_notes on a New/In Progress row",
+    "missing_resolution": "Resolved/Closed row without resolution_code/close_notes",
+    "bad_inc_number": f"inc_number is not INC + 1 to {max_inc_digits} digits",
+    "duplicate_inc_number": "inc_number seen before",
+}
+categorical_columns = ["service", "incident_category", "state", "priority", "impact", "urgency",
+                       "resolution_code"]
+for _column in categorical_columns:
+    checks[f"unknown_{_column}"] = f"{_column} not in the known values"
+
+# Columns shown with each sample row, besides inc_number and id
+sample_columns = {
+    "bad_row": [],
+    "bad_timestamp": ["created_date", "updated_date"],
+    "updated_before_created": ["state", "created_date", "updated_date"],
+    "future_timestamp": ["created_date", "updated_date"],
+    "active_mismatch": ["state", "Active"],
+    "resolution_on_active": ["state", "resolution_code", "close_notes"],
+    "missing_resolution": ["state", "resolution_code", "close_notes"],
+    "bad_inc_number": [],
+    "duplicate_inc_number": [],
+}
+sample_columns.update({f"unknown_{column}": [column] for column in categorical_columns})
+
+
+_day_part = operator.itemgetter(slice(None, 11))
+_time_part = operator.itemgetter(slice(11, None))
+day_pattern = re.compile(r"\d{4}-\d\d-\d\d ")
+time_pattern = re.compile(r"(?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d")
+_inc_prefix = np.array([ord(c) for c in "INC"], dtype=np.uint32)
+
+# Popcount per byte value, for counting bitmap overlaps
+_bit_counts = np.array([bin(value).count("1") for value in range(256)], dtype=np.int64)
+
+
+def known_values(tables=None):
+    """Allowed values per categorical column (resolution_code may also be empty)"""
+    tables = tables or default_tables
+    return {
+        "service": set(tables.services.values),
+        "incident_category": set(tables.capitalized_categories),
+        "state": set(tables.states.values),
+        "priority": set(tables.priorities.values),
+        "impact": set(tables.impact_levels.values),
+        "urgency": set(tables.impact_levels.values),
+        "resolution_code": set(tables.resolution_codes.values) | {""},
+    }
+
+
+@lru_cache(maxsize=65536)
+def _valid_day(part):
+    """'YYYY-MM-DD ' naming a real date"""
+    if not day_pattern.fullmatch(part):
+        return False
+    try:
+        date.fromisoformat(part[:10])
+    except ValueError:
+        return False
+    return True
+
+
+def _valid_timestamp(value):
+    return len(value) == 19 and _valid_day(value[:11]) and bool(time_pattern.fullmatch(value, 11))
+
+
+def _timestamps_ok(values):
+    """Whole-column format check: every value is 19 characters and each distinct
+    day and time-of-day part is well-formed (there are few distinct ones)"""
+    if set(map(len, values)) != {19}:
+        return False
+    return (all(map(_valid_day, set(map(_day_part, values))))
+            and all(map(time_pattern.fullmatch, set(map(_time_part, values)))))
+
+
+def _valid_inc_number(value):
+    digits = value[3:]
+    return (value[:3] == "INC" and 0 < len(digits) <= max_inc_digits and digits.isascii()
+            and digits.isdigit())
+
+
+def _parse_inc_numbers(values):
+    """INC numbers as int64 via their UTF-32 code points, or None if any is not valid"""
+    if not len(values):
+        return np.zeros(0, dtype=np.int64)
+    array = np.array(values, dtype=str)
+    codes = array.view(np.uint32).reshape(len(array), -1)
+    if codes.shape[1] < 4 or not (codes[:, :3] == _inc_prefix).all() or not codes[:, 3].all():
+        return None
+    if codes.shape[1] > 3 + max_inc_digits:
+        if codes[:, 3 + max_inc_digits:].any():
+            return None
+        codes = codes[:, :3 + max_inc_digits]
+    numbers = np.zeros(len(array), dtype=np.int64)
+    for column in codes[:, 3:].T:
+        # Shorter numbers are padded with code point 0
+        present = column != 0
+        if not ((column >= 48) & (column <= 57) | ~present).all():
+            return None
+        numbers = np.where(present, numbers * 10 + (column.astype(np.int64) - 48), numbers)
+    return numbers
+
+
+def input_kind(path):
+    if os.path.isdir(path):
+        return "dict-csv"
+    if path.endswith(".parquet"):
+        return "parquet"
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return "csv"
+
+
+class ChunkValidator:
+    """Run every check over column chunks and keep counts, samples and an INC bitmap"""
+
+    def __init__(self, known, now_text, sample_limit=5):
+        self.known = known
+        self.now_text = now_text
+        self.sample_limit = sample_limit
+        self.rows = 0
+        self.counts = dict.fromkeys(checks, 0)
+        self.samples = {name: [] for name in checks}
+        self.bits = np.zeros(0, dtype=np.uint8)
+        # Sorted INC numbers at or past bitmap_inc_limit
+        self.sparse = np.zeros(0, dtype=np.int64)
+        self.expected_active = {state: str(state in active_states) for state in known["state"]}
+        # Valid (state, Active) and (state, has resolution_code, has close_notes) combinations;
+        # Active is the text 'True'/'False' in CSV and a bool in columnar chunks
+        self.active_pairs = ({(state, flag) for state, flag in self.expected_active.items()}
+                             | {(state, flag == "True") for state, flag in self.expected_active.items()})
+        self.resolution_shapes = {(state, state in closed_states, state in closed_states)
+                                  for state in known["state"]}
+
+    def _flag(self, name, indexes, columns, source):
+        if not indexes:
+            return
+        self.counts[name] += len(indexes)
+        samples = self.samples[name]
+        for index in indexes[:self.sample_limit - len(samples)]:
+            sample = {"source": source}
+            for column in ["inc_number", "id"] + sample_columns[name]:
+                sample[column] = str(columns[column][index])
+            samples.append(sample)
+
+    def check(self, columns, source):
+        """Check one chunk: a dict of CSV-layout column sequences.
+
+        Each check first runs as a whole-column test at C speed (set, map,
+        max, NumPy); rows are only scanned one by one when that test fails.
+        """
+        count = len(columns["inc_number"])
+        self.rows += count
+        flag = self._flag
+
+        created, updated = columns["created_date"], columns["updated_date"]
+        if not (_timestamps_ok(created) and _timestamps_ok(updated)):
+            flag("bad_timestamp", [i for i, (c, u) in enumerate(zip(created, updated))
+                                   if not (_valid_timestamp(c) and _valid_timestamp(u))],
+                 columns, source)
+        # Well-formed timestamps order correctly as strings
+        if any(map(operator.lt, updated, created)):
+            flag("updated_before_created", [i for i, (c, u) in enumerate(zip(created, updated))
+                                            if u < c], columns, source)
+        now = self.now_text
+        if count and (max(created) > now or max(updated) > now):
+            flag("future_timestamp", [i for i, (c, u) in enumerate(zip(created, updated))
+                                      if c > now or u > now], columns, source)
+
+        state, active = columns["state"], columns["Active"]
+        if not set(zip(state, active)) <= self.active_pairs:
+            expected = self.expected_active
+            flag("active_mismatch", [i for i, (s, a) in enumerate(zip(state, active))
+                                     if expected.get(s, str(a)) != str(a)], columns, source)
+        resolution, notes = columns["resolution_code"], columns["close_notes"]
+        if not set(zip(state, map(bool, resolution), map(bool, notes))) <= self.resolution_shapes:
+            flag("resolution_on_active", [i for i, (s, r, n) in enumerate(zip(state, resolution, notes))
+                                          if (r or n) and s in active_states], columns, source)
+            flag("missing_resolution", [i for i, (s, r, n) in enumerate(zip(state, resolution, notes))
+                                        if not (r and n) and s in closed_states], columns, source)
+
+        for column in categorical_columns:
+            values = columns[column]
+            unknown = set(values) - self.known[column]
+            if unknown:
+                flag(f"unknown_{column}", [i for i, v in enumerate(values) if v in unknown],
+                     columns, source)
+
+        inc = columns["inc_number"]
+        numbers = _parse_inc_numbers(inc)
+        positions = np.arange(count)
+        if numbers is None:
+            bad = [i for i, n in enumerate(inc) if not _valid_inc_number(n)]
+            flag("bad_inc_number", bad, columns, source)
+            skip = set(bad)
+            positions = np.array([i for i in range(count) if i not in skip], dtype=np.int64)
+            numbers = np.array([int(inc[i][3:]) for i in positions], dtype=np.int64)
+        flag("duplicate_inc_number", self._mark(numbers, positions).tolist(), columns, source)
+
+    def _mark(self, numbers, positions):
+        """Record `numbers`; returns the positions already seen"""
+        dense = numbers < bitmap_inc_limit
+        if dense.all():
+            return self._mark_bits(numbers, positions)
+        return np.sort(np.concatenate((self._mark_bits(numbers[dense], positions[dense]),
+                                       self._mark_sparse(numbers[~dense], positions[~dense]))))
+
+    def _mark_sparse(self, numbers, positions):
+        """Add `numbers` to the sorted array; returns the positions already seen"""
+        order = np.argsort(numbers, kind="stable")
+        numbers = numbers[order]
+        repeat = np.zeros(len(numbers), dtype=bool)
+        repeat[1:] = numbers[1:] == numbers[:-1]
+        seen = repeat | np.isin(numbers, self.sparse)
+        self.sparse = np.union1d(self.sparse, numbers)
+        return positions[order[seen]]
+
+    def _mark_bits(self, numbers, positions):
+        """Set the bitmap bits of `numbers`; returns the positions already seen"""
+        if not len(numbers):
+            return positions
+        order = np.argsort(numbers, kind="stable")
+        numbers = numbers[order]
+        repeat = np.zeros(len(numbers), dtype=bool)
+        repeat[1:] = numbers[1:] == numbers[:-1]
+
+        size = int(numbers[-1] >> 3) + 1
+        if size > len(self.bits):
+            # Grow geometrically so a rising id range does not copy on every chunk
+            grown = np.zeros(max(size, 2 * len(self.bits)), dtype=np.uint8)
+            grown[:len(self.bits)] = self.bits
+            self.bits = grown
+        byte = numbers >> 3
+        bit = np.left_shift(1, numbers & 7).astype(np.uint8)
+        seen = repeat | ((self.bits[byte] & bit) != 0)
+
+        unique = ~repeat
+        byte, bit = byte[unique], bit[unique]
+        starts = np.flatnonzero(np.concatenate(([True], byte[1:] != byte[:-1])))
+        self.bits[byte[starts]] |= np.bitwise_or.reduceat(bit, starts)
+        return np.sort(positions[order[seen]])
+
+    def result(self):
+        return {"rows": self.rows, "counts": self.counts, "samples": self.samples,
+                "bits": self.bits, "sparse": self.sparse}
+
+
+class RowColumns(dict):
+    """Column view of CSV rows; a column is only transposed when first used,
+    so the long text columns the checks never read cost nothing"""
+
+    positions = {column: index for index, column in enumerate(csv_header)}
+
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+
+    def __missing__(self, column):
+        values = self[column] = list(map(operator.itemgetter(self.positions[column]), self.rows))
+        return values
+
+
+def _line_start(f, offset):
+    """Offset of the first line starting at or after `offset`"""
+    if offset == 0:
+        return 0
+    f.seek(offset - 1)
+    f.readline()
+    return f.tell()
+
+
+def _csv_chunks(path, start, stop, block_bytes=8 * 1024 * 1024):
+    """Yield lists of rows from the lines that start in [start, stop) of a plain CSV file"""
+    with open(path, 'rb') as f:
+        if start == 0:
+            f.readline()  # header
+            begin = f.tell()
+        else:
+            begin = _line_start(f, start)
+        end = _line_start(f, stop)
+        f.seek(begin)
+        tail = b""
+        while begin < end:
+            block = f.read(min(block_bytes, end - begin))
+            if not block:
+                break
+            begin += len(block)
+            data = tail + block
+            cut = data.rfind(b"\n") + 1 if begin < end else len(data)
+            data, tail = data[:cut], data[cut:]
+            if data:
+                yield list(csv.reader(io.StringIO(data.decode('utf-8'), newline='')))
+
+
+def _stream_chunks(path, kind, chunk_rows=50000):
+    if kind == "gzip":
+        import gzip
+
+        stream = gzip.open(path, 'rt', newline='', encoding='utf-8')
+    else:
+        import zstandard
+
+        raw = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), read_across_frames=True,
+                                                         closefd=True)
+        stream = io.TextIOWrapper(raw, encoding='utf-8', newline='')
+    with stream:
+        reader = csv.reader(stream)
+        next(reader, None)
+        while True:
+            rows = list(islice(reader, chunk_rows))
+            if not rows:
+                return
+            yield rows
+
+
+def _validate_piece(path, kind, start, stop, known, now_text, sample_limit):
+    """Check one file, or one byte range of a plain CSV file, in a worker"""
+    # Chunks are lists of string lists with no reference cycles; pausing the
+    # cyclic collector saves it from rescanning every row as they pile up
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _check_piece(path, kind, start, stop, known, now_text, sample_limit)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _check_piece(path, kind, start, stop, known, now_text, sample_limit):
+    validator = ChunkValidator(known, now_text, sample_limit)
+    if kind in ("dict-csv", "parquet"):
+        from columnar_output import iter_columnar_chunks
+
+        for columns in iter_columnar_chunks(path):
+            validator.check(columns, path)
+        return validator.result()
+
+    width = len(csv_header)
+    chunks = _csv_chunks(path, start, stop) if kind == "csv" else _stream_chunks(path, kind)
+    for rows in chunks:
+        if set(map(len, rows)) != {width}:
+            bad = [row for row in rows if len(row) != width]
+            validator.counts["bad_row"] += len(bad)
+            for row in bad[:sample_limit - len(validator.samples["bad_row"])]:
+                validator.samples["bad_row"].append({"source": path, "row": ",".join(row)[:200]})
+            rows = [row for row in rows if len(row) == width]
+            if not rows:
+                continue
+        validator.check(RowColumns(rows), path)
+    return validator.result()
+
+
+def plan_pieces(paths, workers, min_piece_bytes=16 * 1024 * 1024):
+    """(path, kind, start, stop) work items; plain CSV files are split so every worker gets some"""
+    kinds = [(path, input_kind(path)) for path in paths]
+    csv_bytes = sum(os.path.getsize(path) for path, kind in kinds if kind == "csv")
+    piece_bytes = max(min_piece_bytes, -(-csv_bytes // max(workers, 1)))
+    pieces = []
+    for path, kind in kinds:
+        if kind != "csv":
+            pieces.append((path, kind, 0, None))
+            continue
+        size = os.path.getsize(path)
+        starts = list(range(0, size, piece_bytes)) or [0]
+        pieces += [(path, kind, start, min(start + piece_bytes, size)) for start in starts]
+    return pieces
+
+
+def validate(paths, now=None, workers=None, tables=None, sample_limit=5):
+    """Validate incident files; returns a report dict (see print_report)"""
+    now_text = format_epoch(naive_epoch(now or datetime.now()))
+    known = known_values(tables)
+    workers = workers or os.cpu_count() or 1
+    pieces = plan_pieces(paths, workers)
+    started = time.monotonic()
+
+    arguments = [piece + (known, now_text, sample_limit) for piece in pieces]
+    if workers > 1 and len(pieces) > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(_validate_piece, *zip(*arguments))
+    else:
+        executor = None
+        results = (_validate_piece(*piece) for piece in arguments)
+
+    report = {"files": list(paths), "as_of": now_text, "rows": 0,
+              "counts": dict.fromkeys(checks, 0), "samples": {name: [] for name in checks}}
+    seen = np.zeros(0, dtype=np.uint8)
+    seen_sparse = np.zeros(0, dtype=np.int64)
+    try:
+        for (path, _, _, _), result in zip(pieces, results):
+            report["rows"] += result["rows"]
+            for name, count in result["counts"].items():
+                report["counts"][name] += count
+                samples = report["samples"][name]
+                samples += result["samples"][name][:sample_limit - len(samples)]
+
+            # INC numbers shared with earlier pieces are duplicates too
+            bits = result["bits"]
+            overlap = seen[:len(bits)] & bits[:len(seen)]
+            shared = np.intersect1d(seen_sparse, result["sparse"])
+            duplicates = int(_bit_counts[overlap].sum()) + len(shared)
+            if duplicates:
+                report["counts"]["duplicate_inc_number"] += duplicates
+                samples = report["samples"]["duplicate_inc_number"]
+                numbers = [byte * 8 + int(overlap[byte]).bit_length() - 1
+                           for byte in np.flatnonzero(overlap)[:sample_limit]]
+                for number in (numbers + shared[:sample_limit].tolist())[:sample_limit - len(samples)]:
+                    samples.append({"source": path, "inc_number": f"INC{number:07d}",
+                                    "id": "(also in an earlier piece)"})
+            seen_sparse = np.union1d(seen_sparse, result["sparse"])
+            if len(bits) > len(seen):
+                seen = np.concatenate((seen, np.zeros(len(bits) - len(seen), dtype=np.uint8)))
+            seen[:len(bits)] |= bits
+    finally:
+        if executor:
+            executor.shutdown()
+
+    report["elapsed_s"] = round(time.monotonic() - started, 3)
+    report["violations"] = sum(report["counts"].values())
+    return report
+
+
+def print_report(report, out=sys.stdout):
+    elapsed = report["elapsed_s"]
+    rate = report["rows"] / elapsed if elapsed else 0.0
+    print(f"Checked {report['rows']:,} rows in {len(report['files'])} input(s) as of "
+          f"{report['as_of']} ({elapsed:.1f} s, {rate:,.0f} rows/s)", file=out)
+    if not report["violations"]:
+        print("No violations", file=out)
+        return
+    print(f"{report['violations']:,} violations:", file=out)
+    for name, count in report["counts"].items():
+        if not count:
+            continue
+        print(f"  {name}: {count:,} ({checks[name]})", file=out)
+        for sample in report["samples"][name]:
+            fields = ", ".join(f"{key}={value!r}" for key, value in sample.items()
+                               if key != "source")
+            print(f"      {sample['source']}: {fields}", file=out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate generated incident files")
+    parser.add_argument("paths", nargs="+", help="CSV (.csv, .csv.gz, .csv.zst), Parquet files "
+                                                 "or dict-csv directories")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None,
+                        help="latest allowed timestamp (default: now)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--spec", default=None,
+                        help="dataset spec the files were generated from (default: built-in tables)")
+    parser.add_argument("--samples", type=int, default=5, help="sample rows kept per check")
+    parser.add_argument("--json", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+
+    tables = None
+    if args.spec:
+        from dataset_spec import load_tables
+
+        tables = load_tables(args.spec)
+    report = validate(args.paths, now=args.as_of, workers=args.workers, tables=tables,
+                      sample_limit=args.samples)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if report["violations"] else 0)
+
+
+if __name__ == "__main__":
+    main()